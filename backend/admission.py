@@ -0,0 +1,134 @@
+"""
+التحكم بالقبول وتخفيف الحمل
+Admission Control & Load Shedding
+
+1. Rate limiting لكل عميل (Token Bucket)
+2. حد أقصى للتحليلات الجارية بنفس الوقت
+3. تأخر الـ event loop (يقيسه loop_watchdog ويوصل عبر observe_lag)
+
+عند الضغط:
+- ضغط متوسط ← وضع مخفف (بدون فتح الروابط وبدون AI) مع علامة في الرد
+- ضغط عالي ← رفض فوري بـ 429 بدل ما الطلبات تتكدس وتنتهي مهلتها
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from config import (
+    RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMIT_MAX_CLIENTS,
+    MAX_IN_FLIGHT, DEGRADE_IN_FLIGHT, DEGRADE_LAG_MS, SHED_LAG_MS
+)
+
+
+class AdmissionRejected(Exception):
+    """الطلب مرفوض (يتحول لـ 429)"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """دلو توكنات: يمتلئ بمعدل ثابت، وكل طلب يستهلك توكن"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, rate: float, burst: float) -> float:
+        """يرجع 0 إذا مسموح، أو عدد الثواني للانتظار"""
+        now = time.monotonic()
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+class AdmissionController:
+    """قرار قبول كل طلب تحليل: عادي / مخفف / مرفوض"""
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: float = RATE_LIMIT_BURST,
+                 max_clients: int = RATE_LIMIT_MAX_CLIENTS, max_in_flight: int = MAX_IN_FLIGHT,
+                 degrade_in_flight: int = DEGRADE_IN_FLIGHT, degrade_lag_ms: float = DEGRADE_LAG_MS,
+                 shed_lag_ms: float = SHED_LAG_MS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.max_in_flight = max_in_flight
+        self.degrade_in_flight = degrade_in_flight
+        self.degrade_lag_ms = degrade_lag_ms
+        self.shed_lag_ms = shed_lag_ms
+        self.in_flight = 0
+        self.lag_ms = 0.0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.stats = {"admitted": 0, "degraded": 0, "rate_limited": 0, "shed": 0}
+
+    def admit(self, client_id: str) -> Dict:
+        """
+        قبول طلب أو رفضه
+
+        Returns:
+            {"degraded": bool, "reason": str | None}
+
+        Raises:
+            AdmissionRejected: تجاوز حد العميل أو السيرفر محمّل
+        """
+        wait = self._bucket(client_id).take(self.rate, self.burst)
+        if wait > 0:
+            self.stats["rate_limited"] += 1
+            raise AdmissionRejected("تجاوزت الحد المسموح من الطلبات", wait)
+
+        if self.in_flight >= self.max_in_flight or self.lag_ms >= self.shed_lag_ms:
+            self.stats["shed"] += 1
+            raise AdmissionRejected("السيرفر مشغول، حاول بعد قليل", 1.0)
+
+        reason = None
+        if self.in_flight >= self.degrade_in_flight:
+            reason = "in_flight"
+        elif self.lag_ms >= self.degrade_lag_ms:
+            reason = "event_loop_lag"
+
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+        if reason:
+            self.stats["degraded"] += 1
+        return {"degraded": reason is not None, "reason": reason}
+
+    def release(self):
+        self.in_flight = max(self.in_flight - 1, 0)
+
+    def _bucket(self, client_id: str) -> TokenBucket:
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(self.burst)
+            self._buckets[client_id] = bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+        return bucket
+
+    def observe_lag(self, lag: float):
+        """قياس تأخر جديد (ms) من نبضة loop_watchdog"""
+        # يرتفع فوراً مع أي تأخير وينزل تدريجياً
+        self.lag_ms = lag if lag > self.lag_ms else self.lag_ms * 0.7 + lag * 0.3
+
+    def get_stats(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "degrade_in_flight": self.degrade_in_flight,
+            "loop_lag_ms": round(self.lag_ms, 1),
+            "tracked_clients": len(self._buckets),
+            **self.stats
+        }
+
+
+# instance واحد للسيرفر
+admission = AdmissionController()
@@ -0,0 +1,219 @@
+"""
+مرحلة تحليل الـ AI (Groq) بشكل آمن
+Resilient AI Scoring Stage
+
+الحمايات:
+1. حد أقصى للطلبات المتزامنة (Semaphore)
+2. قاطع دائرة (Circuit Breaker): يوقف الطلبات بعد أخطاء متكررة
+3. كاش للنتائج حسب hash النص
+4. ميزانية وقت: إذا تأخر الـ AI نكمل بدونه
+   (انتظار مكان في الطابور له حد خاص ويُحسب تخطي، مو خطأ من الـ API يفتح القاطع)
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import httpx
+
+from config import (
+    GROQ_API_KEY, GROQ_BASE_URL, AI_MODEL, AI_MAX_CONCURRENCY, AI_TIMEOUT,
+    AI_LATENCY_BUDGET, AI_QUEUE_TIMEOUT, AI_BREAKER_FAILURES, AI_BREAKER_RESET, AI_CACHE_SIZE, AI_CACHE_TTL
+)
+
+
+class CircuitBreaker:
+    """
+    قاطع الدائرة
+
+    closed: الطلبات تمر عادي
+    open: بعد failure_threshold أخطاء متتالية، نتخطى الـ AI لمدة reset_timeout
+    half_open: بعد المدة نسمح بطلب تجريبي واحد، إذا نجح نرجع closed
+    """
+
+    def __init__(self, failure_threshold: int = AI_BREAKER_FAILURES, reset_timeout: float = AI_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = "closed"
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        """هل نسمح بالطلب؟"""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.state = "closed"
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """انتهاء الطلب بأي طريقة (حتى الإلغاء): الطلب التجريبي ما يبقى محجوز للأبد"""
+        self._trial_running = False
+
+
+class AIScorer:
+    """تحليل الإيميل بنموذج لغوي متوافق مع OpenAI API"""
+
+    def __init__(self, api_key: str = GROQ_API_KEY, base_url: str = GROQ_BASE_URL, model: str = AI_MODEL,
+                 max_concurrency: int = AI_MAX_CONCURRENCY, timeout: float = AI_TIMEOUT,
+                 latency_budget: float = AI_LATENCY_BUDGET, cache_size: int = AI_CACHE_SIZE,
+                 cache_ttl: float = AI_CACHE_TTL, queue_timeout: float = AI_QUEUE_TIMEOUT):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.latency_budget = latency_budget
+        self.queue_timeout = min(queue_timeout, latency_budget)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_concurrency = max_concurrency
+        self.breaker = CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._in_flight = 0
+        self.stats = {
+            "calls": 0, "success": 0, "failures": 0, "timeouts": 0,
+            "cache_hits": 0, "breaker_skips": 0, "budget_skips": 0,
+            "queue_skips": 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    async def score(self, text: str) -> Optional[int]:
+        """
+        نتيجة الـ AI (0-100)
+
+        Returns:
+            None إذا الـ AI غير متاح أو تم تخطيه (قاطع مفتوح / الطابور ممتلئ / تجاوز الميزانية)
+        """
+        if not self.enabled:
+            return None
+
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+
+        # الطابور المحلي (AI_MAX_CONCURRENCY) خارج حساب القاطع: الضغط عندنا مو خطأ من الـ API
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["queue_skips"] += 1
+            return None
+
+        try:
+            if not self.breaker.allow():
+                self.stats["breaker_skips"] += 1
+                return None
+            try:
+                remaining = self.latency_budget - (time.monotonic() - started)
+                score = await asyncio.wait_for(self._call(text), remaining)
+            except asyncio.TimeoutError:
+                # الـ API ما رد ضمن باقي الميزانية
+                self.stats["budget_skips"] += 1
+                self.breaker.record_failure()
+                return None
+            except Exception as e:
+                self.stats["failures"] += 1
+                self.breaker.record_failure()
+                print(f"⚠️ فشل تحليل AI: {type(e).__name__}: {e}")
+                return None
+            finally:
+                # إلغاء الطلب (CancelledError) ما يمر على record_success / record_failure
+                self.breaker.release()
+        finally:
+            self._semaphore.release()
+
+        self.breaker.record_success()
+        self.stats["success"] += 1
+        self._cache_put(key, score)
+        return score
+
+    async def _call(self, text: str) -> int:
+        self.stats["calls"] += 1
+        self._in_flight += 1
+        try:
+            return await self._call_api(text)
+        except httpx.TimeoutException:
+            self.stats["timeouts"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+    async def _call_api(self, text: str) -> int:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+
+        prompt = f'حلل هذا الإيميل وأرجع JSON: {{"risk_score": 0-100}}\n"{text[:400]}"'
+        response = await self._client.post(
+            f"{self.base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={"model": self.model, "messages": [{"role": "user", "content": prompt}], "temperature": 0.2}
+        )
+        response.raise_for_status()
+        data = response.json()
+        content = data["choices"][0]["message"]["content"]
+        content = content.replace("```json", "").replace("```", "").strip()
+        ai_result = json.loads(content)
+        return max(0, min(int(ai_result.get("risk_score", 0)), 100))
+
+    def _cache_get(self, key: str) -> Optional[int]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        score, stored_at = entry
+        if time.monotonic() - stored_at > self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return score
+
+    def _cache_put(self, key: str, score: int):
+        self._cache[key] = (score, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "cache_size": len(self._cache),
+            **self.stats
+        }
+
+
+# instance واحد للسيرفر
+ai_scorer = AIScorer()
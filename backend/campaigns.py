@@ -0,0 +1,257 @@
+"""
+تجميع الحملات بالتشابه
+Campaign Clustering (MinHash / LSH)
+
+حملات التصيد ترسل نسخ شبه متطابقة ("عزيزي أحمد" / "عزيزي محمد"، رابط
+تتبع مختلف لكل مستلم)، فكاش الـ hash الحرفي ما يلقاها وكل نسخة تنفحص
+من جديد (فتح روابط + AI).
+
+1. تطبيع النص: الروابط ← الدومين فقط، الأرقام ← 0، بدون تشكيل،
+   توحيد الألف والياء والتاء المربوطة
+2. shingles بالحروف (CAMPAIGN_SHINGLE_CHARS) ← توقيع MinHash
+   (CAMPAIGN_PERMUTATIONS قيمة): نسبة القيم المتطابقة بين توقيعين ≈ التشابه
+3. LSH: التوقيع مقسم لـ CAMPAIGN_BANDS جزء، وكل جزء مفتاح في جدول؛
+   الرسائل المتشابهة تتقابل في جزء واحد على الأقل ← بحث بدون مقارنة الكل
+4. تأكيد رخيص: تشابه التوقيع مع المرشحين >= CAMPAIGN_SIMILARITY
+5. كل رسالة تنضم لحملة أقرب رسالة لها (أو تبدأ حملة جديدة)، وحكم
+   الحملة من الرسائل اللي انفحصت كامل (أعلى نتيجة)
+
+رسالة مشابهة مباشرة لرسالة انفحصت كامل وحكمها خطير (>= CAMPAIGN_MALICIOUS_SCORE)
+تأخذ حكمها بعد القواعد + ML + شكل الروابط لها هي، بدون فتح الروابط وبدون AI.
+(التشابه مع رسالة ورثت الحكم ما يكفي: الحملة ما "تنجرف" سلسلة لرسائل بعيدة)
+
+الذاكرة محدودة: CAMPAIGN_MAX_ENTRIES رسالة (الأقدم تُحذف)، وكل رسالة
+تنتهي بعد CAMPAIGN_TTL، والنسخ المتطابقة تقريباً (>= CAMPAIGN_DUPLICATE_SIMILARITY)
+ما تُخزن مرة ثانية (تزيد عدد الحملة فقط).
+"""
+
+import re
+import time
+import unicodedata
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    CAMPAIGN_PERMUTATIONS, CAMPAIGN_BANDS, CAMPAIGN_SHINGLE_CHARS, CAMPAIGN_SIMILARITY,
+    CAMPAIGN_DUPLICATE_SIMILARITY, CAMPAIGN_MALICIOUS_SCORE, CAMPAIGN_MAX_ENTRIES, CAMPAIGN_TTL,
+    CAMPAIGN_MIN_CHARS, CAMPAIGN_MAX_CHARS, CAMPAIGN_MAX_CANDIDATES
+)
+
+URL_PATTERN = re.compile(r'https?://([^/\s:?#<>"]+)[^\s<>"]*', re.IGNORECASE)
+DIGITS_PATTERN = re.compile(r"\d+")
+ARABIC_FORMS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ى": "ي", "ة": "ه", "ـ": None})
+
+_PRIME = (1 << 31) - 1
+
+
+def normalize(text: str) -> str:
+    """النص بدون الأجزاء اللي تتغير بين نسخ الحملة (روابط التتبع، الأرقام، التشكيل)"""
+    text = URL_PATTERN.sub(lambda m: " " + m.group(1).lower() + " ", text[:CAMPAIGN_MAX_CHARS])
+    text = DIGITS_PATTERN.sub("0", text.lower())
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return " ".join(text.translate(ARABIC_FORMS).split())
+
+
+class CampaignIndex:
+    """فهرس LSH لتوقيعات الرسائل الأخيرة + الحملات"""
+
+    def __init__(self, permutations: int = CAMPAIGN_PERMUTATIONS, bands: int = CAMPAIGN_BANDS,
+                 max_entries: int = CAMPAIGN_MAX_ENTRIES, ttl: float = CAMPAIGN_TTL):
+        if permutations % bands:
+            raise ValueError("CAMPAIGN_PERMUTATIONS لازم يقبل القسمة على CAMPAIGN_BANDS")
+        # معاملات ثابتة (نفس التوقيع في كل العمال وبعد إعادة التشغيل)
+        rng = np.random.RandomState(2024)
+        self._a = rng.randint(1, _PRIME, size=permutations).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=permutations).astype(np.uint64)
+        self.bands = bands
+        self.rows = permutations // bands
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # رقم ← (التوقيع، الحملة، وقت آخر ظهور، نتيجة الفحص الكامل أو -1)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._buckets: Dict[bytes, List[int]] = {}
+        self.clusters: Dict[int, Dict] = {}
+        self._next_entry = 0
+        self._next_cluster = 0
+        self.max_cluster_size = 0
+        self.stats = {"lookups": 0, "too_short": 0, "matched": 0, "inherited": 0,
+                      "duplicates": 0, "evicted": 0, "expired": 0}
+
+    # ---------- التوقيع ----------
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """توقيع MinHash للنص (None إذا النص أقصر من CAMPAIGN_MIN_CHARS)"""
+        text = normalize(text)
+        if len(text) < CAMPAIGN_MIN_CHARS:
+            return None
+        k = CAMPAIGN_SHINGLE_CHARS
+        shingles = np.fromiter({zlib.crc32(text[i:i + k].encode("utf-8")) for i in range(len(text) - k + 1)},
+                               dtype=np.uint64)
+        hashed = (np.outer(self._a, shingles) + self._b[:, None]) % _PRIME
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _keys(self, signature: np.ndarray) -> List[bytes]:
+        raw = signature.tobytes()
+        size = self.rows * 4
+        return [bytes([band]) + raw[band * size:(band + 1) * size] for band in range(self.bands)]
+
+    # ---------- البحث ----------
+    def lookup(self, text: str) -> Dict:
+        """
+        أقرب رسالة مشابهة في الفهرس
+
+        Returns:
+            {"signature", "match"}، و match = {"entry", "cluster", "similarity", "malicious",
+            "risk_score"} أو None (malicious: مشابهة لرسالة انفحصت كامل وحكمها خطير)
+        """
+        self.stats["lookups"] += 1
+        self._expire()
+        signature = self.signature(text)
+        if signature is None:
+            self.stats["too_short"] += 1
+            return {"signature": None, "match": None}
+
+        # المرشحين: الأكثر تقابلاً في الأجزاء أولاً
+        candidates = Counter()
+        for key in self._keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best, best_similarity = None, 0.0
+        risk_score = -1  # أعلى نتيجة فحص كامل بين المشابهة
+        for entry_id, _ in candidates.most_common(CAMPAIGN_MAX_CANDIDATES):
+            entry = self._entries[entry_id]
+            similarity = float(np.mean(entry[0] == signature))
+            if similarity > best_similarity:
+                best, best_similarity = entry_id, similarity
+            if similarity >= CAMPAIGN_SIMILARITY:
+                risk_score = max(risk_score, entry[3])
+
+        if best is None or best_similarity < CAMPAIGN_SIMILARITY:
+            return {"signature": signature, "match": None}
+        self.stats["matched"] += 1
+        return {"signature": signature, "match": {
+            "entry": best,
+            "cluster": self.clusters[self._entries[best][1]],
+            "similarity": round(best_similarity, 3),
+            "malicious": risk_score >= CAMPAIGN_MALICIOUS_SCORE,
+            "risk_score": risk_score
+        }}
+
+    # ---------- الإضافة ----------
+    def add(self, found: Dict, verdict: Dict, judged: bool, preview: str = ""):
+        """
+        تسجيل رسالة بعد الحكم عليها
+
+        Args:
+            found: نتيجة lookup لنفس الرسالة
+            judged: الحكم من فحص كامل (يحدد حكم الحملة)، أو موروث / مخفف (يزيد العدد فقط)
+        """
+        signature, match = found["signature"], found["match"]
+        if signature is None:
+            return
+        now = time.monotonic()
+        risk_score = verdict["risk_score"] if judged else -1
+
+        if match is not None and match["entry"] in self._entries and \
+                match["similarity"] >= CAMPAIGN_DUPLICATE_SIMILARITY:
+            # نسخة شبه متطابقة: نحدّث وقت الرسالة الموجودة بدل تخزين نسخة
+            entry_id = match["entry"]
+            signature, cluster_id, _, entry_risk = self._entries[entry_id]
+            self._entries[entry_id] = (signature, cluster_id, now, max(entry_risk, risk_score))
+            self._entries.move_to_end(entry_id)
+            self.stats["duplicates"] += 1
+        else:
+            if match is not None and match["cluster"]["id"] in self.clusters:
+                cluster_id = match["cluster"]["id"]
+            else:
+                cluster_id = self._new_cluster(preview)
+            entry_id = self._next_entry
+            self._next_entry += 1
+            self._entries[entry_id] = (signature, cluster_id, now, risk_score)
+            for key in self._keys(signature):
+                self._buckets.setdefault(key, []).append(entry_id)
+            self.clusters[cluster_id]["members"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(*self._entries.popitem(last=False))
+                self.stats["evicted"] += 1
+
+        cluster = self.clusters[cluster_id]
+        cluster["size"] += 1
+        cluster["last_seen"] = datetime.now().isoformat(timespec="seconds")
+        if judged:
+            cluster["judged"] += 1
+            if verdict["risk_score"] >= cluster["risk_score"]:
+                cluster["risk_score"] = verdict["risk_score"]
+                cluster["threat_type"] = verdict["threat_type"]
+        elif match is not None and match["malicious"]:
+            self.stats["inherited"] += 1
+        self.max_cluster_size = max(self.max_cluster_size, cluster["size"])
+
+    def _new_cluster(self, preview: str) -> int:
+        cluster_id = self._next_cluster
+        self._next_cluster += 1
+        now = datetime.now().isoformat(timespec="seconds")
+        self.clusters[cluster_id] = {
+            "id": cluster_id, "size": 0, "members": 0, "judged": 0,
+            "risk_score": 0, "threat_type": "رسالة عادية",
+            "first_seen": now, "last_seen": now, "preview": preview[:120]
+        }
+        return cluster_id
+
+    def _remove(self, entry_id: int, item: tuple):
+        signature, cluster_id = item[:2]
+        for key in self._keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.remove(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+        cluster = self.clusters.get(cluster_id)
+        if cluster is not None:
+            cluster["members"] -= 1
+            if cluster["members"] <= 0:
+                del self.clusters[cluster_id]
+
+    def _expire(self):
+        """حذف الرسائل الأقدم من CAMPAIGN_TTL (مرتبة بوقت آخر ظهور)"""
+        deadline = time.monotonic() - self.ttl
+        while self._entries:
+            entry_id, item = next(iter(self._entries.items()))
+            if item[2] >= deadline:
+                break
+            self._entries.popitem(last=False)
+            self._remove(entry_id, item)
+            self.stats["expired"] += 1
+
+    # ---------- المقاييس ----------
+    def top_clusters(self, limit: int = 20, min_size: int = 2) -> List[Dict]:
+        """أكبر الحملات (لمركز العمليات الأمنية)"""
+        self._expire()
+        clusters = [c for c in self.clusters.values() if c["size"] >= min_size]
+        clusters.sort(key=lambda c: (-c["size"], c["id"]))
+        return [{**c, "malicious": c["risk_score"] >= CAMPAIGN_MALICIOUS_SCORE} for c in clusters[:limit]]
+
+    def get_stats(self) -> Dict:
+        sizes = [c["size"] for c in self.clusters.values()]
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "clusters": len(sizes),
+            "campaigns": sum(1 for size in sizes if size > 1),
+            "malicious_campaigns": sum(1 for c in self.clusters.values()
+                                       if c["size"] > 1 and c["risk_score"] >= CAMPAIGN_MALICIOUS_SCORE),
+            "max_cluster_size": self.max_cluster_size,
+            **self.stats
+        }
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+        self.clusters.clear()
+
+
+# instance واحد للسيرفر
+campaign_index = CampaignIndex()
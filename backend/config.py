@@ -1,6 +1,7 @@
 """
 إعدادات المشروع
 """
+import ipaddress
 import os
 
 # API Keys
@@ -10,6 +11,7 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 DATA_PATH = "data/training_data.csv"
 MODEL_PATH = "models/fraud_model.pkl"
 VECTORIZER_PATH = "models/vectorizer.pkl"
+MODEL_INFO_PATH = "models/model_info.json"   # نوع النموذج (backend) المحفوظ
 
 # أوزان التحليل
 RULE_WEIGHT = 0.4      # 40% للقواعد
@@ -19,3 +21,175 @@ AI_WEIGHT = 0.2        # 20% للـ AI (Groq)
 # حدود الخطر
 HIGH_RISK = 70
 MEDIUM_RISK = 40
+
+# التحليل المتدرج (حكم سريع + فحص عميق في الخلفية)
+JOB_MAX_STORED = 1000      # أقصى عدد نتائج مؤجلة محفوظة
+JOB_TTL_SECONDS = 600      # مدة الاحتفاظ بالنتيجة (ثواني)
+JOB_MAX_ACTIVE = 200       # أقصى عدد مهام جارية بنفس الوقت (الزيادة ترجع 429)
+JOB_SSE_KEEPALIVE = 15     # ثواني بين رسائل keep-alive في البث
+
+# مرحلة الـ AI
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")  # غيّره لسيرفر محلي للاختبار
+AI_MODEL = "llama-3.1-8b-instant"
+AI_MAX_CONCURRENCY = 8     # أقصى طلبات AI متزامنة
+AI_TIMEOUT = 10.0          # مهلة طلب HTTP الواحد (ثواني)
+AI_LATENCY_BUDGET = 4.0    # أقصى وقت ننتظره للـ AI شامل الطابور (ثواني)
+AI_QUEUE_TIMEOUT = 1.0     # أقصى انتظار لمكان في الطابور (من الميزانية، ما يفتح القاطع)
+AI_BREAKER_FAILURES = 5    # عدد الأخطاء المتتالية قبل فتح القاطع
+AI_BREAKER_RESET = 30.0    # مدة تخطي الـ AI بعد فتح القاطع (ثواني)
+AI_CACHE_SIZE = 2000       # عدد النتائج المحفوظة في الكاش
+AI_CACHE_TTL = 3600        # مدة صلاحية نتيجة الكاش (ثواني)
+
+# تجميع طلبات ML في دفعات
+ML_BATCH_ENABLED = True
+ML_BATCH_WINDOW_MS = 5     # مدة انتظار الطلبات قبل تنفيذ الدفعة (ملي ثانية)
+ML_BATCH_MAX_SIZE = 32     # تنفيذ الدفعة فوراً إذا وصلت هذا العدد
+
+# فهرس سمعة الدومينات (قوائم إضافية: TLDs، مختصرات، حظر، انتحال)
+DOMAIN_DATA_DIR = "data/domains"
+
+# قائمة روابط التصيد المعروفة (Bloom filter + مصفوفة مرتبة عبر mmap)
+PHISH_FEED_DIR = "data/feeds"              # ملفات القوائم *.txt (رابط أو دومين في كل سطر)
+PHISH_FEED_INDEX = "models/phish_feed.idx"  # الفهرس الثنائي المبني منها
+PHISH_FEED_BITS_PER_ENTRY = 10             # حجم الـ Bloom (≈0.8% إيجابي كاذب)
+PHISH_FEED_RELOAD_SECONDS = 300            # فحص تحديث الملفات كل 5 دقائق
+
+# كشف انتحال البراندات بالتشابه (typosquat / homoglyph)
+BRANDS_PATH = "data/brands.csv"
+TYPO_MAX_DISTANCE = 2      # أقصى مسافة تعديل للأسماء الطويلة (القصيرة أقل)
+
+# تتبع سلسلة التوجيه
+REDIRECT_MAX_HOPS = 10     # أقصى عدد توجيهات نتبعها
+REDIRECT_CACHE_SIZE = 5000 # عدد الخطوات المحفوظة في الكاش
+REDIRECT_CACHE_TTL = 3600  # مدة صلاحية الخطوة (ثواني)
+
+# التحكم بالقبول وتخفيف الحمل
+RATE_LIMIT_PER_SECOND = 5.0  # معدل الطلبات لكل عميل
+RATE_LIMIT_BURST = 20        # أقصى دفعة طلبات متتالية لكل عميل
+RATE_LIMIT_MAX_CLIENTS = 10000
+# عناوين الـ proxy / load balancer الموثوقة: منها فقط نقبل X-Client-Id و X-Forwarded-For
+# (من غيرها الهوية = عنوان الاتصال)، مثلاً: AMAN_TRUSTED_PROXIES=10.0.0.0/8,127.0.0.1/32
+TRUSTED_PROXIES = [ipaddress.ip_network(n.strip()) for n in os.getenv("AMAN_TRUSTED_PROXIES", "").split(",") if n.strip()]
+MAX_IN_FLIGHT = 200          # فوق هذا العدد من التحليلات الجارية: 429
+DEGRADE_IN_FLIGHT = 100      # فوق هذا العدد: وضع مخفف (بدون فتح الروابط وبدون AI)
+DEGRADE_LAG_MS = 200         # تأخر الـ event loop للوضع المخفف (ملي ثانية)
+SHED_LAG_MS = 1000           # تأخر الـ event loop للرفض بـ 429
+RETRAIN_COOLDOWN = 300       # أقل مدة بين محاولتي إعادة تدريب تلقائي (ثواني)
+
+# طابور فتح الروابط
+LINK_FETCH_WORKERS = 16      # عدد الروابط اللي تنفتح بنفس الوقت
+LINK_FETCH_MAX_QUEUE = 1000  # أقصى عدد روابط تنتظر في الطابور
+LINK_FETCH_PER_HOST = 2      # أقصى طلبات متزامنة لنفس الدومين
+LINK_SCAN_MAX_URLS = 5       # أقصى روابط تُفحص لكل رسالة (نفس الحد للشكل والفتح)
+
+# ضغط الردود (gzip حسب Accept-Encoding)
+GZIP_MIN_SIZE = 1000         # الردود الأصغر ترسل بدون ضغط (بايت)
+GZIP_LEVEL = 5               # مستوى الضغط (1 أسرع ... 9 أصغر)
+
+# نوع نموذج ML (ml_backends.py): "forest" | "forest_small" | "linear"
+# يستخدمه السيرفر وإعادة التدريب و train.py (المقارنة: tools/bench_ml_backends.py)
+ML_BACKEND = "forest"
+
+# خط التدريب (training.py)
+TRAIN_N_JOBS = -1            # أشجار Random Forest بالتوازي (-1 = كل الأنوية)
+TRAIN_CV_WORKERS = None      # عمليات تقييم k-fold (None = عدد الأنوية)
+# طريقة إنشاء عمليات التقييم: forkserver آمنة داخل السيرفر (فيه خيوط)، و train.py يستخدم fork
+TRAIN_START_METHOD = "forkserver"
+TRAIN_CV_FOLDS = 5           # folds الافتراضية في python train.py
+TRAIN_SEARCH_MAX_CANDIDATES = 8  # أقصى عدد تركيبات في بحث الإعدادات
+TRAIN_SEARCH_GRID = {        # لـ forest و forest_small
+    "n_estimators": [100, 200],
+    "max_depth": [20, None],
+    "min_samples_leaf": [1, 2],
+}
+TRAIN_SEARCH_GRID_LINEAR = {  # لـ linear
+    "C": [1.0, 4.0, 16.0],
+}
+FEATURE_CACHE_DIR = "models/feature_cache"  # كاش مصفوفات TF-IDF (بمفتاح hash البيانات)
+FEATURE_CACHE_MAX = 20       # أقصى عدد ملفات في الكاش (0 = بدون كاش)
+
+# تقييم النموذج الجديد في الظل قبل اعتماده (shadow.py)
+SHADOW_ENABLED = True
+SHADOW_SAMPLE_RATE = 0.2         # نسبة الطلبات اللي يُقارن عليها النموذج الجديد
+SHADOW_MIN_SAMPLES = 200         # عدد العينات قبل القرار
+SHADOW_MAX_PENDING = 4           # أقصى مقارنات تنتظر (الزائد يُتجاهل تحت الضغط)
+SHADOW_MAX_ACCURACY_DROP = 0.02  # أقصى نزول مسموح في الدقة على جزء الاختبار
+SHADOW_MIN_AGREEMENT = 0.85      # أقل نسبة اتفاق مع النموذج الحالي
+SHADOW_MAX_LATENCY_MS = 50       # أقصى زمن p95 للاستدلال (ملي ثانية)
+SHADOW_MAX_LATENCY_RATIO = 1.5   # أقصى نسبة زمن p95 مقارنة بالنموذج الحالي
+SHADOW_MAX_SIZE_RATIO = 2.0      # أقصى نسبة حجم مقارنة بالنموذج الحالي
+
+# استقبال الإيميل الخام .eml (mime_ingest.py)
+EML_MAX_BYTES = 10 * 1024 * 1024   # أقصى حجم للرسالة كاملة مع المرفقات (أكبر = 413)
+EML_MAX_TEXT_BYTES = 512 * 1024    # أقصى نص يُحلل من أجزاء النص/HTML (الباقي يُتجاهل)
+EML_MAX_HEADER_BYTES = 64 * 1024   # أقصى حجم لهيدرات كل جزء
+EML_MAX_PARTS = 200                # أقصى عدد أجزاء MIME تُعالج
+EML_MAX_LINE = 64 * 1024           # السطر الأطول يُقسّم (حتى ما يتخزن سطر ضخم بالذاكرة)
+
+# التشغيل بعدة عمليات (prefork.py): python main.py --workers 4
+PREFORK_WORKERS = 1                # عدد العمليات الافتراضي (1 = عملية واحدة بدون prefork)
+PREFORK_READY_TIMEOUT = 60         # مهلة جاهزية العملية الجديدة (تحميل + تسخين)
+PREFORK_GRACEFUL_TIMEOUT = 30      # مهلة إنهاء الطلبات الجارية قبل إيقاف العملية
+PREFORK_MODEL_CHECK_INTERVAL = 5   # فحص تغيّر ملف النموذج (إعادة تشغيل متدرجة بعده)
+PREFORK_JOB_LINGER = 15            # العامل القديم يبقى يرد على نتائج مهامه بعد انتهائها (ثواني)
+SHUTDOWN_DRAIN_TIMEOUT = 20        # انتظار المهام الخلفية (فحص الروابط العميق) عند الإيقاف
+
+# سلاسل الردود (thread_segments.py): كاش نتائج كل مقطع مقتبس
+THREAD_CACHE_SIZE = 20000          # عدد المقاطع المحفوظة
+THREAD_CACHE_TTL = 1800            # مدة صلاحية نتيجة المقطع (ثواني)
+THREAD_MAX_SEGMENTS = 50           # أقصى عدد مقاطع لكل رسالة (الأقدم تندمج في مقطع واحد)
+
+# ميزانية التحليل (windowing.py): الرسالة الأطول تتحلل بنوافذ مجموعها ضمن الحد
+ANALYSIS_BUDGET_CHARS = 100_000    # أقصى نص يتحلل لكل رسالة (حرف)
+ANALYSIS_WINDOW_CHARS = 4000       # طول النافذة
+ANALYSIS_WINDOW_OVERLAP = 400      # التداخل بين النوافذ المتجاورة (جملة على الحد ما تضيع)
+ANALYSIS_URL_WINDOWS = 8           # نوافذ حول روابط N دومينات (الأقل تكراراً أولاً)
+ANALYSIS_SNAP_CHARS = 200          # أقصى تمدد لحد النافذة حتى ما تقطع كلمة أو رابط
+
+# مراقب توقف الـ event loop (loop_watchdog.py)
+WATCHDOG_INTERVAL = 0.1            # فترة النبضة لقياس تأخر الـ loop (ثواني)
+WATCHDOG_STALL_MS = 250            # تأخر النبضة اللي يُعتبر توقف (يُلتقط الـ stack)
+WATCHDOG_MAX_REPORTS = 50          # آخر التوقفات المحفوظة (GET /metrics/stalls)
+WATCHDOG_LAG_SAMPLES = 3000        # عينات التأخر للـ percentiles (~5 دقائق)
+WATCHDOG_STACK_DEPTH = 25          # عدد أسطر الـ stack في كل تقرير
+
+# تسجيل الطلبات لإعادتها (traffic_capture.py + tools/replay_traffic.py)
+CAPTURE_ENABLED = os.getenv("AMAN_CAPTURE", "") == "1"   # اختياري: AMAN_CAPTURE=1
+CAPTURE_TEXT = os.getenv("AMAN_CAPTURE_TEXT", "hash")     # hash / redact / full
+CAPTURE_PATH = "data/capture/traffic.jsonl"
+CAPTURE_MAX_BYTES = 50 * 1024 * 1024   # حجم الملف قبل التدوير
+CAPTURE_BACKUPS = 5                    # عدد الملفات القديمة المحفوظة (traffic.jsonl.1 ...)
+CAPTURE_SAMPLE_RATE = 1.0              # نسبة الطلبات المسجلة
+CAPTURE_MAX_TEXT_CHARS = 200_000       # أقصى نص يُحفظ لكل طلب (redact / full)
+
+# تجميع الحملات بالتشابه (campaigns.py): MinHash + LSH
+CAMPAIGN_PERMUTATIONS = 64         # طول توقيع MinHash
+CAMPAIGN_BANDS = 16                # أجزاء LSH (16 × 4 صفوف: تشابه ~0.5 فأكثر يصير مرشح)
+CAMPAIGN_SHINGLE_CHARS = 5         # طول الـ shingle بالحروف
+CAMPAIGN_SIMILARITY = 0.75         # أقل تشابه للانضمام لحملة
+CAMPAIGN_DUPLICATE_SIMILARITY = 0.95  # نسخة شبه متطابقة: ما تُخزن مرة ثانية
+CAMPAIGN_MALICIOUS_SCORE = 70      # حكم الحملة اللي تورثه رسائلها (بدون فتح روابط وبدون AI)
+CAMPAIGN_MAX_ENTRIES = 20000       # أقصى عدد رسائل في الفهرس (الأقدم تُحذف)
+CAMPAIGN_TTL = 6 * 3600            # مدة بقاء الرسالة في الفهرس (ثواني)
+CAMPAIGN_MIN_CHARS = 40            # النصوص الأقصر عامة جداً ("شكراً") وما تدخل الفهرس
+CAMPAIGN_MAX_CHARS = 20000         # أقصى نص يدخل في التوقيع
+CAMPAIGN_MAX_CANDIDATES = 64       # أقصى مرشحين يتقارنوا لكل رسالة
+
+# خط التحليل بتكلفة محسوبة (pipeline.py)
+PIPELINE_POLICY = os.getenv("AMAN_PIPELINE", "band")  # off / band / sequential
+# تكلفة كل مرحلة (تقديرية، ms من وقت المعالج والشبكة والـ API)
+PIPELINE_STAGE_COSTS = {"rules": 1, "ml": 2, "link_syntax": 1, "campaign": 1, "ai": 150, "link_deep": 400}
+# وزن كل مرحلة في النتيجة النهائية (يتوزع على المراحل اللي رجعت نتيجة)
+FUSION_WEIGHTS = {"rule": 0.25, "ml": 0.25, "ai": 0.2, "link": 0.3}
+DANGEROUS_PAGE_SCORE = 75          # أقل نتيجة إذا رابط فتح صفحة دفع / دخول خطيرة
+
+# كاش DNS وحماية العناوين الداخلية لفتح الروابط (dns_guard.py)
+DNS_CACHE_SIZE = 10000             # عدد الدومينات المحفوظة
+DNS_MIN_TTL = 30                   # أقل مدة صلاحية (ثواني) حتى لو TTL السجل أقل
+DNS_MAX_TTL = 3600                 # أقصى مدة صلاحية حتى لو TTL السجل أطول
+DNS_DEFAULT_TTL = 300              # بدون aiodns (getaddrinfo ما يرجع TTL)
+DNS_NEGATIVE_TTL = 60              # مدة حفظ الدومين غير الموجود / الاستعلام الفاشل
+DNS_TIMEOUT = 5.0                  # أقصى زمن للاستعلام (ثواني)
+DNS_TIMING_SAMPLES = 2000          # عينات زمن الاستعلام للـ percentiles
+# شبكات داخلية مسموحة رغم الحماية (للاختبار المحلي فقط)، مثلاً: AMAN_DNS_ALLOW=127.0.0.1/32
+DNS_ALLOWED_NETWORKS = [ipaddress.ip_network(n.strip()) for n in os.getenv("AMAN_DNS_ALLOW", "").split(",") if n.strip()]
@@ -0,0 +1,369 @@
+"""
+كاش DNS وحماية العناوين الداخلية لفتح الروابط
+Async DNS Cache + Private-Address Guard
+
+مشكلتين في فتح الروابط:
+1. كل فتح رابط = استعلام DNS جديد (httpx ما يحفظ شيء)، حتى لو نفس الدومين
+   انفتح قبل ثانية في رسالة ثانية من نفس الحملة
+2. رابط في رسالة يقدر يوجه السيرفر لـ 127.0.0.1 أو شبكة داخلية (10.x، 192.168.x)
+   أو عنوان metadata السحابة (169.254.169.254) ← السيرفر يفتح صفحات داخلية
+   (SSRF). فحص شكل الرابط يكشف IP مكتوب صريح فقط، مو دومين يرجع IP داخلي
+
+الحل: طبقة اتصال (network backend) تحت httpx:
+- كل اتصال TCP يمر على resolve(): كاش حسب TTL السجل (بين DNS_MIN_TTL و DNS_MAX_TTL)،
+  والفشل / الدومين غير الموجود يُحفظ DNS_NEGATIVE_TTL (كاش سلبي)
+- نفس الدومين قيد الاستعلام؟ الطلب الثاني ينتظر نفس النتيجة
+- بعد الاستعلام: أي عنوان داخلي (private / loopback / link-local / ...) ← رفض الدومين كله
+- الاتصال يروح للـ IP اللي تم فحصه نفسه (مو للاسم) فـ DNS rebinding ما يفيد
+  (ما فيه استعلام ثاني بين الفحص والاتصال)، و TLS يتحقق من اسم الدومين الأصلي
+- كل خطوة توجيه = اتصال جديد عبر نفس الطبقة ← التوجيه لعنوان داخلي ينرفض بعد
+- زمن الاستعلامات والكاش والحظر في /metrics
+
+aiodns (اختياري) يعطي TTL السجل الحقيقي، وبدونه getaddrinfo بـ DNS_DEFAULT_TTL.
+ملاحظة: مع HTTP_PROXY الاتصال يروح للـ proxy وهو اللي يستعلم عن الدومين
+(proxy_mounts)، والدومينات في NO_PROXY تمر على الحماية هنا.
+"""
+
+import asyncio
+import ipaddress
+import socket
+import time
+import urllib.request
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+import httpcore
+import httpx
+
+from config import (DNS_CACHE_SIZE, DNS_MIN_TTL, DNS_MAX_TTL, DNS_DEFAULT_TTL, DNS_NEGATIVE_TTL,
+                    DNS_TIMEOUT, DNS_ALLOWED_NETWORKS, DNS_TIMING_SAMPLES)
+
+try:
+    import aiodns
+except ImportError:  # اختياري
+    aiodns = None
+
+# شبكات ما يكشفها ipaddress كـ private (تصنيف واضح في المقاييس والرسائل)
+SHARED_NETWORK = ipaddress.ip_network("100.64.0.0/10")   # CGNAT
+METADATA_IPS = {ipaddress.ip_address("169.254.169.254"), ipaddress.ip_address("fd00:ec2::254")}
+
+REASON_LABELS = {
+    "loopback": "عنوان الجهاز نفسه",
+    "private": "شبكة داخلية",
+    "link_local": "عنوان محلي",
+    "metadata": "عنوان بيانات السحابة",
+    "reserved": "عنوان محجوز"
+}
+
+
+class AddressBlocked(Exception):
+    """الدومين يرجع عنوان داخلي: ما نتصل فيه"""
+
+    def __init__(self, host: str, address: str, reason: str):
+        super().__init__(f"{host} → {address} ({reason})")
+        self.host = host
+        self.address = address
+        self.reason = reason
+
+
+class ResolutionFailed(httpcore.ConnectError):
+    """الدومين غير موجود أو الاستعلام فشل (httpx يحولها لـ ConnectError)"""
+
+
+def blocked_reason(address: str) -> Optional[str]:
+    """سبب رفض العنوان (None = عنوان عام)"""
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    if any(ip in network for network in DNS_ALLOWED_NETWORKS):
+        return None
+    if ip in METADATA_IPS:
+        return "metadata"
+    if ip.is_loopback:
+        return "loopback"
+    if ip.is_link_local:
+        return "link_local"
+    if ip.is_private or ip in SHARED_NETWORK:
+        return "private"
+    if not ip.is_global or ip.is_multicast:
+        return "reserved"
+    return None
+
+
+def _ip_literal(host: str) -> Optional[str]:
+    try:
+        return str(ipaddress.ip_address(host.strip("[]")))
+    except ValueError:
+        return None
+
+
+class DnsResolver:
+    """استعلام DNS غير متزامن مع كاش (TTL + سلبي) وفحص العناوين"""
+
+    def __init__(self, cache_size: int = DNS_CACHE_SIZE, min_ttl: float = DNS_MIN_TTL,
+                 max_ttl: float = DNS_MAX_TTL, negative_ttl: float = DNS_NEGATIVE_TTL):
+        self.cache_size = cache_size
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        # دومين ← (العناوين أو None للفشل، السبب، وقت الانتهاء)
+        self._cache: "OrderedDict[str, Tuple[Optional[List[str]], str, float]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._resolver = None
+        self._timings = deque(maxlen=DNS_TIMING_SAMPLES)
+        self.max_resolve_ms = 0.0
+        self.stats = {"lookups": 0, "cache_hits": 0, "negative_hits": 0, "shared": 0, "resolved": 0,
+                      "not_found": 0, "failures": 0, "blocked": 0}
+        self.blocked_by_reason: Dict[str, int] = {}
+
+    # ---------- الاستعلام ----------
+    async def resolve(self, host: str) -> List[str]:
+        """
+        عناوين الدومين بعد الفحص (للاتصال بها مباشرة)
+
+        Raises:
+            AddressBlocked: عنوان داخلي (مكتوب صريح أو من DNS)
+            ResolutionFailed: الدومين غير موجود / الاستعلام فشل
+        """
+        self.stats["lookups"] += 1
+        literal = _ip_literal(host)
+        if literal:
+            return self._check(host, [literal])
+
+        host = host.lower().rstrip(".")
+        entry = self._cache_get(host)
+        if entry is None:
+            future = self._in_flight.get(host)
+            if future is not None:
+                self.stats["shared"] += 1
+                entry = await asyncio.shield(future)
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._in_flight[host] = future
+                try:
+                    entry = await self._lookup(host)
+                    future.set_result(entry)
+                except BaseException as e:
+                    future.set_exception(e)
+                    future.exception()  # ما ننتظرها أحد؟ بدون تحذير "never retrieved"
+                    raise
+                finally:
+                    del self._in_flight[host]
+        elif entry[0] is None:
+            self.stats["negative_hits"] += 1
+        else:
+            self.stats["cache_hits"] += 1
+
+        addresses, reason, _ = entry
+        if addresses is None:
+            raise ResolutionFailed(f"تعذر استعلام {host} ({reason})")
+        return self._check(host, addresses)
+
+    async def _lookup(self, host: str) -> Tuple[Optional[List[str]], str, float]:
+        """استعلام فعلي + حفظ النتيجة (أو الفشل) في الكاش"""
+        start = time.perf_counter()
+        try:
+            addresses, ttl = await asyncio.wait_for(self._query(host), DNS_TIMEOUT)
+            self.stats["resolved"] += 1
+            reason = "ok"
+        except (LookupError, socket.gaierror):
+            addresses, ttl, reason = None, self.negative_ttl, "not_found"
+            self.stats["not_found"] += 1
+        except (OSError, asyncio.TimeoutError) as e:
+            addresses, ttl, reason = None, self.negative_ttl, type(e).__name__
+            self.stats["failures"] += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        self._timings.append(elapsed)
+        self.max_resolve_ms = max(self.max_resolve_ms, round(elapsed, 1))
+
+        if addresses is not None:
+            ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        entry = (addresses, reason, time.monotonic() + ttl)
+        self._cache_put(host, entry)
+        return entry
+
+    async def _query(self, host: str) -> Tuple[List[str], float]:
+        """(العناوين، TTL) من aiodns إذا موجود، وإلا getaddrinfo"""
+        if aiodns is not None:
+            if self._resolver is None:
+                self._resolver = aiodns.DNSResolver()
+            answers = await asyncio.gather(self._resolver.query(host, "A"), self._resolver.query(host, "AAAA"),
+                                           return_exceptions=True)
+            records = [r for answer in answers if isinstance(answer, list) for r in answer]
+            if records:
+                return list(dict.fromkeys(r.host for r in records)), min(r.ttl for r in records)
+            if all(isinstance(a, aiodns.error.DNSError) for a in answers):
+                raise LookupError(host)
+            raise OSError(f"DNS query failed for {host}")
+
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            raise LookupError(host)
+        return addresses, DNS_DEFAULT_TTL
+
+    def _check(self, host: str, addresses: List[str]) -> List[str]:
+        """أي عنوان داخلي ← رفض الدومين كله (الخلط بين عام وداخلي حيلة rebinding)"""
+        for address in addresses:
+            reason = blocked_reason(address)
+            if reason:
+                self.stats["blocked"] += 1
+                self.blocked_by_reason[reason] = self.blocked_by_reason.get(reason, 0) + 1
+                raise AddressBlocked(host, address, reason)
+        return addresses
+
+    # ---------- الكاش ----------
+    def _cache_get(self, host: str) -> Optional[Tuple[Optional[List[str]], str, float]]:
+        entry = self._cache.get(host)
+        if entry is None:
+            return None
+        if time.monotonic() > entry[2]:
+            del self._cache[host]
+            return None
+        self._cache.move_to_end(host)
+        return entry
+
+    def _cache_put(self, host: str, entry: Tuple[Optional[List[str]], str, float]):
+        self._cache[host] = entry
+        self._cache.move_to_end(host)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # ---------- المقاييس ----------
+    def get_stats(self) -> Dict:
+        timings = sorted(self._timings)
+
+        def percentile(p: float) -> float:
+            return round(timings[min(int(len(timings) * p / 100), len(timings) - 1)], 1) if timings else 0.0
+
+        return {
+            "backend": "aiodns" if aiodns is not None else "getaddrinfo",
+            "cache_size": len(self._cache),
+            **self.stats,
+            "resolve_ms": {"p50": percentile(50), "p95": percentile(95)},
+            "max_resolve_ms": self.max_resolve_ms,
+            "blocked_by_reason": dict(self.blocked_by_reason)
+        }
+
+
+class GuardedBackend(httpcore.AsyncNetworkBackend):
+    """طبقة اتصال httpcore: الاسم ← resolve() ← اتصال بالـ IP المفحوص"""
+
+    def __init__(self, resolver: DnsResolver):
+        self.resolver = resolver
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options=None):
+        addresses = await self.resolver.resolve(host)
+        error = httpcore.ConnectError(f"no addresses for {host}")
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout=timeout, local_address=local_address,
+                                                       socket_options=socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+def proxy_mounts() -> Dict[str, Optional[httpx.AsyncHTTPTransport]]:
+    """
+    HTTP_PROXY / HTTPS_PROXY / NO_PROXY للـ client
+
+    httpx يتجاهلها إذا أعطيناه transport، فنركبها هنا: الروابط تروح للـ proxy،
+    والمستثناة (NO_PROXY، القيمة None) ترجع للـ transport المحمي
+    """
+    proxies = urllib.request.getproxies()
+    mounts: Dict[str, Optional[httpx.AsyncHTTPTransport]] = {
+        f"{scheme}://": httpx.AsyncHTTPTransport(proxy=httpx.Proxy(proxies[scheme]))
+        for scheme in ("http", "https") if scheme in proxies
+    }
+    for host in proxies.get("no", "").split(","):
+        host = host.strip()
+        if host == "*":
+            return {}
+        if host:
+            mounts[f"all://{host}"] = None
+    return mounts
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    """جسم الرد من httpcore بأخطاء httpx (مثل ReadTimeout أثناء القراءة)"""
+
+    def __init__(self, stream, request: httpx.Request):
+        self._stream = stream
+        self._request = request
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except Exception as e:
+            raise _httpx_error(e, self._request) from e
+
+    async def aclose(self):
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+
+def _httpx_error(error: Exception, request: httpx.Request) -> Exception:
+    """خطأ httpcore ← نفس الاسم في httpx (ConnectError، ReadTimeout ...)، والباقي كما هو"""
+    for cls in type(error).__mro__:
+        mapped = getattr(httpx, cls.__name__, None)
+        if cls.__module__.startswith("httpcore") and isinstance(mapped, type) \
+                and issubclass(mapped, httpx.TransportError):
+            return mapped(str(error), request=request)
+    return error
+
+
+class GuardedTransport(httpx.AsyncBaseTransport):
+    """
+    transport لـ httpx.AsyncClient: pool من httpcore مبني صراحة بطبقة الاتصال
+    المحمية (network_backend)، بدون تعديل داخليات httpx
+    """
+
+    def __init__(self, resolver: "DnsResolver",
+                 limits: httpx.Limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)):
+        # نفس حدود httpx الافتراضية
+        self.backend = GuardedBackend(resolver)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=self.backend
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host,
+                             port=request.url.port, target=request.url.raw_path),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions
+        )
+        try:
+            response = await self._pool.handle_async_request(core_request)
+        except Exception as e:
+            raise _httpx_error(e, request) from e
+        return httpx.Response(status_code=response.status, headers=response.headers,
+                              stream=_ResponseStream(response.stream, request), extensions=response.extensions)
+
+    async def aclose(self):
+        await self._pool.aclose()
+
+
+def guarded_transport(resolver: Optional["DnsResolver"] = None) -> GuardedTransport:
+    """transport لـ httpx.AsyncClient يتصل عبر الكاش والفحص"""
+    return GuardedTransport(resolver or dns_resolver)
+
+
+# instance واحد للسيرفر
+dns_resolver = DnsResolver()
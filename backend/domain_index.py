@@ -0,0 +1,225 @@
+"""
+فهرس سمعة الدومينات
+Domain Reputation Index
+
+بدل المرور على كل القوائم بـ in / endswith (بطيء مع القوائم الكبيرة
+ويخطئ: 't.co' موجودة داخل 'microsoft.com')، نبني فهارس جاهزة:
+
+1. SuffixIndex: مطابقة الدومين أو أحد آبائه، label بـ label من اليمين
+   (TLD، النطاقات المحظورة، الروابط المختصرة)
+2. PatternMatcher: Aho-Corasick لكشف كل أسماء الانتحال بمرور واحد على الدومين
+
+تكلفة البحث تعتمد على طول الدومين فقط، مو على حجم القوائم.
+
+ملفات البيانات (سطر لكل عنصر، # للتعليقات) في data/domains/:
+    suspicious_tlds.txt, url_shorteners.txt, blocked_domains.txt, brand_fakes.csv
+"""
+
+import csv
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import DOMAIN_DATA_DIR
+
+
+def normalize_host(host: str) -> str:
+    """تصغير الأحرف وحذف النقطة الأخيرة والمنفذ"""
+    host = (host or "").strip().lower().rstrip(".")
+    if host.startswith("[") or host.count(":") > 1:
+        return host  # IPv6
+    return host.split(":", 1)[0]
+
+
+class SuffixIndex:
+    """
+    فهرس لاحقات الدومين
+
+    نخزن كل دومين كما هو، والبحث يمشي على labels الدومين من اليمين
+    (com ← example.com ← www.example.com) ويرجع أطول تطابق.
+    عدد عمليات البحث = عدد الـ labels، مهما كبرت القائمة.
+    """
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self._entries: Dict[str, str] = {}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, domain: str, value: Optional[str] = None):
+        domain = normalize_host(domain).lstrip(".")
+        if domain:
+            self._entries[domain] = value if value is not None else domain
+
+    def match(self, host: str) -> Optional[Tuple[str, str]]:
+        """أطول لاحقة موجودة في الفهرس (suffix, value) أو None"""
+        labels = normalize_host(host).split(".")
+        best = None
+        for i in range(len(labels) - 1, -1, -1):
+            suffix = ".".join(labels[i:])
+            value = self._entries.get(suffix)
+            if value is not None:
+                best = (suffix, value)
+        return best
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick: البحث عن كل الأنماط داخل نص بمرور واحد
+
+    يُستخدم لأسماء الانتحال (paypa1، app1e ...) اللي ممكن تظهر
+    في أي مكان داخل الدومين.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str]]] = [[]]
+        self._built = True
+
+    def add(self, pattern: str, value: str):
+        pattern = pattern.lower()
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((pattern, value))
+        self._built = False
+
+    def build(self):
+        """حساب روابط الفشل (BFS)"""
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def find_all(self, text: str) -> List[Tuple[str, str]]:
+        """كل (pattern, value) الموجودة في النص"""
+        if not self._built:
+            self.build()
+        found = []
+        node = 0
+        for ch in text.lower():
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            if self._out[node]:
+                found.extend(self._out[node])
+        return found
+
+
+def read_list_file(path: str) -> List[str]:
+    """قراءة ملف قائمة (سطر لكل عنصر، تجاهل الفراغات و #)"""
+    if not os.path.exists(path):
+        return []
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                items.append(line)
+    return items
+
+
+def read_brand_file(path: str) -> Dict[str, List[str]]:
+    """قراءة brand_fakes.csv بالأعمدة brand,fake"""
+    brands: Dict[str, List[str]] = {}
+    if not os.path.exists(path):
+        return brands
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(line for line in f if not line.lstrip().startswith("#")):
+            brand, fake = (row.get("brand") or "").strip(), (row.get("fake") or "").strip()
+            if brand and fake:
+                brands.setdefault(brand, []).append(fake)
+    return brands
+
+
+class DomainIndex:
+    """كل فهارس سمعة الدومين في مكان واحد"""
+
+    def __init__(self):
+        self.tlds = SuffixIndex()
+        self.shorteners = SuffixIndex()
+        self.blocked = SuffixIndex()
+        self.brand_fakes = PatternMatcher()
+        self.brand_count = 0
+
+    @classmethod
+    def build(cls, tlds: Iterable[str] = (), shorteners: Iterable[str] = (),
+              brands: Optional[Dict[str, List[str]]] = None, blocked: Iterable[str] = (),
+              data_dir: Optional[str] = DOMAIN_DATA_DIR) -> "DomainIndex":
+        """بناء الفهرس من القوائم المدمجة + ملفات البيانات (إن وجدت)"""
+        index = cls()
+        brands = {brand: list(fakes) for brand, fakes in (brands or {}).items()}
+        tlds, shorteners, blocked = list(tlds), list(shorteners), list(blocked)
+
+        if data_dir:
+            tlds += read_list_file(os.path.join(data_dir, "suspicious_tlds.txt"))
+            shorteners += read_list_file(os.path.join(data_dir, "url_shorteners.txt"))
+            blocked += read_list_file(os.path.join(data_dir, "blocked_domains.txt"))
+            for brand, fakes in read_brand_file(os.path.join(data_dir, "brand_fakes.csv")).items():
+                brands.setdefault(brand, []).extend(fakes)
+
+        for tld in tlds:
+            tld = tld.strip().lower().lstrip(".")
+            index.tlds.add(tld, "." + tld)
+        for domain in shorteners:
+            index.shorteners.add(domain)
+        for domain in blocked:
+            index.blocked.add(domain)
+        for brand, fakes in brands.items():
+            for fake in fakes:
+                index.brand_fakes.add(fake, brand)
+        index.brand_fakes.build()
+        index.brand_count = len(brands)
+        return index
+
+    def suspicious_tld(self, host: str) -> Optional[str]:
+        """الـ TLD المشبوه (مثل '.xyz') أو None"""
+        match = self.tlds.match(host)
+        return match[1] if match else None
+
+    def is_shortener(self, host: str) -> bool:
+        """الدومين نفسه أو أحد آبائه خدمة اختصار (t.co ✓ / microsoft.com ✗)"""
+        return self.shorteners.match(host) is not None
+
+    def blocked_domain(self, host: str) -> Optional[str]:
+        """النطاق المحظور المطابق أو None"""
+        match = self.blocked.match(host)
+        return match[0] if match else None
+
+    def impersonated_brands(self, host: str) -> List[str]:
+        """البراندات اللي يحاول الدومين انتحالها (بالترتيب، بدون تكرار)"""
+        brands = []
+        for _, brand in self.brand_fakes.find_all(normalize_host(host)):
+            if brand not in brands:
+                brands.append(brand)
+        return brands
+
+    def get_stats(self) -> Dict:
+        return {
+            "suspicious_tlds": len(self.tlds),
+            "shorteners": len(self.shorteners),
+            "blocked_domains": len(self.blocked),
+            "brands": self.brand_count
+        }
@@ -0,0 +1,159 @@
+"""
+مخزن التحليلات المؤجلة
+Deferred Analysis Store
+
+الوضع السريع يرجع حكماً أولياً فوراً، والفحص العميق (الروابط + AI)
+يكمل في الخلفية ويحفظ الحكم المحدّث هنا حتى يجلبه العميل.
+
+وضع async يرجع رقم المهمة مباشرة، وكل مرحلة تنتهي تضيف حدث (event)
+يقدر العميل يتابعه بالـ polling أو Server-Sent Events.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config import JOB_MAX_STORED, JOB_TTL_SECONDS, JOB_MAX_ACTIVE
+
+
+class JobLimitError(Exception):
+    """تم الوصول للحد الأقصى من المهام الجارية"""
+
+
+class JobStore:
+    """تخزين محدود الحجم مع انتهاء صلاحية للنتائج المؤجلة"""
+
+    def __init__(self, max_jobs: int = JOB_MAX_STORED, ttl_seconds: int = JOB_TTL_SECONDS,
+                 max_active: int = JOB_MAX_ACTIVE):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self.max_active = max_active
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        # إشارة لكل مهمة توقظ من ينتظر أحداث جديدة (SSE)
+        self._signals: Dict[str, asyncio.Event] = {}
+        self.rejected = 0
+        # بداية رقم المهمة (العامل ومنفذ مهامه عند التشغيل بعدة عمليات: w1-41733-...)
+        self.id_prefix = ""
+
+    @property
+    def last_update(self) -> Optional[float]:
+        """آخر تحديث لأي مهمة (None = ما فيه مهام)"""
+        return max((job["updated_at"] for job in self._jobs.values()), default=None)
+
+    @property
+    def active_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["status"] == "pending")
+
+    def create(self, result: Optional[Dict] = None) -> str:
+        """إنشاء تحليل مؤجل جديد وإرجاع رقمه"""
+        self._evict()
+        if self.active_count >= self.max_active:
+            self.rejected += 1
+            raise JobLimitError(f"الحد الأقصى {self.max_active} مهمة جارية")
+
+        job_id = self.id_prefix + uuid.uuid4().hex
+        now = time.time()
+        self._jobs[job_id] = {
+            "id": job_id,
+            "status": "pending",
+            "result": result,
+            "events": [],
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        self._signals[job_id] = asyncio.Event()
+        return job_id
+
+    def add_event(self, job_id: str, stage: str, data: Dict):
+        """إضافة نتيجة مرحلة (rules / ml / link / ai / final)"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job["events"].append({
+            "seq": len(job["events"]),
+            "stage": stage,
+            "data": data,
+            "elapsed_ms": int((time.time() - job["created_at"]) * 1000)
+        })
+        job["updated_at"] = time.time()
+        self._notify(job_id)
+
+    def finish(self, job_id: str, result: Dict):
+        """حفظ الحكم النهائي"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job["status"] = "done"
+        job["result"] = result
+        job["updated_at"] = time.time()
+        self._notify(job_id)
+
+    def fail(self, job_id: str, error: str):
+        """تسجيل فشل الفحص العميق (يبقى الحكم الأولي)"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job["status"] = "failed"
+        job["error"] = error
+        job["updated_at"] = time.time()
+        self._notify(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """جلب حالة التحليل (None إذا انتهت صلاحيته)"""
+        self._evict()
+        return self._jobs.get(job_id)
+
+    def events_since(self, job_id: str, seq: int = 0) -> List[Dict]:
+        """الأحداث الجديدة بعد رقم معين"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return []
+        return job["events"][seq:]
+
+    async def wait_for_update(self, job_id: str, seen: int, timeout: float) -> bool:
+        """انتظار حدث بعد رقم seen أو انتهاء المهمة (False عند انتهاء المهلة)"""
+        job = self._jobs.get(job_id)
+        signal = self._signals.get(job_id)
+        if job is None or signal is None:
+            return False
+        if len(job["events"]) > seen or job["status"] != "pending":
+            return True
+        try:
+            await asyncio.wait_for(signal.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def get_stats(self) -> Dict:
+        return {
+            "stored": len(self._jobs),
+            "active": self.active_count,
+            "max_active": self.max_active,
+            "rejected": self.rejected
+        }
+
+    def _notify(self, job_id: str):
+        # نوقظ المنتظرين ثم نجهز إشارة جديدة للحدث التالي
+        signal = self._signals.get(job_id)
+        if signal is not None:
+            signal.set()
+            self._signals[job_id] = asyncio.Event()
+
+    def _evict(self):
+        """حذف المنتهية صلاحيتها ثم الأقدم إذا امتلأ المخزن"""
+        cutoff = time.time() - self.ttl_seconds
+        while self._jobs:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest["created_at"] >= cutoff and len(self._jobs) < self.max_jobs:
+                break
+            self._jobs.pop(oldest_id)
+            signal = self._signals.pop(oldest_id, None)
+            if signal is not None:
+                signal.set()
+
+
+# instance واحد للسيرفر
+jobs = JobStore()
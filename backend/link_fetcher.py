@@ -0,0 +1,179 @@
+"""
+طابور فتح الروابط
+Link-Fetch Worker Pool
+
+لما توصل حملة تصيد لآلاف الإيميلات بنفس الوقت، كل طلب /analyze كان
+يفتح نفس الرابط بنفسه ← ضغط على الشبكة وعلى الموقع المفحوص.
+
+الحل:
+1. عدد ثابت من العمال (workers) يفتحون الروابط من طابور محدود
+2. رابط قيد الفتح حالياً؟ الطلب الجديد ينتظر نفس النتيجة بدل فتحه مرة ثانية
+3. عدالة بين الدومينات: الطابور مقسوم حسب الدومين ويُخدم بالتناوب
+   (round-robin) مع حد أقصى للطلبات المتزامنة لكل دومين، فدومين واحد
+   عليه آلاف الروابط ما يحجز كل العمال
+4. مقاييس الطابور (العمق، وقت الانتظار، التكرارات المدموجة) في /metrics
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from config import LINK_FETCH_WORKERS, LINK_FETCH_MAX_QUEUE, LINK_FETCH_PER_HOST
+
+
+class LinkQueueFull(Exception):
+    """الطابور ممتلئ (الطلب يكمل بدون فتح الرابط)"""
+
+
+class LinkFetchStopped(LinkQueueFull):
+    """العمال توقفوا قبل ما يكمل الفتح (إغلاق السيرفر): نفس معاملة الطابور الممتلئ"""
+
+
+class LinkFetcher:
+    """عمال فتح الروابط مع دمج الطلبات المكررة وجدولة عادلة بين الدومينات"""
+
+    def __init__(self, fetch_fn: Callable[[str], Awaitable[Dict]], workers: int = LINK_FETCH_WORKERS,
+                 max_queue: int = LINK_FETCH_MAX_QUEUE, per_host: int = LINK_FETCH_PER_HOST):
+        self.fetch_fn = fetch_fn
+        self.workers = workers
+        self.max_queue = max_queue
+        self.per_host = per_host
+        self._pending: "OrderedDict[str, Deque[Tuple[str, float]]]" = OrderedDict()  # دومين ← (رابط، وقت الدخول)
+        self._in_flight: Dict[str, asyncio.Future] = {}   # رابط ← النتيجة المنتظرة (في الطابور أو قيد الفتح)
+        self._host_active: Dict[str, int] = {}
+        self._queued = 0
+        self._active = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = []
+        self._started = 0
+        self._wait_total_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.stats = {"requests": 0, "fetched": 0, "deduplicated": 0, "rejected": 0, "errors": 0}
+
+    def _ensure_started(self):
+        """تشغيل العمال عند أول طلب (في الـ event loop الحالي)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._pending.clear()
+        self._in_flight.clear()
+        self._host_active.clear()
+        self._queued = self._active = 0
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def fetch(self, url: str) -> Dict:
+        """
+        نتيجة فتح الرابط (نسخة خاصة بالمستدعي)
+
+        Raises:
+            LinkQueueFull: الطابور ممتلئ
+        """
+        self._ensure_started()
+        self.stats["requests"] += 1
+
+        future = self._in_flight.get(url)
+        if future is not None:
+            self.stats["deduplicated"] += 1
+        else:
+            if self._queued >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise LinkQueueFull(url)
+            future = self._loop.create_future()
+            self._in_flight[url] = future
+            host = (urlparse(url).hostname or "").lower()
+            self._pending.setdefault(host, deque()).append((url, time.perf_counter()))
+            self._queued += 1
+            self._wakeup.set()
+
+        # shield: إلغاء طلب واحد ما يلغي الفتح المشترك
+        result = await asyncio.shield(future)
+        return dict(result)
+
+    def _next_job(self) -> Optional[Tuple[str, str, float]]:
+        """أول دومين بالدور ما وصل حده، ثم ينتقل لآخر الدور"""
+        for host, queue in self._pending.items():
+            if self._host_active.get(host, 0) >= self.per_host:
+                continue
+            url, enqueued_at = queue.popleft()
+            if queue:
+                self._pending.move_to_end(host)
+            else:
+                del self._pending[host]
+            self._queued -= 1
+            return host, url, enqueued_at
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            host, url, enqueued_at = job
+            wait_ms = (time.perf_counter() - enqueued_at) * 1000
+            self._started += 1
+            self._wait_total_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self._host_active[host] = self._host_active.get(host, 0) + 1
+            self._active += 1
+
+            future = self._in_flight[url]
+            try:
+                result = await self.fetch_fn(url)
+                future.set_result(result)
+                self.stats["fetched"] += 1
+            except asyncio.CancelledError:
+                # المنتظرين عبر shield ما يعلقون حتى مهلتهم
+                if not future.done():
+                    future.set_exception(LinkFetchStopped(url))
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                future.set_exception(e)
+            finally:
+                # منع تحذير "exception never retrieved" إذا ما بقي أحد ينتظر
+                if future.done() and not future.cancelled():
+                    future.exception()
+                del self._in_flight[url]
+                self._active -= 1
+                self._host_active[host] -= 1
+                if not self._host_active[host]:
+                    del self._host_active[host]
+                # دومين كان واصل حده صار عنده مكان
+                self._wakeup.set()
+
+    async def close(self):
+        """إيقاف العمال (عند إغلاق السيرفر)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # روابط في الطابور ما بدأ فتحها
+        for url, future in self._in_flight.items():
+            if not future.done():
+                future.set_exception(LinkFetchStopped(url))
+                future.exception()
+        self._in_flight.clear()
+        self._pending.clear()
+        self._queued = 0
+        self._loop = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "per_host": self.per_host,
+            "queue_depth": self._queued,
+            "queue_max": self.max_queue,
+            "hosts_waiting": len(self._pending),
+            "active_fetches": self._active,
+            "avg_queue_wait_ms": round(self._wait_total_ms / self._started, 1) if self._started else 0.0,
+            "max_queue_wait_ms": round(self.max_wait_ms, 1),
+            **self.stats
+        }
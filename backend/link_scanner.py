@@ -9,12 +9,22 @@
 4. 🆕 وصف واضح للمستخدم بالعربي
 """
 
+import asyncio
 import re
 import httpx
 from urllib.parse import urlparse
-from typing import List, Dict
+from typing import List, Dict, Callable, Optional
 from bs4 import BeautifulSoup
 
+from domain_index import DomainIndex
+from phish_feed import phish_feed
+from typosquat import TyposquatIndex
+from redirects import redirect_resolver
+from link_fetcher import LinkFetcher, LinkQueueFull
+from loop_watchdog import staged
+from config import LINK_SCAN_MAX_URLS
+from dns_guard import AddressBlocked, REASON_LABELS, blocked_reason, guarded_transport, proxy_mounts
+
 # ==================== الدومينات المشبوهة ====================
 SUSPICIOUS_TLDS = ['.xyz', '.top', '.click', '.loan', '.work', '.date', '.racing', '.download', '.gdn', '.win', '.bid', '.trade']
 
@@ -35,6 +45,15 @@ TARGETED_BRANDS = {
 }
 
 
+# فهرس البحث السريع (القوائم أعلاه + ملفات data/domains/)
+domain_index = DomainIndex.build(SUSPICIOUS_TLDS, URL_SHORTENERS, TARGETED_BRANDS)
+
+# كشف الانتحال بالتشابه (data/brands.csv)
+typosquat_index = TyposquatIndex.from_file()
+TYPOSQUAT_SCORES = {"homoglyph": 40, "typo": 30, "brand_in_domain": 25}
+TYPOSQUAT_LABELS = {"homoglyph": "حروف متشابهة", "typo": "خطأ إملائي متعمد", "brand_in_domain": "اسم البراند في دومين غير رسمي"}
+
+
 def extract_urls(text: str) -> List[str]:
     """استخراج كل الروابط من النص"""
     url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
@@ -56,35 +75,52 @@ def analyze_url_syntax(url: str) -> Dict:
         "domain": "",
         "is_shortened": False,
         "is_suspicious_tld": False,
-        "impersonating": None
+        "impersonating": None,
+        "known_phishing": None
     }
     
     try:
+        # قائمة التصيد المعروفة أولاً (O(1) قبل أي شي ثاني)
+        known = phish_feed.lookup(url)
+        if known:
+            result["known_phishing"] = known
+            result["risk_score"] += 100
+            result["flags"].append("رابط احتيال معروف (من قائمة التصيد)")
+        
         parsed = urlparse(url)
         domain = parsed.netloc.lower()
+        host = parsed.hostname or domain
         result["domain"] = domain
         
-        for tld in SUSPICIOUS_TLDS:
-            if domain.endswith(tld):
-                result["is_suspicious_tld"] = True
-                result["risk_score"] += 25
-                result["flags"].append(f"نطاق مشبوه ({tld})")
-                break
+        tld = domain_index.suspicious_tld(host)
+        if tld:
+            result["is_suspicious_tld"] = True
+            result["risk_score"] += 25
+            result["flags"].append(f"نطاق مشبوه ({tld})")
         
-        for shortener in URL_SHORTENERS:
-            if shortener in domain:
-                result["is_shortened"] = True
-                result["risk_score"] += 20
-                result["flags"].append("رابط مختصر يخفي الوجهة")
-                break
+        if domain_index.is_shortener(host):
+            result["is_shortened"] = True
+            result["risk_score"] += 20
+            result["flags"].append("رابط مختصر يخفي الوجهة")
+        
+        blocked = domain_index.blocked_domain(host)
+        if blocked:
+            result["risk_score"] += 60
+            result["flags"].append(f"نطاق في قائمة الحظر ({blocked})")
         
-        for brand, fakes in TARGETED_BRANDS.items():
-            for fake in fakes:
-                if fake in domain:
-                    result["impersonating"] = brand
-                    result["risk_score"] += 40
-                    result["flags"].append(f"محاولة انتحال {brand}")
-                    break
+        for brand in domain_index.impersonated_brands(host):
+            result["impersonating"] = brand
+            result["risk_score"] += 40
+            result["flags"].append(f"محاولة انتحال {brand}")
+        
+        # أشكال انتحال جديدة (rnicrosoft، حروف كيريلية ...) بالتشابه مع قائمة البراندات
+        if not result["impersonating"]:
+            squat = typosquat_index.check(host)
+            if squat:
+                result["impersonating"] = squat["brand"]
+                result["typosquat"] = squat
+                result["risk_score"] += TYPOSQUAT_SCORES[squat["kind"]]
+                result["flags"].append(f"محاولة انتحال {squat['brand']} ({TYPOSQUAT_LABELS[squat['kind']]})")
         
         if not url.startswith('https://'):
             result["risk_score"] += 15
@@ -93,6 +129,10 @@ def analyze_url_syntax(url: str) -> Dict:
         if re.match(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', domain):
             result["risk_score"] += 30
             result["flags"].append("يستخدم IP بدل دومين")
+            reason = blocked_reason(host)
+            if reason:
+                result["risk_score"] += 20
+                result["flags"].append(f"IP داخلي ({REASON_LABELS[reason]})")
             
     except:
         pass
@@ -100,11 +140,9 @@ def analyze_url_syntax(url: str) -> Dict:
     return result
 
 
-async def fetch_and_analyze_content(url: str, timeout: float = 10.0) -> Dict:
-    """
-    🔥 الدالة الرئيسية: تفتح الرابط وتحلل المحتوى!
-    """
-    result = {
+def empty_content_result(url: str) -> Dict:
+    """نتيجة فحص محتوى فارغة (قبل فتح الرابط)"""
+    return {
         "url": url,
         "accessible": False,
         "final_url": None,
@@ -122,12 +160,24 @@ async def fetch_and_analyze_content(url: str, timeout: float = 10.0) -> Dict:
         "fields_detected": [],
         "arabic_description": "",
         "content_summary": "",
+        "redirect_chain": [],
         "risk_score": 0,
         "flags": []
     }
+
+
+@staged("link_fetch")
+async def fetch_and_analyze_content(url: str, timeout: float = 10.0) -> Dict:
+    """
+    🔥 الدالة الرئيسية: تفتح الرابط وتحلل المحتوى!
+    """
+    result = empty_content_result(url)
     
     try:
+        # الاتصال عبر كاش DNS وحماية العناوين الداخلية (كل خطوة توجيه كذلك)
         async with httpx.AsyncClient(
+            transport=guarded_transport(),
+            mounts=proxy_mounts(),
             follow_redirects=True, 
             timeout=timeout,
             headers={
@@ -135,7 +185,35 @@ async def fetch_and_analyze_content(url: str, timeout: float = 10.0) -> Dict:
             }
         ) as client:
             
-            response = await client.get(url)
+            # فك التوجيهات خطوة بخطوة (طلبات HEAD خفيفة + كاش) قبل تحميل الصفحة
+            chain = await redirect_resolver.resolve(url, client, stop_if=lambda u: phish_feed.lookup(u) is not None)
+            result["redirect_chain"] = chain["hops"]
+            
+            if chain["stopped_at"]:
+                result["final_url"] = chain["stopped_at"]
+                result["redirected"] = True
+                result["risk_score"] += 100
+                result["flags"].append(f"التوجيه يمر برابط احتيال معروف: {urlparse(chain['stopped_at']).hostname}")
+                result["arabic_description"] = "🚨 الرابط يوجهك لرابط موجود في قائمة روابط الاحتيال المعروفة - لا تفتحه!"
+                result["content_summary"] = "🚨 يوجه لرابط احتيال معروف"
+                result["risk_score"] = min(result["risk_score"], 100)
+                return result
+            
+            if not chain["complete"]:
+                result["flags"].append("سلسلة توجيه طويلة جداً")
+                result["risk_score"] += 20
+            
+            response = await client.get(chain["final_url"])
+            
+            # توجيهات إضافية ظهرت فقط مع GET
+            for hop in response.history:
+                result["redirect_chain"].append({
+                    "url": str(hop.url),
+                    "host": hop.url.host,
+                    "status": hop.status_code,
+                    "elapsed_ms": round(hop.elapsed.total_seconds() * 1000, 1),
+                    "cached": False
+                })
             
             if response.status_code == 200:
                 result["accessible"] = True
@@ -243,6 +321,11 @@ async def fetch_and_analyze_content(url: str, timeout: float = 10.0) -> Dict:
             else:
                 result["flags"].append(f"الموقع رجع خطأ: {response.status_code}")
                 
+    except AddressBlocked as e:
+        result["flags"].append(f"الرابط يوجه لعنوان داخلي ({REASON_LABELS[e.reason]}): {e.host}")
+        result["risk_score"] += 40
+        result["arabic_description"] = "🚫 الرابط يوجه لعنوان داخلي (مو موقع على الإنترنت) - ما تم فتحه"
+        result["content_summary"] = "🚫 عنوان داخلي - لم يُفتح"
     except httpx.TimeoutException:
         result["flags"].append("الموقع بطيء جداً")
         result["risk_score"] += 10
@@ -311,13 +394,46 @@ def build_content_summary(analysis: Dict) -> str:
     return "❓ تعذر الفحص"
 
 
+# عمال فتح الروابط (بدون تكرار لنفس الرابط، وبالتناوب بين الدومينات)
+link_fetcher = LinkFetcher(fetch_and_analyze_content)
+
+
 async def full_link_analysis(url: str) -> Dict:
     """التحليل الكامل: syntax + محتوى"""
     syntax = analyze_url_syntax(url)
-    content = await fetch_and_analyze_content(url)
     
-    total_risk = min(syntax["risk_score"] + content["risk_score"], 100)
-    all_flags = syntax["flags"] + content["flags"]
+    deferred = False
+    if syntax["known_phishing"]:
+        # احتيال مؤكد: لا داعي لفتح الرابط
+        content = empty_content_result(url)
+        content["arabic_description"] = "🚨 هذا الرابط موجود في قائمة روابط الاحتيال المعروفة - لا تفتحه!"
+        content["content_summary"] = "🚨 رابط احتيال معروف"
+    else:
+        try:
+            # عبر طابور العمال: نفس الرابط قيد الفتح؟ ننتظر نتيجته بدل فتحه مرة ثانية
+            content = await link_fetcher.fetch(url)
+        except LinkQueueFull:
+            content = empty_content_result(url)
+            content["flags"].append("تعذر فتح الرابط الآن (ضغط على السيرفر)")
+            content["content_summary"] = "❓ تعذر الفحص"
+            deferred = True
+    
+    # تحليل دومين كل خطوة في سلسلة التوجيه (بعد الرابط الأصلي)
+    redirect_chain = []
+    hop_risk = 0
+    hop_flags = []
+    seen_hosts = {syntax["domain"]}
+    for hop in content["redirect_chain"]:
+        hop_syntax = analyze_url_syntax(hop["url"]) if hop["url"] != url else syntax
+        redirect_chain.append({**hop, "risk_score": hop_syntax["risk_score"], "flags": hop_syntax["flags"]})
+        if hop["url"] != url and hop_syntax["domain"] not in seen_hosts:
+            seen_hosts.add(hop_syntax["domain"])
+            if hop_syntax["risk_score"] >= 25:
+                hop_risk = max(hop_risk, hop_syntax["risk_score"])
+                hop_flags.append(f"وجهة مشبوهة في التوجيه: {hop['host']}")
+    
+    total_risk = min(syntax["risk_score"] + content["risk_score"] + hop_risk, 100)
+    all_flags = syntax["flags"] + content["flags"] + hop_flags
     
     if total_risk >= 70:
         verdict = "🚨 خطير جداً - لا تدخل!"
@@ -338,9 +454,13 @@ async def full_link_analysis(url: str) -> Dict:
         "is_shortened": syntax["is_shortened"],
         "is_suspicious_tld": syntax["is_suspicious_tld"],
         "impersonating": syntax["impersonating"],
+        "known_phishing": syntax["known_phishing"],
+        "deep_scan_skipped": bool(syntax["known_phishing"]),
+        "deferred": deferred,  # ما انفتح بسبب الضغط (النتيجة مؤقتة، لا تُحفظ في الكاش)
         "accessible": content["accessible"],
         "final_url": content["final_url"],
         "redirected": content["redirected"],
+        "redirect_chain": redirect_chain,
         "page_title": content["page_title"],
         "content_type": content["content_type"],
         "fields_detected": content["fields_detected"],
@@ -350,8 +470,14 @@ async def full_link_analysis(url: str) -> Dict:
     }
 
 
-async def scan_all_urls_deep(text: str) -> Dict:
-    """فحص كل الروابط بالعمق"""
+async def scan_all_urls_deep(text: str, on_result: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    فحص كل الروابط بالعمق
+    
+    Args:
+        text: النص
+        on_result: تُستدعى بعد فحص كل رابط (لبث النتائج أول بأول)
+    """
     urls = extract_urls(text)
     
     if not urls:
@@ -363,32 +489,44 @@ async def scan_all_urls_deep(text: str) -> Dict:
             "summary": "لا توجد روابط"
         }
     
-    results = []
-    max_risk = 0
-    dangerous_count = 0
-    
-    for url in urls[:5]:
+    async def analyze_one(url: str) -> Dict:
         analysis = await full_link_analysis(url)
-        results.append(analysis)
-        if analysis["risk_score"] > max_risk:
-            max_risk = analysis["risk_score"]
-        if analysis["risk_score"] >= 50:
-            dangerous_count += 1
-    
-    if dangerous_count > 0:
-        summary = f"🚨 تم اكتشاف {dangerous_count} رابط خطير!"
-    elif max_risk >= 40:
-        summary = "⚠️ بعض الروابط مشبوهة"
-    else:
-        summary = "✅ الروابط تبدو آمنة"
+        if on_result:
+            on_result(analysis)
+        return analysis
     
-    return {
-        "total_urls": len(urls),
+    # الروابط تُفحص بالتوازي (التزامن الفعلي يحدده link_fetcher)
+    results = list(await asyncio.gather(*(analyze_one(url) for url in urls[:LINK_SCAN_MAX_URLS])))
+    return summarize_link_results(results, len(urls), deep=True)
+
+
+def summarize_link_results(results: List[Dict], total_urls: int, deep: bool) -> Dict:
+    """
+    ملخص نتائج الروابط (نفس شكل scan_all_urls / scan_all_urls_deep)
+
+    يُستخدم أيضاً لدمج نتائج أكثر من نص (مقاطع سلسلة الردود): الرابط المكرر يُحسب مرة
+    """
+    unique = list({r["url"]: r for r in results}.values())
+    max_risk = max((r["risk_score"] for r in unique), default=0)
+    dangerous_count = sum(1 for r in unique if r["risk_score"] >= 50)
+    scan = {
+        "total_urls": total_urls,
         "dangerous_urls": dangerous_count,
-        "urls": results,
-        "overall_risk": max_risk,
-        "summary": summary
+        "urls": unique,
+        "overall_risk": max_risk
     }
+    if not deep:
+        return scan
+    
+    if not total_urls:
+        scan["summary"] = "لا توجد روابط"
+    elif dangerous_count > 0:
+        scan["summary"] = f"🚨 تم اكتشاف {dangerous_count} رابط خطير!"
+    elif max_risk >= 40:
+        scan["summary"] = "⚠️ بعض الروابط مشبوهة"
+    else:
+        scan["summary"] = "✅ الروابط تبدو آمنة"
+    return scan
 
 
 def scan_all_urls(text: str) -> Dict:
@@ -397,21 +535,5 @@ def scan_all_urls(text: str) -> Dict:
     if not urls:
         return {"total_urls": 0, "dangerous_urls": 0, "urls": [], "overall_risk": 0}
     
-    results = []
-    max_risk = 0
-    dangerous_count = 0
-    
-    for url in urls[:10]:
-        analysis = analyze_url_syntax(url)
-        results.append(analysis)
-        if analysis["risk_score"] > max_risk:
-            max_risk = analysis["risk_score"]
-        if analysis["risk_score"] >= 50:
-            dangerous_count += 1
-    
-    return {
-        "total_urls": len(urls),
-        "dangerous_urls": dangerous_count,
-        "urls": results,
-        "overall_risk": max_risk
-    }
+    results = [analyze_url_syntax(url) for url in urls[:LINK_SCAN_MAX_URLS]]
+    return summarize_link_results(results, len(urls), deep=False)
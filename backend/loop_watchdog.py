@@ -0,0 +1,237 @@
+"""
+مراقب توقف الـ event loop
+Event-Loop Stall Watchdog
+
+كود متزامن داخل handler غير متزامن (BeautifulSoup، كتابة CSV، بدء
+التدريب...) يوقف السيرفر كله، وكنا نعرف فقط من انتهاء مهلة العملاء.
+
+1. نبضة (heartbeat) داخل الـ loop كل WATCHDOG_INTERVAL: الفرق بين وقت
+   الاستيقاظ المتوقع والفعلي = التأخر، ومنه p50 / p95 / p99 في /metrics
+2. thread مراقب خارج الـ loop: إذا النبضة تأخرت أكثر من WATCHDOG_STALL_MS
+   يلتقط stack الـ loop وهو متوقف (الكود اللي حاجزه فعلياً)، مع المهمة
+   الجارية، الطلب (POST /analyze)، والمرحلة (stage)
+3. المراحل تُعلن بـ stage("rules") أو @staged("link_fetch")، ولكل مهمة
+   مرحلتها (المهام الخلفية ترث الطلب اللي أنشأها)
+4. آخر التوقفات مع الـ stack في GET /metrics/stalls
+
+طريقة الاستخدام:
+    app.add_middleware(RequestTracker)
+    asyncio.create_task(loop_watchdog.run())
+"""
+
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional
+
+from config import WATCHDOG_INTERVAL, WATCHDOG_STALL_MS, WATCHDOG_MAX_REPORTS, WATCHDOG_LAG_SAMPLES, WATCHDOG_STACK_DEPTH
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# الطلب الحالي (ينتقل تلقائياً للمهام اللي ينشئها الطلب)
+_request: ContextVar[Optional[str]] = ContextVar("aman_request", default=None)
+
+
+def _percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(int(len(values) * p / 100), len(values) - 1)], 1)
+
+
+def _format_stack(frame) -> List[str]:
+    return [f"{os.path.relpath(f.filename, BACKEND_DIR) if f.filename.startswith(BACKEND_DIR) else os.path.basename(f.filename)}"
+            f":{f.lineno} {f.name}" for f in traceback.extract_stack(frame)[-WATCHDOG_STACK_DEPTH:]]
+
+
+def _culprit(frame) -> Optional[str]:
+    """أعمق سطر من كود المشروع في الـ stack (غالباً هو سبب التوقف)"""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(BACKEND_DIR) and os.path.basename(filename) != "loop_watchdog.py":
+            return f"{os.path.relpath(filename, BACKEND_DIR)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class LoopWatchdog:
+    """قياس تأخر الـ loop والتقاط سبب كل توقف"""
+
+    def __init__(self, interval: float = WATCHDOG_INTERVAL, stall_ms: float = WATCHDOG_STALL_MS,
+                 max_reports: int = WATCHDOG_MAX_REPORTS, samples: int = WATCHDOG_LAG_SAMPLES):
+        self.interval = interval
+        self.stall_ms = stall_ms
+        self.reports: Deque[Dict] = deque(maxlen=max_reports)
+        self._lags: Deque[float] = deque(maxlen=samples)
+        self._listeners: List[Callable[[float], None]] = []
+        self._active: Dict[asyncio.Task, tuple] = {}   # مهمة ← (الطلب، المرحلة)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._deadline = 0.0          # متى المفروض تصحى النبضة القادمة
+        self._open_report: Optional[Dict] = None
+        self._stop = threading.Event()
+        self.max_stall_ms = 0
+        self.stats = {"stalls": 0, "stall_ms_total": 0}
+        self.stalls_by_stage: Dict[str, int] = {}
+
+    def on_lag(self, listener: Callable[[float], None]):
+        """تسجيل دالة تستقبل كل قياس تأخر (ms)، مثل admission"""
+        self._listeners.append(listener)
+
+    # ---------- المراحل ----------
+    @contextmanager
+    def stage(self, name: str):
+        """المرحلة الحالية للمهمة (تتداخل: الداخلية تغطي الخارجية لين تنتهي)"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None  # خارج الـ loop (thread آخر): ما يحجز الـ loop أصلاً
+        if task is None:
+            yield
+            return
+        previous = self._active.get(task)
+        self._active[task] = (_request.get(), name)
+        try:
+            yield
+        finally:
+            if previous is None:
+                self._active.pop(task, None)
+            else:
+                self._active[task] = previous
+
+    def staged(self, name: str):
+        """نفس stage() كـ decorator (دوال عادية و async)"""
+        def decorator(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def request(self, label: str):
+        token = _request.set(label)
+        try:
+            with self.stage("request"):
+                yield
+        finally:
+            _request.reset(token)
+
+    # ---------- النبضة (داخل الـ loop) ----------
+    async def run(self):
+        """مهمة خلفية دائمة: النبضة + تشغيل الـ thread المراقب"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._deadline = time.perf_counter() + self.interval
+        watcher = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        watcher.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                self._deadline = start + self.interval
+                await asyncio.sleep(self.interval)
+                lag = max((time.perf_counter() - start - self.interval) * 1000, 0.0)
+                self._record_lag(lag)
+        finally:
+            self._stop.set()
+
+    def _record_lag(self, lag: float):
+        self._lags.append(lag)
+        for listener in self._listeners:
+            listener(lag)
+        report = self._open_report
+        if report is not None:
+            # التوقف انتهى: مدته الكاملة
+            self._open_report = None
+            report["duration_ms"] = round(lag, 1)
+            self.stats["stall_ms_total"] += int(lag)
+            self.max_stall_ms = max(self.max_stall_ms, int(lag))
+            print(f"🐢 الـ event loop توقف {report['duration_ms']}ms "
+                  f"(المرحلة: {report['stage'] or '-'}، {report['culprit'] or report['task'] or '-'})")
+
+    # ---------- المراقب (thread منفصل) ----------
+    def _watch(self):
+        poll = min(self.interval, self.stall_ms / 1000) / 4
+        while not self._stop.wait(poll):
+            overdue_ms = (time.perf_counter() - self._deadline) * 1000
+            if overdue_ms >= self.stall_ms and self._open_report is None:
+                self._capture(overdue_ms)
+
+    def _capture(self, overdue_ms: float):
+        """الـ loop متوقف الآن: stack الـ thread حقه + المهمة الجارية ومرحلتها"""
+        frame = sys._current_frames().get(self._loop_thread)
+        task = asyncio.current_task(self._loop) if self._loop else None
+        request, stage = self._active.get(task, (None, None)) if task else (None, None)
+        report = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "detected_after_ms": round(overdue_ms, 1),
+            "duration_ms": None,  # يتحدد لما الـ loop يرجع
+            "stage": stage,
+            "request": request,
+            "task": task.get_coro().__qualname__ if task else None,
+            "culprit": _culprit(frame),
+            "stack": _format_stack(frame) if frame else []
+        }
+        self._open_report = report
+        self.reports.append(report)
+        self.stats["stalls"] += 1
+        key = stage or "unknown"
+        self.stalls_by_stage[key] = self.stalls_by_stage.get(key, 0) + 1
+
+    # ---------- المقاييس ----------
+    def get_stats(self) -> Dict:
+        lags = list(self._lags)
+        return {
+            "lag_ms": {
+                "p50": _percentile(lags, 50),
+                "p95": _percentile(lags, 95),
+                "p99": _percentile(lags, 99),
+                "max": round(max(lags), 1) if lags else 0.0
+            },
+            "samples": len(lags),
+            "stall_threshold_ms": float(self.stall_ms),
+            **self.stats,
+            "max_stall_ms": self.max_stall_ms,
+            "stalls_by_stage": dict(self.stalls_by_stage)
+        }
+
+    def get_reports(self) -> List[Dict]:
+        """آخر التوقفات (الأحدث أولاً)"""
+        return list(reversed(self.reports))
+
+
+class RequestTracker:
+    """ASGI middleware: كل طلب HTTP يُسجل باسمه (POST /analyze) للمراقب"""
+
+    def __init__(self, app, watchdog: Optional[LoopWatchdog] = None):
+        self.app = app
+        self.watchdog = watchdog or loop_watchdog
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with self.watchdog.request(f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
+
+
+# instance واحد للسيرفر
+loop_watchdog = LoopWatchdog()
+stage = loop_watchdog.stage
+staged = loop_watchdog.staged
@@ -4,34 +4,60 @@
 مع التعلم التلقائي!
 """
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
-import httpx
+import asyncio
 import json
 import csv
+import ipaddress
 import os
+import time
 from datetime import datetime
+from typing import Dict, List, Optional
 
 # استيراد الملفات المحلية
-from config import GROQ_API_KEY, RULE_WEIGHT, ML_WEIGHT, AI_WEIGHT
-from rules import calculate_rule_score, detect_threat_type, extract_flags, get_actions, get_advice
+from config import RULE_WEIGHT, ML_WEIGHT, AI_WEIGHT, JOB_SSE_KEEPALIVE, RETRAIN_COOLDOWN, GZIP_MIN_SIZE, GZIP_LEVEL, ML_BACKEND
+from config import PREFORK_WORKERS, SHUTDOWN_DRAIN_TIMEOUT, TRUSTED_PROXIES
+from rules import calculate_rule_score, detect_threat_type, extract_flags, get_actions, get_advice, THREAT_CODES
 from analytics import analytics
-from ml_model import FraudDetectionModel
-from link_scanner import scan_all_urls_deep, full_link_analysis, extract_urls
+from jobs import jobs, JobLimitError
+from ai_scorer import ai_scorer
+from metrics import metrics, merge_snapshots
+from phish_feed import phish_feed
+from redirects import redirect_resolver
+from admission import admission, AdmissionRejected
+from response_profile import ResponseShape, FastJSONResponse
+from mime_ingest import parse_eml_stream, EmlTooLarge
+from loop_watchdog import loop_watchdog, RequestTracker, stage, staged
+import prefork
+from inference import InferenceModel, WARMUP_TEXTS
+from ml_batcher import MicroBatcher
+from shadow import ShadowEvaluator
+from thread_segments import segment_message, split_thread, thread_cache
+from traffic_capture import traffic_capture
+from campaigns import campaign_index
+from pipeline import scoring_pipeline, fuse, dangerous_page
+from dns_guard import dns_resolver
+from link_scanner import scan_all_urls_deep, scan_all_urls, full_link_analysis, extract_urls, analyze_url_syntax, domain_index, typosquat_index, link_fetcher
+from link_scanner import summarize_link_results
 
 # ==================== مسار حفظ البيانات الجديدة ====================
 NEW_DATA_PATH = "data/new_emails.csv"
 TRAINING_DATA_PATH = "data/training_data.csv"
 AUTO_RETRAIN_THRESHOLD = 20  # يعيد التدريب كل 20 رسالة جديدة
 new_emails_count = 0
+last_retrain_attempt = 0.0
+training_job_id: Optional[str] = None  # مهمة التدريب الجارية
 
 # ==================== إعداد التطبيق ====================
 app = FastAPI(
     title="Aman API",
     description="نظام ذكي لكشف الاحتيال",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse
 )
 
 app.add_middleware(
@@ -41,16 +67,53 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-# ==================== تحميل نموذج ML ====================
-ml_model = FraudDetectionModel()
-try:
-    ml_model.load()
-    print("✅ تم تحميل نموذج ML")
-except:
-    print("⚠️ نموذج ML غير موجود، سيتم استخدام القواعد فقط")
+# ضغط الردود الكبيرة حسب Accept-Encoding (بث SSE مستثنى تلقائياً)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+# كل طلب باسمه (POST /analyze) لتقارير توقف الـ event loop
+app.add_middleware(RequestTracker)
+
+# ==================== نموذج ML ====================
+# الاستدلال فقط (بدون pandas وأدوات التدريب)، والتحميل + التسخين في startup
+ml_model = InferenceModel()
+
+# السيرفر يعلن جاهزيته (GET /ready) بعد التحميل والتسخين
+readiness = {"ready": False, "startup_ms": None, "warm_up_ms": None}
+
+# الطلبات المتزامنة تتجمع في دفعات قبل الوصول للنموذج
+ml_batcher = MicroBatcher(ml_model)
+
+
+async def promote_model(trained: InferenceModel):
+    """حفظ النموذج الجديد ثم استبدال النموذج الحالي به"""
+    await asyncio.to_thread(trained.save)
+    ml_model.adopt(trained)
+
+
+# النموذج الجديد بعد إعادة التدريب يُقارن بالحالي في الظل قبل اعتماده
+shadow = ShadowEvaluator(ml_model, promote_model)
+
+# ==================== المقاييس ====================
+metrics.register("jobs", jobs.get_stats)
+metrics.register("ml_batching", ml_batcher.get_stats)
+metrics.register("domain_index", domain_index.get_stats)
+metrics.register("phish_feed", phish_feed.get_stats)
+metrics.register("typosquat", typosquat_index.get_stats)
+metrics.register("redirects", redirect_resolver.get_stats)
+metrics.register("admission", admission.get_stats)
+metrics.register("link_fetch", link_fetcher.get_stats)
+metrics.register("ai", ai_scorer.get_stats)
+metrics.register("shadow", shadow.get_stats)
+metrics.register("threads", thread_cache.get_stats)
+metrics.register("event_loop", loop_watchdog.get_stats)
+metrics.register("capture", traffic_capture.get_stats)
+metrics.register("campaigns", campaign_index.get_stats)
+metrics.register("pipeline", scoring_pipeline.get_stats)
+metrics.register("dns", dns_resolver.get_stats)
 
 
 # ==================== دوال التعلم التلقائي ====================
+@staged("learning_save")
 def save_email_for_learning(text: str, score: int, threat_type: str):
     """حفظ الإيميل تلقائياً للتعلم"""
     global new_emails_count
@@ -58,16 +121,8 @@ def save_email_for_learning(text: str, score: int, threat_type: str):
     # تحديد التصنيف بناءً على النتيجة
     label = 1 if score >= 50 else 0
     
-    # تحويل نوع التهديد للإنجليزي
-    threat_map = {
-        "احتيال اجتماعي": "social_engineering",
-        "انتحال صفة بنك": "bank_impersonation",
-        "جوائز وهمية": "fake_prize",
-        "تصيد احتيالي": "phishing",
-        "طلب تحويل مشبوه": "money_transfer",
-        "رسالة عادية": "safe"
-    }
-    threat_en = threat_map.get(threat_type, "unknown")
+    # تحويل نوع التهديد للإنجليزي (نفس رموز الرد المختصر)
+    threat_en = THREAT_CODES.get(threat_type, "other")
     
     # إنشاء الملف إذا ما موجود
     file_exists = os.path.exists(NEW_DATA_PATH)
@@ -78,42 +133,92 @@ def save_email_for_learning(text: str, score: int, threat_type: str):
             writer.writerow(['text', 'label', 'threat_type', 'score', 'timestamp'])
         
         # تنظيف النص
-        clean_text = text.replace('\n', ' ').replace('\r', ' ')[:500]
+        clean_text = text[:500].replace('\n', ' ').replace('\r', ' ')
         writer.writerow([clean_text, label, threat_en, score, datetime.now().isoformat()])
     
     new_emails_count += 1
     print(f"📝 تم حفظ الإيميل #{new_emails_count} للتعلم")
     
-    # إعادة التدريب التلقائي
-    if new_emails_count >= AUTO_RETRAIN_THRESHOLD:
-        auto_retrain()
+    # إعادة التدريب التلقائي (مع مهلة بين المحاولات حتى لا تتكدس بعد فشل)
+    # عند التشغيل بعدة عمليات: العامل الأول فقط يدرب
+    if new_emails_count >= AUTO_RETRAIN_THRESHOLD and time.time() - last_retrain_attempt >= RETRAIN_COOLDOWN \
+            and prefork.is_primary():
+        try:
+            start_training(merge_new=True)
+        except JobLimitError:
+            pass  # السيرفر مشغول: نحاول مع الإيميل القادم
 
 
-def auto_retrain():
-    """إعادة تدريب النموذج تلقائياً"""
-    global new_emails_count
+@staged("start_training")
+def start_training(merge_new: bool = True, folds: int = 0, search: bool = False) -> str:
+    """
+    تشغيل التدريب في الخلفية (خارج مسار الطلب) وإرجاع رقم المهمة
+    
+    تدريب واحد فقط بنفس الوقت: إذا فيه تدريب جاري يرجع رقمه.
+    
+    Raises:
+        JobLimitError: الحد الأقصى من المهام الجارية
+    """
+    global training_job_id, last_retrain_attempt
     
-    print("\n🔄 بدء إعادة التدريب التلقائي...")
+    if training_job_id is not None:
+        return training_job_id
     
+    job_id = jobs.create()
+    training_job_id = job_id
+    last_retrain_attempt = time.time()
+    spawn(run_training(job_id, merge_new, folds, search))
+    return job_id
+
+
+async def run_training(job_id: str, merge_new: bool, folds: int, search: bool):
+    """تدريب نموذج جديد في thread منفصل ثم استبدال النموذج الحالي به"""
+    global new_emails_count, training_job_id
+    
+    print("\n🔄 بدء إعادة التدريب...")
     try:
-        # دمج البيانات الجديدة مع القديمة
-        merge_training_data()
+        # دمج البيانات الجديدة مع القديمة (في الـ event loop حتى لا يتداخل مع حفظ إيميل جديد)
+        if merge_new:
+            merge_training_data()
         
-        # إعادة التدريب
-        ml_model.train(TRAINING_DATA_PATH)
-        ml_model.save()
+        # استيراد متأخر: pandas وأدوات التدريب ما تنحمل في السيرفر إلا عند إعادة التدريب
+        from training import TrainingPipeline
         
-        # إعادة تحميل النموذج
-        ml_model.load()
+        # التدريب والحفظ بعيداً عن الـ event loop، والنموذج الحالي يخدم الطلبات
+        trained, results = await asyncio.to_thread(
+            TrainingPipeline(backend=ML_BACKEND).run, TRAINING_DATA_PATH, folds, search
+        )
+        summary = {
+            "backend": results["backend"],
+            "accuracy": results["accuracy"],
+            "cv": results["cv"],
+            "best_params": results["best_params"],
+            "feature_cache": results["feature_cache"],
+            "timings": results["timings"]
+        }
+        
+        if ml_model.is_trained and shadow.enabled:
+            # النموذج الجديد يُقيّم في الظل أولاً، ويُعتمد فقط إذا حقق الشروط
+            offline = await asyncio.to_thread(shadow.offline_comparison, trained, results["holdout"])
+            shadow.start(trained, offline, summary)
+            promotion = "shadow"
+            print("🕶️ النموذج الجديد يُقيّم في الظل (GET /model/shadow)")
+        else:
+            await promote_model(trained)
+            promotion = "direct"
         
         # تصفير العداد
-        new_emails_count = 0
+        if merge_new:
+            new_emails_count = 0
         
+        jobs.finish(job_id, {"success": True, "promotion": promotion, **summary,
+                             "model_version": ml_model.version})
         print("✅ تم إعادة التدريب بنجاح!")
-        return True
     except Exception as e:
         print(f"❌ خطأ في إعادة التدريب: {e}")
-        return False
+        jobs.fail(job_id, str(e))
+    finally:
+        training_job_id = None
 
 
 def merge_training_data():
@@ -146,6 +251,25 @@ def merge_training_data():
 # ==================== Models ====================
 class Message(BaseModel):
     text: str
+    # حقول اختيارية (من /analyze/eml أو الإكستنشن): تدخل في نص التحليل
+    sender: Optional[str] = None
+    subject: Optional[str] = None
+    urls: List[str] = []  # روابط href المخفية خلف نص الرابط
+
+
+def message_text(msg: Message) -> str:
+    """نص التحليل: المرسل والموضوع ثم الجسم، والروابط اللي ما تظهر في النص بالآخر"""
+    text = msg.text
+    header = "\n".join(line for line in (
+        f"From: {msg.sender}" if msg.sender else "",
+        f"Subject: {msg.subject}" if msg.subject else ""
+    ) if line)
+    if header:
+        text = f"{header}\n\n{text}"
+    hidden = [url for url in msg.urls if url not in text]
+    if hidden:
+        text += "\n\nLinks:\n" + "\n".join(hidden)
+    return text
 
 class LinkCheck(BaseModel):
     url: str
@@ -343,6 +467,49 @@ HTML_PAGE = """
 """
 
 
+# ==================== التحكم بالقبول ====================
+def trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_id(request: Request) -> str:
+    """
+    هوية العميل لحدود الطلبات: عنوان الاتصال
+
+    الهيدرات يكتبها العميل نفسه، فتُقبل فقط إذا الاتصال من proxy موثوق
+    (TRUSTED_PROXIES): X-Client-Id، وإلا أقرب عنوان غير موثوق في X-Forwarded-For
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not trusted_proxy(peer):
+        return peer
+    if request.headers.get("x-client-id"):
+        return request.headers["x-client-id"]
+    forwarded = [a.strip() for a in request.headers.get("x-forwarded-for", "").split(",") if a.strip()]
+    for address in reversed(forwarded):
+        if not trusted_proxy(address):
+            return address
+    return forwarded[0] if forwarded else peer
+
+
+async def admission_ticket(request: Request):
+    """قبول الطلب (عادي / مخفف) أو رفضه بـ 429، ويحرر مكانه بعد الرد"""
+    try:
+        client = client_id(request)
+        ticket = admission.admit(client)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=e.reason,
+                            headers={"Retry-After": str(max(int(e.retry_after + 0.999), 1))})
+    ticket["client"] = client
+    try:
+        yield ticket
+    finally:
+        admission.release()
+
+
 # ==================== API Endpoints ====================
 
 @app.get("/", response_class=HTMLResponse)
@@ -357,38 +524,189 @@ async def get_stats():
     return analytics.get_stats()
 
 
+@app.get("/metrics")
+async def get_metrics(scope: str = "all"):
+    """
+    مقاييس المكونات الداخلية (المهام، الـ AI، ...)
+    
+    عند التشغيل بعدة عمليات: مقاييس كل عامل + المجموع (scope=local لهذا العامل فقط)
+    """
+    if prefork.worker is None or scope == "local":
+        return metrics.snapshot()
+    
+    workers = {prefork.worker["slot"]: metrics.snapshot(), **await prefork.gather_peers("/metrics?scope=local")}
+    return {
+        "workers": {f"w{slot}": snapshot for slot, snapshot in sorted(workers.items())},
+        "total": merge_snapshots([s for s in workers.values() if "error" not in s])
+    }
+
+
+@app.get("/metrics/stalls")
+async def get_stalls(scope: str = "all"):
+    """
+    آخر توقفات الـ event loop: المدة، الطلب، المرحلة، وسطر الكود الحاجز مع الـ stack
+    
+    عند التشغيل بعدة عمليات: لكل عامل (scope=local لهذا العامل فقط)
+    """
+    if prefork.worker is None or scope == "local":
+        return loop_watchdog.get_reports()
+    
+    workers = {prefork.worker["slot"]: loop_watchdog.get_reports(),
+               **await prefork.gather_peers("/metrics/stalls?scope=local")}
+    return {"workers": {f"w{slot}": reports for slot, reports in sorted(workers.items())}}
+
+
+@app.get("/campaigns")
+async def get_campaigns(limit: int = 20, min_size: int = 2, scope: str = "all"):
+    """
+    أكبر الحملات النشطة (رسائل شبه متطابقة خلال CAMPAIGN_TTL): العدد، الحكم،
+    أول وآخر ظهور، وبداية أول رسالة
+    
+    عند التشغيل بعدة عمليات: لكل عامل فهرسه (scope=local لهذا العامل فقط)
+    """
+    if prefork.worker is None or scope == "local":
+        return campaign_index.top_clusters(limit, min_size)
+    
+    workers = {prefork.worker["slot"]: campaign_index.top_clusters(limit, min_size),
+               **await prefork.gather_peers(f"/campaigns?scope=local&limit={limit}&min_size={min_size}")}
+    return {"workers": {f"w{slot}": clusters for slot, clusters in sorted(workers.items())}}
+
+
+def prepare_serving(load_model: bool = True):
+    """
+    تحميل نموذج ML وتسخين مسار التحليل (قواعد + روابط + نموذج + ترميز) قبل الطلبات
+    
+    load_model=False: النموذج محمل مسبقاً (العامل ورثه من الـ supervisor)
+    """
+    if load_model:
+        try:
+            if ml_model.load():
+                print("✅ تم تحميل نموذج ML")
+        except Exception as e:
+            print(f"⚠️ نموذج ML غير موجود، سيتم استخدام القواعد فقط ({e})")
+    
+    start = time.perf_counter()
+    ml_model.warm_up()
+    for text in WARMUP_TEXTS:
+        # بدون كاش المقاطع (نصوص التسخين ما تدخل كاش السيرفر)
+        segments = split_thread(text)
+        scores = {
+            "rule_score": calculate_rule_score(text),
+            "threat_type": detect_threat_type(text),
+            "flags": extract_flags(text),
+            "ml_score": 0,
+            "thread": {"segments": len(segments), "quoted": 0, "reused": 0, "chars_skipped": 0}
+        }
+        verdict = build_verdict(text, scores, None, scan_all_urls(text))
+        ResponseShape().respond(verdict)
+        ResponseShape("compact").respond(verdict)
+    readiness["warm_up_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    print(f"🔥 تم التسخين في {readiness['warm_up_ms']}ms")
+
+
+@app.on_event("startup")
+async def startup():
+    started = time.perf_counter()
+    
+    # التحميل والتسخين قبل استقبال الطلبات (uvicorn ينتظر انتهاء startup)
+    await asyncio.to_thread(prepare_serving, prefork.worker is None)
+    jobs.id_prefix = prefork.job_prefix()
+    await prefork.start_job_server(app)
+    
+    # قائمة التصيد: تحميل الفهرس ثم متابعة تحديث الملفات في الخلفية
+    try:
+        phish_feed.load()
+    except Exception as e:
+        print(f"⚠️ تعذر تحميل قائمة التصيد: {e}")
+    # مع prefork: العامل الأول فقط يبني الفهرس، والباقي يفتحونه بعد ما يتحدث
+    service_tasks.append(asyncio.create_task(phish_feed.auto_reload(rebuild=prefork.is_primary())))
+    # قياس تأخر الـ loop (للقبول والمقاييس) والتقاط سبب أي توقف
+    loop_watchdog.on_lag(admission.observe_lag)
+    service_tasks.append(asyncio.create_task(loop_watchdog.run()))
+    # تسجيل الطلبات (اختياري): لكل عامل ملفه
+    traffic_capture.start(f".w{prefork.worker['slot']}" if prefork.worker else "")
+    
+    readiness["startup_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    readiness["ready"] = True
+    prefork.notify_ready()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # المهام الجارية (فحص الروابط العميق، التدريب) تكمل قبل إغلاق الاتصالات
+    pending = [task for task in background_tasks if not task.done()]
+    if pending:
+        print(f"⏳ انتظار {len(pending)} مهمة خلفية قبل الإيقاف...")
+        await asyncio.wait(pending, timeout=SHUTDOWN_DRAIN_TIMEOUT)
+    # منفذ المهام يبقى للعملاء اللي ينتظرون نتائج المهام الأخيرة
+    await prefork.stop_job_server(jobs.last_update)
+    
+    for task in service_tasks:
+        task.cancel()
+    await ml_batcher.close()
+    await shadow.close()
+    await ai_scorer.close()
+    await link_fetcher.close()
+    await prefork.close_client()
+    traffic_capture.stop()
+
+
+@app.get("/ready")
+async def ready():
+    """جاهزية السيرفر (بعد تحميل النموذج والتسخين): 503 قبلها"""
+    if not readiness["ready"]:
+        return FastJSONResponse(readiness, status_code=503)
+    return readiness
+
+
 @app.get("/model/status")
 async def model_status():
     """حالة النموذج"""
     return {
         "is_trained": ml_model.is_trained,
+        "version": ml_model.version,
+        "backend": ml_model.backend_name,
+        "warm_up_ms": ml_model.warm_up_ms,
         "message": "جاهز" if ml_model.is_trained else "غير مدرب"
     }
 
 
+@app.get("/model/shadow")
+async def model_shadow():
+    """تقرير مقارنة النموذج الجديد بالحالي (التقييم في الظل) والقرارات السابقة"""
+    return {
+        "current": shadow.get_report(),
+        "history": list(shadow.history)
+    }
+
+
 @app.post("/train")
-async def train_model():
-    """تدريب النموذج"""
+async def train_model(request: Request, folds: int = 0, search: bool = False):
+    """
+    تدريب النموذج في الخلفية (النموذج الحالي يكمل يخدم الطلبات)
+    
+    folds: تقييم k-fold (0 = بدون)، search: بحث عن أفضل إعدادات
+    النتيجة (الدقة، الإعدادات، وقت كل مرحلة) من GET /jobs/{job_id}
+    """
+    if prefork.primary_port():
+        return await prefork.forward(request, prefork.primary_port())
     try:
-        results = ml_model.train()
-        ml_model.save()
-        return {
-            "success": True,
-            "accuracy": results["accuracy"],
-            "message": "تم التدريب بنجاح"
-        }
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+        job_id = start_training(merge_new=False, folds=folds, search=search)
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"status": "pending", **training_links(job_id)}
 
 
 @app.post("/retrain")
-async def retrain_now():
-    """إعادة التدريب الآن (يدوياً)"""
-    success = auto_retrain()
-    return {
-        "success": success,
-        "message": "تم إعادة التدريب" if success else "فشل إعادة التدريب"
-    }
+async def retrain_now(request: Request):
+    """إعادة التدريب الآن مع الإيميلات الجديدة (في الخلفية)"""
+    if prefork.primary_port():
+        return await prefork.forward(request, prefork.primary_port())
+    try:
+        job_id = start_training(merge_new=True)
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"status": "pending", "message": "بدأت إعادة التدريب", **training_links(job_id)}
 
 
 @app.get("/learning/status")
@@ -407,97 +725,298 @@ async def learning_status():
         "retrain_threshold": AUTO_RETRAIN_THRESHOLD,
         "progress": f"{max(count, 0)}/{AUTO_RETRAIN_THRESHOLD}",
         "model_trained": ml_model.is_trained,
+        "training_job": training_job_id,
         "message": f"باقي {AUTO_RETRAIN_THRESHOLD - max(count, 0)} رسالة لإعادة التدريب التلقائي"
     }
 
 
 @app.post("/scan-link")
-async def scan_link(link: LinkCheck):
+async def scan_link(link: LinkCheck, ticket: Dict = Depends(admission_ticket)):
     """فحص رابط واحد بالعمق"""
+    if ticket["degraded"]:
+        # السيرفر تحت ضغط: فحص شكل الرابط فقط بدون فتحه
+        result = analyze_url_syntax(link.url)
+        result["degraded"] = True
+        result["degraded_reason"] = ticket["reason"]
+        return result
+    
     result = await full_link_analysis(link.url)
     return result
 
 
 @app.post("/scan-link-deep")
-async def scan_link_deep(link: LinkCheck):
+async def scan_link_deep(link: LinkCheck, ticket: Dict = Depends(admission_ticket)):
     """نفس scan-link (للتوافقية)"""
-    return await scan_link(link)
+    return await scan_link(link, ticket)
 
 
-@app.post("/analyze")
-async def analyze(msg: Message):
-    """تحليل إيميل"""
-    
-    # 1. تحليل بالقواعد
-    rule_score = calculate_rule_score(msg.text)
-    threat_type = detect_threat_type(msg.text)
-    flags = extract_flags(msg.text)
-    
-    # 2. 🔗 فحص الروابط بالعمق (يدخل على المواقع!)
-    link_scan = await scan_all_urls_deep(msg.text)
-    link_risk = link_scan["overall_risk"]
-    
-    # إضافة تحذيرات الروابط
-    for url_result in link_scan["urls"]:
+# ==================== مراحل التحليل ====================
+async def get_ai_score(text: str) -> Optional[int]:
+    """تحليل بـ AI (Groq) - يرجع None إذا غير متاح أو تم تخطيه"""
+    return await ai_scorer.score(text)
+
+
+async def get_ml_score(text: str) -> int:
+    """تحليل بـ ML (إذا متاح) عبر مجدول الدفعات"""
+    if not ml_model.is_trained:
+        return 0
+    ml_result = await ml_batcher.predict(text)
+    # مقارنة النموذج الجديد (إن وجد) على عينة من الطلبات، خارج مسار الرد
+    shadow.observe(text)
+    return ml_result["risk_score"]
+
+
+def get_link_flags(link_urls: list) -> list:
+    """تحذيرات الروابط (فقط التي فُتحت ولها ملخص محتوى)"""
+    flags = []
+    for url_result in link_urls:
         if url_result["risk_score"] >= 30:
             # إضافة ملخص المحتوى
             if url_result.get("content_summary"):
                 flags.append({
+                    "code": "dangerous_link",
                     "icon": "🔗",
                     "title": f"رابط: {url_result['domain'][:30]}",
                     "description": url_result["content_summary"],
                     "severity": "critical" if url_result["risk_score"] >= 70 else "high"
                 })
+    return flags
+
+
+# ==================== سلاسل الردود ====================
+async def score_segments(segments: List[Dict]) -> Dict:
+    """
+    القواعد + ML لكل مقطع (المقاطع المحللة قبل من الكاش)، ثم نتيجة السلسلة:
+    أعلى نتيجة، نوع التهديد من أخطر مقطع، والمؤشرات بدون تكرار
+    """
+    entries = []
+    ml_pending = []
+    reused = 0
+    skipped_chars = 0
+    ml_version = ml_model.version
     
-    # 3. تحليل بـ ML (إذا متاح)
-    ml_score = 0
-    if ml_model.is_trained:
-        ml_result = ml_model.predict(msg.text)
-        ml_score = ml_result["risk_score"]
+    with stage("rules"):
+        for segment in segments:
+            entry = thread_cache.entry(segment["hash"])
+            rules_hit = "rule_score" in entry
+            ml_hit = "ml_score" in entry and entry.get("ml_version") == ml_version
+            thread_cache.record_stage("rules", rules_hit)
+            thread_cache.record_stage("ml", ml_hit)
+            if not rules_hit:
+                text = segment["text"]
+                entry.update({
+                    "rule_score": calculate_rule_score(text),
+                    "threat_type": detect_threat_type(text),
+                    "flags": extract_flags(text),
+                    "urls": extract_urls(text)
+                })
+            if not ml_hit:
+                ml_pending.append((segment, entry))
+            if rules_hit and ml_hit:
+                reused += 1
+                skipped_chars += segment["chars"]
+            entries.append(entry)
     
-    # 4. تحليل بـ AI (إذا متاح)
-    ai_score = 0
-    if GROQ_API_KEY:
-        try:
-            async with httpx.AsyncClient() as client:
-                prompt = f'حلل هذا الإيميل وأرجع JSON: {{"risk_score": 0-100}}\n"{msg.text[:400]}"'
-                response = await client.post(
-                    "https://api.groq.com/openai/v1/chat/completions",
-                    headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
-                    json={"model": "llama-3.1-8b-instant", "messages": [{"role": "user", "content": prompt}], "temperature": 0.2},
-                    timeout=10.0
-                )
-                data = response.json()
-                if "choices" in data:
-                    text = data["choices"][0]["message"]["content"]
-                    text = text.replace("```json", "").replace("```", "").strip()
-                    ai_result = json.loads(text)
-                    ai_score = ai_result.get("risk_score", 0)
-        except:
-            pass
-    
-    # 5. حساب النتيجة النهائية
-    if ml_model.is_trained and GROQ_API_KEY:
-        base_score = int(rule_score * 0.25 + ml_score * 0.25 + ai_score * 0.2 + link_risk * 0.3)
-    elif ml_model.is_trained:
-        base_score = int(rule_score * 0.35 + ml_score * 0.3 + link_risk * 0.35)
-    elif GROQ_API_KEY:
-        base_score = int(rule_score * 0.35 + ai_score * 0.25 + link_risk * 0.4)
-    else:
-        base_score = int(rule_score * 0.5 + link_risk * 0.5)
+    # ML للمقاطع الجديدة فقط (تتجمع في دفعة وحدة عبر ml_batcher)
+    ml_scores = await asyncio.gather(*(get_ml_score(segment["text"]) for segment, _ in ml_pending))
+    for (_, entry), ml_score in zip(ml_pending, ml_scores):
+        entry["ml_score"] = ml_score
+        entry["ml_version"] = ml_version
+    thread_cache.record_message(segments, reused, skipped_chars)
     
-    final_score = min(base_score, 100)
+    by_risk = sorted(entries, key=lambda e: -e["rule_score"])
+    flags = []
+    seen_codes = set()
+    for entry in entries:
+        for flag in entry["flags"]:
+            if flag.get("code") not in seen_codes:
+                seen_codes.add(flag.get("code"))
+                flags.append(flag)
     
-    # إذا فيه رابط خطير (يطلب بيانات)، ارفع النتيجة
-    for url_result in link_scan["urls"]:
-        if url_result.get("content_type") in ["payment", "login"]:
-            if url_result["risk_score"] >= 50:
-                final_score = max(final_score, 75)
-                break
+    thread = {
+        "segments": len(segments),
+        "quoted": sum(1 for s in segments if s["quoted"]),
+        "reused": reused,
+        "chars_skipped": skipped_chars
+    }
+    if "window" in segments[0]:
+        thread["windowed"] = {
+            "input_chars": segments[0]["input_chars"],
+            "analyzed_chars": sum(s["chars"] for s in segments),
+            "windows": [s["window"] for s in segments]
+        }
+    
+    return {
+        "rule_score": by_risk[0]["rule_score"],
+        "threat_type": next((e["threat_type"] for e in by_risk if e["threat_type"] != "رسالة عادية"),
+                            "رسالة عادية"),
+        "flags": flags,
+        "ml_score": max(e["ml_score"] for e in entries),
+        "thread": thread
+    }
+
+
+def segment_urls(segment: Dict, entry: Dict) -> List[str]:
+    if "urls" not in entry:
+        entry["urls"] = extract_urls(segment["text"])
+    return entry["urls"]
+
+
+@staged("link_syntax")
+def scan_segments(segments: List[Dict]) -> Dict:
+    """فحص شكل الروابط (بدون فتحها) لكل مقطع، والمقاطع المفحوصة قبل من الكاش"""
+    results = []
+    urls = set()
+    for segment in segments:
+        entry = thread_cache.entry(segment["hash"])
+        hit = "links_fast" in entry
+        thread_cache.record_stage("links_fast", hit)
+        if not hit:
+            entry["links_fast"] = scan_all_urls(segment["text"])["urls"]
+        results += entry["links_fast"]
+        urls.update(segment_urls(segment, entry))
+    return summarize_link_results(results, len(urls), deep=False)
+
+
+async def deep_scan_segments(segments: List[Dict], on_result=None) -> Dict:
+    """
+    فتح الروابط: روابط المقاطع الجديدة فقط (نفس حد الروابط لكل رسالة)،
+    ونتائج المقاطع المفحوصة قبل من الكاش (وتُبث عبر on_result أيضاً)
+    """
+    results = []
+    urls = set()
+    pending = []
+    for segment in segments:
+        entry = thread_cache.entry(segment["hash"])
+        urls.update(segment_urls(segment, entry))
+        hit = "links_deep" in entry
+        thread_cache.record_stage("links_deep", hit)
+        if not hit:
+            pending.append((segment, entry))
+            continue
+        results += entry["links_deep"]
+        if on_result:
+            for url_result in entry["links_deep"]:
+                on_result(url_result)
+    
+    if pending:
+        scan = await scan_all_urls_deep("\n\n".join(segment["text"] for segment, _ in pending), on_result)
+        results += scan["urls"]
+        scanned = {u["url"]: u for u in scan["urls"] if not u.get("deferred")}
+        for segment, entry in pending:
+            # يُحفظ فقط إذا انفحصت كل روابط المقطع (الحد أو الضغط ممكن يخلي بعضها)
+            if all(url in scanned for url in entry["urls"]):
+                entry["links_deep"] = [scanned[url] for url in entry["urls"]]
     
-    # 6. الإجراءات والنصيحة
+    return summarize_link_results(results, len(urls), deep=True)
+
+
+async def ai_score_segments(segments: List[Dict]) -> Optional[int]:
+    """
+    AI لكل مقطع لوحده (المقاطع المكررة من كاش ai_scorer)، ونتيجة السلسلة أعلاها
+    
+    رسالة بنوافذ: النافذة الأولى فقط (طلب واحد، والـ AI يقرأ بداية النص)
+    """
+    if len(segments) == 1 or "window" in segments[0]:
+        return await get_ai_score(segments[0]["text"])
+    scores = [s for s in await asyncio.gather(*(get_ai_score(seg["text"]) for seg in segments))
+              if s is not None]
+    return max(scores) if scores else None
+
+
+# ==================== الحملات ====================
+@staged("campaign")
+def campaign_lookup(segments: List[Dict]) -> Dict:
+    """
+    الحملة المشابهة للمحتوى الجديد في الرسالة (بدون المقتبس)
+    
+    الرسائل الضخمة (بنوافذ) ما تدخل الفهرس
+    """
+    if "window" in segments[0]:
+        return {"signature": None, "match": None}
+    text = "\n\n".join(s["text"] for s in segments if not s["quoted"]) or segments[0]["text"]
+    return campaign_index.lookup(text)
+
+
+def campaign_verdict(text: str, segments: List[Dict], scores: Dict, found: Dict) -> Dict:
+    """
+    رسالة من حملة حكمها خطير: القواعد + ML + شكل الروابط لها هي (لو طلعت
+    أخطر تبقى نتيجتها)، وبدون فتح الروابط وبدون AI
+    """
+    link_scan = scan_segments(segments)
+    verdict = build_verdict(text, scores, None, link_scan, found["match"])
+    verdict["deep_scan"] = "campaign"
+    verdict["pipeline"] = scoring_pipeline.skip(expensive_stages(link_scan), "campaign")
+    campaign_index.add(found, verdict, judged=False)
+    return finalize_verdict(text, verdict)
+
+
+def fusion_values(scores: Dict, ai_score: Optional[int], link_risk: int) -> Dict:
+    """نتائج المراحل للدمج (None: المرحلة ما اشتغلت أو غير متاحة فما تدخل في الأوزان)"""
+    return {
+        "rule": scores["rule_score"],
+        "ml": scores["ml_score"] if ml_model.is_trained else None,
+        "ai": ai_score,
+        "link": link_risk
+    }
+
+
+def expensive_stages(link_scan: Dict) -> List[str]:
+    """المراحل الغالية اللي لها معنى للرسالة (AI إذا متاح، وفتح الروابط إذا فيه روابط)"""
+    return [stage for stage, applies in (("ai", ai_scorer.enabled), ("link_deep", link_scan["total_urls"] > 0))
+            if applies]
+
+
+async def run_expensive_stages(segments: List[Dict], scores: Dict, on_link=None, on_ai=None):
+    """
+    فتح الروابط + AI عبر scoring_pipeline: تُتخطى إذا نتيجتها ما تقدر تغير مستوى الخطر
+    
+    Returns:
+        (ملخص الروابط: العميق أو الشكل فقط، نتيجة AI أو None، ملخص pipeline للرد)
+    """
+    link_scan = scan_segments(segments)
+    
+    async def ai_stage() -> Optional[int]:
+        ai_score = await ai_score_segments(segments)
+        if on_ai:
+            on_ai(ai_score)
+        return ai_score
+    
+    runners = {"ai": ai_stage, "link_deep": lambda: deep_scan_segments(segments, on_result=on_link)}
+    run = await scoring_pipeline.run(fusion_values(scores, None, link_scan["overall_risk"]),
+                                     link_scan["total_urls"],
+                                     {stage: runners[stage] for stage in expensive_stages(link_scan)})
+    results = run["results"]
+    return results.get("link_deep", link_scan), results.get("ai"), run["pipeline"]
+
+
+@staged("verdict")
+def build_verdict(text: str, scores: Dict, ai_score: Optional[int], link_scan: Dict,
+                  campaign: Optional[Dict] = None) -> Dict:
+    """
+    بناء رد التحليل (يُستخدم للحكم السريع والنهائي)
+    
+    scores: نتيجة score_segments (القواعد + ML لكل السلسلة)
+    ai_score = None يعني أن الـ AI غير متاح أو تم تخطيه، فلا يدخل في الأوزان
+    campaign: الحملة المشابهة من campaign_index.lookup (إن وجدت)، وإذا حكمها
+              خطير تصير نتيجتها الحد الأدنى
+    """
+    rule_score = scores["rule_score"]
+    ml_score = scores["ml_score"]
+    link_risk = link_scan["overall_risk"]
+    flags = scores["flags"] + get_link_flags(link_scan["urls"])
+    final_score = fuse(fusion_values(scores, ai_score, link_risk), dangerous_page(link_scan["urls"]))
+    use_ai = ai_score is not None
+    ai_score = ai_score or 0
+    threat_type = scores["threat_type"]
+    if campaign and campaign["malicious"]:
+        final_score = max(final_score, campaign["risk_score"])
+        if threat_type == "رسالة عادية":
+            threat_type = campaign["cluster"]["threat_type"]
+    
+    # الإجراءات والنصيحة
     actions = get_actions(final_score, flags)
-    advice = get_advice(final_score, msg.text)
+    advice = get_advice(final_score, text)
     
     # نصيحة خاصة بالروابط
     for url_result in link_scan["urls"]:
@@ -506,12 +1025,6 @@ async def analyze(msg: Message):
             advice = f"⚠️ الرابط يطلب: {fields_str}! " + advice
             break
     
-    # 7. تسجيل
-    analytics.record(final_score, threat_type)
-    
-    # 8. حفظ للتعلم
-    save_email_for_learning(msg.text, final_score, threat_type)
-    
     return {
         "risk_score": final_score,
         "threat_type": threat_type,
@@ -521,37 +1034,377 @@ async def analyze(msg: Message):
         "links": {
             "total": link_scan["total_urls"],
             "dangerous": link_scan["dangerous_urls"],
-            "summary": link_scan["summary"],
+            "summary": link_scan.get("summary", ""),
             "details": [{
                 "url": u["url"],
                 "domain": u["domain"],
                 "risk_score": u["risk_score"],
-                "verdict": u["verdict"],
-                "content_summary": u["content_summary"],
-                "arabic_description": u["arabic_description"],
-                "fields_detected": u["fields_detected"],
-                "page_title": u["page_title"]
+                "verdict": u.get("verdict", ""),
+                "content_summary": u.get("content_summary", ""),
+                "arabic_description": u.get("arabic_description", ""),
+                "fields_detected": u.get("fields_detected", []),
+                "page_title": u.get("page_title")
             } for u in link_scan["urls"]]
         },
         "analysis_details": {
             "rule_score": rule_score,
             "ml_score": ml_score,
             "ai_score": ai_score,
+            "ai_used": use_ai,
             "link_risk": link_risk
         },
-        "learning_status": f"تم حفظ ({new_emails_count}/{AUTO_RETRAIN_THRESHOLD})"
+        "thread": scores["thread"],
+        "campaign": {
+            "id": campaign["cluster"]["id"],
+            "size": campaign["cluster"]["size"] + 1,
+            "similarity": campaign["similarity"],
+            "inherited": campaign["malicious"]
+        } if campaign else None,
+        "model_version": ml_model.version
+    }
+
+
+def finalize_verdict(text: str, verdict: Dict) -> Dict:
+    """تسجيل الحكم النهائي في الإحصائيات وحفظه للتعلم"""
+    analytics.record(verdict["risk_score"], verdict["threat_type"])
+    save_email_for_learning(text, verdict["risk_score"], verdict["threat_type"])
+    verdict["learning_status"] = f"تم حفظ ({new_emails_count}/{AUTO_RETRAIN_THRESHOLD})"
+    return verdict
+
+
+async def run_deep_analysis(job_id: str, text: str, segments: List[Dict], scores: Dict, found: Dict):
+    """الفحص العميق في الخلفية: فتح الروابط + AI ثم تحديث الحكم (found: نتيجة campaign_lookup)"""
+    
+    def on_link(u: Dict):
+        jobs.add_event(job_id, "link", {
+            "url": u["url"],
+            "domain": u["domain"],
+            "risk_score": u["risk_score"],
+            "verdict": u["verdict"],
+            "content_summary": u["content_summary"]
+        })
+    
+    def on_ai(ai_score: Optional[int]):
+        jobs.add_event(job_id, "ai", {"ai_score": ai_score, "available": ai_score is not None})
+    
+    try:
+        link_scan, ai_score, pipeline = await run_expensive_stages(segments, scores, on_link, on_ai)
+        if "ai" not in pipeline["ran"]:
+            jobs.add_event(job_id, "ai", {"ai_score": None, "available": ai_scorer.enabled,
+                                          "skipped": "ai" in pipeline["skipped"]})
+        verdict = build_verdict(text, scores, ai_score, link_scan, found["match"])
+        verdict["pipeline"] = pipeline
+        verdict = finalize_verdict(text, verdict)
+        campaign_index.add(found, verdict, judged=True, preview=text)
+        jobs.add_event(job_id, "final", verdict)
+        jobs.finish(job_id, verdict)
+    except Exception as e:
+        print(f"❌ خطأ في الفحص العميق: {e}")
+        jobs.fail(job_id, str(e))
+
+
+async def run_analysis_job(job_id: str, text: str, segments: List[Dict]):
+    """تحليل كامل كمهمة في الخلفية (وضع async) مع حدث لكل مرحلة"""
+    try:
+        scores = await score_segments(segments)
+        add_score_events(job_id, scores)
+        found = campaign_lookup(segments)
+        if found["match"] and found["match"]["malicious"]:
+            verdict = campaign_verdict(text, segments, scores, found)
+            jobs.add_event(job_id, "final", verdict)
+            jobs.finish(job_id, verdict)
+            return
+    except Exception as e:
+        print(f"❌ خطأ في التحليل: {e}")
+        jobs.fail(job_id, str(e))
+        return
+    
+    await run_deep_analysis(job_id, text, segments, scores, found)
+
+
+def add_score_events(job_id: str, scores: Dict):
+    jobs.add_event(job_id, "rules", {"rule_score": scores["rule_score"], "threat_type": scores["threat_type"],
+                                     "flags": scores["flags"], "thread": scores["thread"]})
+    jobs.add_event(job_id, "ml", {"ml_score": scores["ml_score"], "available": ml_model.is_trained})
+
+
+# مهام الخلفية (نحتفظ بمرجع حتى لا يحذفها الـ garbage collector)
+background_tasks = set()
+
+# حلقات الخدمة الدائمة (تُلغى عند الإيقاف بدون انتظار)
+service_tasks = []
+
+
+def spawn(coro):
+    """تشغيل coroutine في الخلفية"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+def training_links(job_id: str) -> Dict:
+    return {
+        "job_id": job_id,
+        "poll_url": f"/jobs/{job_id}",
+        "stream_url": f"/jobs/{job_id}/stream"
+    }
+
+
+def job_links(job_id: str) -> Dict:
+    return {
+        "analysis_id": job_id,
+        "update_url": f"/analyze/{job_id}",
+        "poll_url": f"/jobs/{job_id}",
+        "stream_url": f"/jobs/{job_id}/stream"
     }
 
 
+@app.post("/analyze")
+async def analyze(msg: Message, mode: str = "full", ticket: Dict = Depends(admission_ticket),
+                  shape: ResponseShape = Depends(ResponseShape.from_request)):
+    """
+    تحليل إيميل
+    
+    mode=full: ينتظر كل المراحل (الافتراضي)
+    mode=fast: حكم فوري (قواعد + ML + شكل الروابط) والفحص العميق يكمل
+               في الخلفية، والحكم المحدّث من GET /analyze/{analysis_id}
+    mode=async: يرجع رقم المهمة فوراً، والنتائج تُبث مرحلة بمرحلة
+                عبر GET /jobs/{id} أو GET /jobs/{id}/stream (SSE)
+    
+    تحت الضغط (ticket["degraded"]) كل الأوضاع ترجع الحكم المخفف فوراً:
+    بدون فتح الروابط وبدون AI، مع degraded=true في الرد
+    
+    شكل الرد: profile=compact (رموز قصيرة بدل النصوص) و fields=a,b.c
+    (الحقول المطلوبة فقط)، أو نفسها بالهيدر X-Aman-Profile / X-Aman-Fields
+    """
+    return await analyze_text(message_text(msg), mode, ticket, shape)
+
+
+@app.post("/analyze/eml")
+async def analyze_eml(request: Request, mode: str = "full", ticket: Dict = Depends(admission_ticket),
+                      shape: ResponseShape = Depends(ResponseShape.from_request)):
+    """
+    تحليل إيميل خام (.eml / RFC 822) في جسم الطلب
+    
+    الرسالة تُقرأ أثناء وصولها: المرفقات ما تتخزن (الاسم والنوع والحجم فقط)،
+    والروابط من href في HTML ومن النص. نفس أوضاع /analyze، والرد فيه
+    email: المرسل، الموضوع، المرفقات، والروابط المخادعة (النص يعرض دومين آخر)
+    
+    curl -X POST --data-binary @message.eml "http://localhost:8000/analyze/eml?mode=fast"
+    """
+    try:
+        with stage("eml_parse"):
+            email = await parse_eml_stream(request.stream())
+    except EmlTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    msg = Message(text=email["text"], sender=email["from"], subject=email["subject"], urls=email["urls"])
+    summary = {
+        "from": email["from"],
+        "reply_to": email["reply_to"],
+        "subject": email["subject"],
+        "attachments": email["attachments"],
+        "urls": len(email["urls"]),
+        "deceptive_links": [link for link in email["links"] if link["deceptive"]],
+        "truncated": email["truncated"]
+    }
+    return await analyze_text(message_text(msg), mode, ticket, shape, {"email": summary}, "/analyze/eml")
+
+
+async def analyze_text(text: str, mode: str, ticket: Dict, shape: ResponseShape,
+                       extra: Optional[Dict] = None, source: str = "/analyze"):
+    """
+    مسار التحليل المشترك بين /analyze و /analyze/eml (extra: حقول تُضاف للرد)
+    
+    مع AMAN_CAPTURE=1 كل طلب يُسجل (الوقت، المدة، الحالة، شكل الرسالة)
+    لإعادته لاحقاً بـ tools/replay_traffic.py
+    """
+    # المقاطع: سلسلة الردود (المقتبس المحلل قبل من الكاش)، أو نوافذ للرسالة
+    # الأكبر من ميزانية التحليل
+    segments = segment_message(text)
+    if not traffic_capture.enabled:
+        return await analyze_segments(text, segments, mode, ticket, shape, extra or {})
+    
+    arrived = time.time()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await analyze_segments(text, segments, mode, ticket, shape, extra or {})
+        status = getattr(response, "status_code", 200)
+        return response
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        traffic_capture.record(arrived=arrived, path=source, mode=mode, client=ticket["client"], text=text,
+                               segments=segments, status=status,
+                               latency_ms=(time.perf_counter() - start) * 1000, degraded=ticket["degraded"])
+
+
+async def analyze_segments(text: str, segments: List[Dict], mode: str, ticket: Dict, shape: ResponseShape,
+                           extra: Dict):
+    if mode == "async" and not ticket["degraded"]:
+        try:
+            job_id = jobs.create()
+        except JobLimitError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        spawn(run_analysis_job(job_id, text, segments))
+        return {"status": "pending", **job_links(job_id), **extra}
+    
+    # 1+2. القواعد + ML لكل مقطع
+    scores = await score_segments(segments)
+    
+    # نسخة من حملة حكمها خطير: حكم الحملة بدون فتح الروابط وبدون AI (بكل الأوضاع)
+    found = campaign_lookup(segments)
+    if found["match"] and found["match"]["malicious"]:
+        verdict = campaign_verdict(text, segments, scores, found)
+        if ticket["degraded"]:
+            verdict["degraded"] = True
+            verdict["degraded_reason"] = ticket["reason"]
+        return shape.respond({**verdict, **({"status": "done"} if mode == "fast" else {}), **extra})
+    
+    if ticket["degraded"]:
+        # وضع مخفف: فحص شكل الروابط فقط، بدون AI وبدون مهام خلفية
+        link_scan = scan_segments(segments)
+        verdict = build_verdict(text, scores, None, link_scan, found["match"])
+        verdict["pipeline"] = scoring_pipeline.skip(expensive_stages(link_scan), "degraded")
+        verdict = finalize_verdict(text, verdict)
+        campaign_index.add(found, verdict, judged=False, preview=text)
+        verdict["degraded"] = True
+        verdict["degraded_reason"] = ticket["reason"]
+        return shape.respond({**verdict, **extra})
+    
+    if mode == "fast":
+        # 3. فحص شكل الروابط فقط (بدون فتحها)
+        link_scan = scan_segments(segments)
+        verdict = build_verdict(text, scores, None, link_scan, found["match"])
+        
+        try:
+            job_id = jobs.create(verdict)
+        except JobLimitError:
+            # السيرفر مشغول: نكتفي بالحكم السريع بدون فحص عميق
+            verdict["pipeline"] = scoring_pipeline.skip(expensive_stages(link_scan), "busy")
+            verdict = finalize_verdict(text, verdict)
+            campaign_index.add(found, verdict, judged=False, preview=text)
+            verdict["status"] = "done"
+            verdict["deep_scan"] = "skipped"
+            return shape.respond({**verdict, **extra})
+        
+        add_score_events(job_id, scores)
+        jobs.add_event(job_id, "preliminary", verdict)
+        spawn(run_deep_analysis(job_id, text, segments, scores, found))
+        
+        return shape.respond({**verdict, "status": "pending", **job_links(job_id), **extra})
+    
+    # 3. 🔗 فحص الروابط بالعمق (يدخل على المواقع!) + AI بالتوازي، إلا إذا
+    #    نتيجتها ما تقدر تغير مستوى الخطر (scoring_pipeline)
+    link_scan, ai_score, pipeline = await run_expensive_stages(segments, scores)
+    
+    verdict = build_verdict(text, scores, ai_score, link_scan, found["match"])
+    verdict["pipeline"] = pipeline
+    verdict = finalize_verdict(text, verdict)
+    campaign_index.add(found, verdict, judged=True, preview=text)
+    return shape.respond({**verdict, **extra})
+
+
+@app.get("/analyze/{analysis_id}")
+async def analysis_result(analysis_id: str, request: Request,
+                          shape: ResponseShape = Depends(ResponseShape.from_request)):
+    """الحكم المحدّث بعد الفحص العميق (للوضع السريع)"""
+    job = jobs.get(analysis_id)
+    if job is None and prefork.owner_port(analysis_id):
+        return await prefork.forward(request, prefork.owner_port(analysis_id),
+                                     404, "التحليل غير موجود أو انتهت صلاحيته")
+    if job is None:
+        raise HTTPException(status_code=404, detail="التحليل غير موجود أو انتهت صلاحيته")
+    
+    return FastJSONResponse({
+        "analysis_id": analysis_id,
+        "status": job["status"],
+        "result": shape.apply(job["result"]) if job["result"] else None,
+        "error": job["error"]
+    })
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, request: Request, since: int = 0):
+    """متابعة المهمة بالـ polling (since = أول رقم حدث غير مستلم)"""
+    job = jobs.get(job_id)
+    if job is None and prefork.owner_port(job_id):
+        return await prefork.forward(request, prefork.owner_port(job_id),
+                                     404, "المهمة غير موجودة أو انتهت صلاحيتها")
+    if job is None:
+        raise HTTPException(status_code=404, detail="المهمة غير موجودة أو انتهت صلاحيتها")
+    
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "events": jobs.events_since(job_id, since),
+        "next_since": len(job["events"]),
+        "result": job["result"] if job["status"] != "pending" else None,
+        "error": job["error"]
+    }
+
+
+@app.get("/jobs/{job_id}/stream")
+async def job_stream(job_id: str, request: Request):
+    """بث نتائج المراحل أول بأول (Server-Sent Events)"""
+    if jobs.get(job_id) is None and prefork.owner_port(job_id):
+        return await prefork.forward(request, prefork.owner_port(job_id),
+                                     404, "المهمة غير موجودة أو انتهت صلاحيتها")
+    if jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="المهمة غير موجودة أو انتهت صلاحيتها")
+    
+    async def event_source():
+        seen = 0
+        while True:
+            for event in jobs.events_since(job_id, seen):
+                seen = event["seq"] + 1
+                payload = json.dumps(event, ensure_ascii=False)
+                yield f"id: {event['seq']}\nevent: {event['stage']}\ndata: {payload}\n\n"
+            
+            job = jobs.get(job_id)
+            if job is None:
+                return
+            if job["status"] != "pending" and seen >= len(job["events"]):
+                payload = json.dumps({"status": job["status"], "error": job["error"]}, ensure_ascii=False)
+                yield f"event: end\ndata: {payload}\n\n"
+                return
+            
+            if not await jobs.wait_for_update(job_id, seen, JOB_SSE_KEEPALIVE):
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
 # ==================== التشغيل ====================
+def preload_for_workers():
+    """تحميل النموذج في الـ supervisor قبل الـ fork (الصفحات تتشارك بين العمال)"""
+    prepare_serving()  # load() يضبط الاستدلال بخيط واحد داخل كل عامل
+
+
 if __name__ == "__main__":
+    import argparse
     import uvicorn
+    
+    parser = argparse.ArgumentParser(description="سيرفر أمان")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=PREFORK_WORKERS,
+                        help="عدد العمليات (أكثر من 1 = prefork بنموذج مشترك)")
+    args = parser.parse_args()
+    
     print("=" * 50)
     print("🛡️  أمان | Aman v3.0 - مع فحص الروابط!")
     print("=" * 50)
-    print("🌐 http://localhost:8000")
-    print("📊 http://localhost:8000/stats")
-    print("🧠 http://localhost:8000/learning/status")
-    print("🔗 http://localhost:8000/scan-link")
+    print(f"🌐 http://localhost:{args.port}")
+    print(f"📊 http://localhost:{args.port}/stats")
+    print(f"🧠 http://localhost:{args.port}/learning/status")
+    print(f"🔗 http://localhost:{args.port}/scan-link")
     print("=" * 50)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if args.workers > 1:
+        prefork.Supervisor(app, args.workers, args.host, args.port, preload_for_workers).run()
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,55 @@
+"""
+سطح المقاييس الموحد
+Metrics Registry
+
+كل مكوّن يسجّل دالة ترجع إحصائياته، و GET /metrics يجمعها كلها.
+"""
+
+from typing import Callable, Dict, List
+
+
+class MetricsRegistry:
+    """تجميع إحصائيات المكونات"""
+
+    def __init__(self):
+        self._providers: Dict[str, Callable[[], Dict]] = {}
+
+    def register(self, name: str, provider: Callable[[], Dict]):
+        """تسجيل مكوّن (provider دالة بدون مدخلات ترجع dict)"""
+        self._providers[name] = provider
+
+    def snapshot(self) -> Dict:
+        """لقطة من كل المقاييس"""
+        result = {}
+        for name, provider in self._providers.items():
+            try:
+                result[name] = provider()
+            except Exception as e:
+                result[name] = {"error": str(e)}
+        return result
+
+
+def merge_snapshots(snapshots: List[Dict]) -> Dict:
+    """
+    مجموع مقاييس عدة عمال (عند التشغيل بعدة عمليات)
+
+    العدادات (int) تنجمع، والحقول اللي تبدأ بـ max_ يؤخذ أعلاها.
+    المتوسطات والنسب (float) والنصوص ما لها معنى بالجمع فتُترك
+    (موجودة لكل عامل على حدة).
+    """
+    merged: Dict = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            if isinstance(value, dict):
+                merged[key] = merge_snapshots([merged.get(key, {}), value])
+            elif isinstance(value, bool) or not isinstance(value, int):
+                continue
+            elif key.startswith("max_"):
+                merged[key] = max(merged.get(key, value), value)
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+# instance واحد للسيرفر
+metrics = MetricsRegistry()
@@ -0,0 +1,390 @@
+"""
+قراءة الإيميل الخام (.eml / RFC 822 / MIME)
+Streaming MIME Ingestion
+
+الإكستنشن ترسل innerText فقط، فالروابط المخفية خلف نص الرابط (href)
+ما توصل لـ extract_urls. هنا نقرأ الرسالة الخام سطر بسطر أثناء وصولها:
+
+1. الهيدرات: المرسل، الموضوع، الرد إلى ... (مع فك ترميز =?utf-8?...?=)
+2. أجزاء النص و HTML: فك base64 / quoted-printable والـ charset تدريجياً،
+   ومن HTML نطلع النص الظاهر وكل href (مع نص الرابط) بنفس المرور
+3. المرفقات: ما تتخزن أبداً، نسجل الاسم والنوع والحجم فقط
+4. حدود للحجم: الرسالة كاملة، النص، الهيدرات، عدد الأجزاء، طول السطر
+
+طريقة الاستخدام:
+    parser = EmlParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    email = parser.close()
+
+أو parse_eml(data) / await parse_eml_stream(async_chunks)
+"""
+
+import binascii
+import codecs
+import quopri
+from email.parser import BytesHeaderParser
+from email.policy import default as default_policy
+from html.parser import HTMLParser
+from typing import AsyncIterable, Dict, Iterable, List, Optional, Union
+from urllib.parse import urlparse
+
+from config import EML_MAX_BYTES, EML_MAX_TEXT_BYTES, EML_MAX_HEADER_BYTES, EML_MAX_PARTS, EML_MAX_LINE
+from link_scanner import extract_urls
+
+TEXT_TYPES = ("text/plain", "text/html")
+HEADER_FIELDS = {"from": "from", "reply_to": "reply-to", "to": "to", "subject": "subject",
+                 "date": "date", "message_id": "message-id"}
+BLOCK_TAGS = {"br", "p", "div", "tr", "li", "h1", "h2", "h3", "h4", "table", "blockquote"}
+
+
+class EmlTooLarge(Exception):
+    """الرسالة أكبر من EML_MAX_BYTES"""
+
+
+# ==================== فك الترميز ====================
+class _Base64Decoder:
+    """فك base64 سطر بسطر (الباقي اللي ما يكمل 4 أحرف ينتظر السطر التالي)"""
+
+    def __init__(self):
+        self._rest = b""
+
+    def decode(self, line: bytes) -> bytes:
+        data = self._rest + b"".join(line.split())
+        usable = len(data) - len(data) % 4
+        self._rest = data[usable:]
+        try:
+            return binascii.a2b_base64(data[:usable])
+        except binascii.Error:
+            return b""
+
+
+class _QuotedPrintableDecoder:
+    def decode(self, line: bytes) -> bytes:
+        return quopri.decodestring(line)
+
+
+class _IdentityDecoder:
+    def decode(self, line: bytes) -> bytes:
+        return line
+
+
+def _transfer_decoder(encoding: Optional[str]):
+    encoding = (encoding or "").strip().lower()
+    if encoding == "base64":
+        return _Base64Decoder()
+    if encoding == "quoted-printable":
+        return _QuotedPrintableDecoder()
+    return _IdentityDecoder()
+
+
+def _charset_decoder(charset: Optional[str]):
+    try:
+        return codecs.getincrementaldecoder(charset or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+# ==================== HTML ====================
+class _HTMLLinkExtractor(HTMLParser):
+    """النص الظاهر + كل رابط (href) مع النص المكتوب عليه"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text: List[str] = []
+        self.links: List[Dict] = []
+        self._skip = 0
+        self._anchor: Optional[Dict] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style", "head"):
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self.text.append("\n")
+        if tag in ("a", "area"):
+            href = (dict(attrs).get("href") or "").strip()
+            if href.lower().startswith(("http://", "https://")):
+                self._anchor = {"url": href, "text": ""}
+                self.links.append(self._anchor)
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "head") and self._skip:
+            self._skip -= 1
+        elif tag == "a":
+            self._anchor = None
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self.text.append(data)
+        if self._anchor is not None and len(self._anchor["text"]) < 200:
+            self._anchor["text"] += data.strip()
+
+
+def _is_deceptive(link: Dict) -> bool:
+    """نص الرابط يعرض دومين غير الدومين الحقيقي (bank.com ← evil.xyz)"""
+    shown = link["text"].strip().lower()
+    if "." not in shown or " " in shown:
+        return False
+    if "://" not in shown:
+        shown = "http://" + shown
+    shown_host = (urlparse(shown).hostname or "").removeprefix("www.")
+    real_host = (urlparse(link["url"]).hostname or "").lower().removeprefix("www.")
+    return bool(shown_host) and shown_host != real_host and not real_host.endswith("." + shown_host)
+
+
+# ==================== أجزاء الرسالة ====================
+class _TextPart:
+    """جزء نص أو HTML: فك الترميز تدريجياً ضمن ميزانية النص"""
+
+    def __init__(self, parser: "EmlParser", content_type: str, charset: Optional[str], encoding: Optional[str]):
+        self.parser = parser
+        self.is_html = content_type == "text/html"
+        self.transfer = _transfer_decoder(encoding)
+        self.charset = _charset_decoder(charset)
+        self.html = _HTMLLinkExtractor() if self.is_html else None
+        self.chunks: List[str] = []
+
+    def write(self, line: bytes):
+        if self.parser.text_budget <= 0:
+            self.parser.truncated = True
+            return
+        data = self.transfer.decode(line)[:self.parser.text_budget]
+        self.parser.text_budget -= len(data)
+        self._emit(self.charset.decode(data))
+
+    def _emit(self, text: str):
+        if self.html is not None:
+            self.html.feed(text)
+        else:
+            self.chunks.append(text)
+
+    def finish(self):
+        self._emit(self.charset.decode(b"", final=True))
+        if self.html is not None:
+            self.html.close()
+            self.parser.html_text.append("".join(self.html.text))
+            self.parser.links.extend(self.html.links)
+        else:
+            self.parser.plain_text.append("".join(self.chunks).replace("\r\n", "\n"))
+
+
+class _AttachmentPart:
+    """مرفق: يُعد حجمه فقط بدون تخزين"""
+
+    def __init__(self, parser: "EmlParser", info: Dict):
+        self.parser = parser
+        self.info = info
+
+    def write(self, line: bytes):
+        self.info["bytes"] += len(line)
+
+    def finish(self):
+        self.parser.attachments.append(self.info)
+
+
+class _SkippedPart:
+    def write(self, line: bytes):
+        pass
+
+    def finish(self):
+        pass
+
+
+# ==================== المحلل ====================
+class EmlParser:
+    """محلل MIME تدريجي: feed() لكل دفعة بايتات ثم close() للنتيجة"""
+
+    def __init__(self, max_bytes: int = EML_MAX_BYTES, max_text_bytes: int = EML_MAX_TEXT_BYTES,
+                 max_header_bytes: int = EML_MAX_HEADER_BYTES, max_parts: int = EML_MAX_PARTS,
+                 max_line: int = EML_MAX_LINE):
+        self.max_bytes = max_bytes
+        self.max_header_bytes = max_header_bytes
+        self.max_parts = max_parts
+        self.max_line = max_line
+        self.text_budget = max_text_bytes
+
+        self.total_bytes = 0
+        self.truncated = False
+        self.headers: Dict[str, str] = {}
+        self.plain_text: List[str] = []
+        self.html_text: List[str] = []
+        self.links: List[Dict] = []
+        self.attachments: List[Dict] = []
+        self.parts = 0
+        self.skipped_parts = 0
+
+        self._buffer = bytearray()
+        self._line_start = True       # الجزء التالي بداية سطر (يمكن يكون حد MIME)
+        self._boundaries: List[bytes] = []
+        self._state = "headers"       # headers | body | preamble
+        self._header_lines = bytearray()
+        self._part = None
+        self._top_level = True
+
+    # ---------- الإدخال ----------
+    def feed(self, chunk: bytes):
+        self.total_bytes += len(chunk)
+        if self.total_bytes > self.max_bytes:
+            raise EmlTooLarge(f"الرسالة أكبر من {self.max_bytes} بايت")
+
+        self._buffer += chunk
+        while True:
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(self._buffer[:end + 1])
+            del self._buffer[:end + 1]
+            self._line(line, self._line_start)
+            self._line_start = True
+
+        # سطر طويل بدون نهاية: نمرره على دفعات
+        if len(self._buffer) > self.max_line:
+            line = bytes(self._buffer)
+            self._buffer.clear()
+            self._line(line, self._line_start)
+            self._line_start = False
+
+    def close(self) -> Dict:
+        if self._buffer:
+            self._line(bytes(self._buffer), self._line_start)
+            self._buffer.clear()
+        if self._state == "headers" and self._header_lines:
+            self._end_headers()
+        self._finish_part()
+        return self.result()
+
+    # ---------- الأسطر ----------
+    def _line(self, line: bytes, at_line_start: bool):
+        if at_line_start and self._boundaries and line.startswith(b"--"):
+            if self._boundary(line.rstrip()):
+                return
+
+        if self._state == "headers":
+            if line in (b"\r\n", b"\n"):
+                self._end_headers()
+            elif len(self._header_lines) + len(line) <= self.max_header_bytes:
+                self._header_lines += line
+            else:
+                self.truncated = True
+        elif self._state == "body" and self._part is not None:
+            self._part.write(line)
+
+    def _boundary(self, marker: bytes) -> bool:
+        """حد جزء جديد (--b) أو نهاية multipart (--b--)، من الأعمق للأعلى"""
+        for depth in range(len(self._boundaries) - 1, -1, -1):
+            boundary = self._boundaries[depth]
+            if marker == b"--" + boundary:
+                self._finish_part()
+                del self._boundaries[depth + 1:]
+                self._state = "headers"
+                return True
+            if marker == b"--" + boundary + b"--":
+                self._finish_part()
+                del self._boundaries[depth:]
+                self._state = "preamble"
+                return True
+        return False
+
+    # ---------- الأجزاء ----------
+    def _end_headers(self):
+        headers = BytesHeaderParser(policy=default_policy).parsebytes(bytes(self._header_lines) + b"\r\n")
+        self._header_lines.clear()
+
+        if self._top_level:
+            self._top_level = False
+            for key, name in HEADER_FIELDS.items():
+                try:
+                    value = headers[name]
+                except Exception:
+                    value = None  # هيدر تالف
+                if value is not None:
+                    self.headers[key] = str(value)
+
+        self._begin_part(headers)
+
+    def _begin_part(self, headers):
+        content_type = headers.get_content_type()
+
+        if content_type.startswith("multipart/"):
+            boundary = headers.get_param("boundary")
+            if boundary:
+                self._boundaries.append(str(boundary).encode("utf-8", "replace"))
+                self._state = "preamble"
+                return
+
+        if content_type == "message/rfc822":
+            # رسالة مرفقة: هيدراتها ثم محتواها كأجزاء عادية
+            self._state = "headers"
+            return
+
+        self._state = "body"
+        self.parts += 1
+        if self.parts > self.max_parts:
+            self.skipped_parts += 1
+            self.truncated = True
+            self._part = _SkippedPart()
+            return
+
+        filename = headers.get_filename()
+        disposition = headers.get_content_disposition()
+        if content_type in TEXT_TYPES and disposition != "attachment" and not filename:
+            self._part = _TextPart(self, content_type, headers.get_content_charset(),
+                                   headers.get("content-transfer-encoding"))
+        else:
+            self._part = _AttachmentPart(self, {
+                "filename": filename,
+                "content_type": content_type,
+                "bytes": 0
+            })
+
+    def _finish_part(self):
+        if self._part is not None:
+            self._part.finish()
+            self._part = None
+
+    # ---------- النتيجة ----------
+    def result(self) -> Dict:
+        """
+        Returns:
+            from, reply_to, to, subject, date, message_id,
+            text: نص الرسالة (النص العادي، وإلا النص الظاهر من HTML)
+            links: روابط HTML مع النص المكتوب عليها (deceptive = النص يعرض دومين آخر)
+            urls: كل الروابط (href + الموجودة في النص) بدون تكرار
+            attachments: الاسم والنوع والحجم
+        """
+        text = "\n\n".join(t.strip() for t in self.plain_text if t.strip())
+        if not text:
+            text = "\n\n".join(t.strip() for t in self.html_text if t.strip())
+
+        urls = list(dict.fromkeys([link["url"] for link in self.links] + sorted(extract_urls(text))))
+        links = [{**link, "deceptive": _is_deceptive(link)} for link in self.links]
+
+        return {
+            **{key: self.headers.get(key) for key in HEADER_FIELDS},
+            "text": text,
+            "links": links,
+            "urls": urls,
+            "attachments": self.attachments,
+            "parts": self.parts,
+            "skipped_parts": self.skipped_parts,
+            "bytes": self.total_bytes,
+            "truncated": self.truncated
+        }
+
+
+def parse_eml(data: Union[bytes, Iterable[bytes]], **limits) -> Dict:
+    """قراءة رسالة كاملة (bytes) أو على دفعات"""
+    parser = EmlParser(**limits)
+    for chunk in ([data] if isinstance(data, (bytes, bytearray)) else data):
+        parser.feed(chunk)
+    return parser.close()
+
+
+async def parse_eml_stream(chunks: AsyncIterable[bytes], **limits) -> Dict:
+    """قراءة رسالة أثناء وصولها (مثلاً request.stream() في FastAPI)"""
+    parser = EmlParser(**limits)
+    async for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+    return parser.close()
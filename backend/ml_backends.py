@@ -0,0 +1,124 @@
+"""
+أنواع نموذج ML القابلة للتبديل
+Pluggable ML Backends
+
+كل backend يحدد المصنف (classifier) وإعدادات البحث الخاصة به. تحويل النص
+(TF-IDF) واحد للكل، فكاش التحويل في training.py مشترك بينهم.
+
+- forest: Random Forest بـ 100 شجرة (النموذج الأصلي)
+- forest_small: غابة أصغر (30 شجرة، عمق 12): أسرع وأصغر بالذاكرة
+- linear: Logistic Regression على المصفوفة المتفرقة: الأسرع والأصغر
+
+الاختيار من ML_BACKEND في config.py (أو --backend في train.py).
+المقارنة: python tools/bench_ml_backends.py
+"""
+
+from typing import Dict, List
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from config import TRAIN_SEARCH_GRID, TRAIN_SEARCH_GRID_LINEAR
+
+
+class ModelBackend:
+    """واجهة الـ backend: المصنف + إعدادات البحث"""
+
+    name = ""
+    description = ""
+    # يدعم n_jobs (التدريب على عدة أنوية)
+    parallel = False
+    search_grid: Dict[str, list] = {}
+
+    def make_vectorizer(self) -> TfidfVectorizer:
+        # TF-IDF: يحول النص إلى vector من الأرقام
+        # - max_features: أقصى عدد كلمات
+        # - ngram_range: كلمات فردية وثنائية
+        return TfidfVectorizer(
+            max_features=3000,
+            ngram_range=(1, 2),  # "بطاقة" + "بطاقة مجمدة"
+            min_df=1
+        )
+
+    def make_estimator(self):
+        raise NotImplementedError
+
+    def matches(self, estimator) -> bool:
+        """هل المصنف المحفوظ من هذا النوع"""
+        return isinstance(estimator, type(self.make_estimator()))
+
+    def feature_weights(self, estimator) -> List[float]:
+        """وزن كل كلمة في التصنيف (لعرض أهم الكلمات)"""
+        raise NotImplementedError
+
+
+class ForestBackend(ModelBackend):
+    """Random Forest: دقيق لكن حجمه وزمنه يكبر مع عدد الأشجار"""
+
+    parallel = True
+    search_grid = TRAIN_SEARCH_GRID
+
+    def __init__(self, name: str, n_estimators: int, max_depth: int, description: str):
+        self.name = name
+        self.n_estimators = n_estimators
+        self.max_depth = max_depth
+        self.description = description
+
+    def make_estimator(self):
+        # - n_estimators: عدد الأشجار
+        # - class_weight: لموازنة البيانات
+        return RandomForestClassifier(
+            n_estimators=self.n_estimators,
+            max_depth=self.max_depth,
+            class_weight='balanced',
+            random_state=42
+        )
+
+    def feature_weights(self, estimator) -> List[float]:
+        return estimator.feature_importances_
+
+
+class LinearBackend(ModelBackend):
+    """Logistic Regression: ضرب متجه واحد لكل إيميل"""
+
+    name = "linear"
+    description = "Logistic Regression (متفرق)"
+    search_grid = TRAIN_SEARCH_GRID_LINEAR
+
+    def make_estimator(self):
+        return LogisticRegression(
+            C=4.0,
+            class_weight='balanced',
+            max_iter=1000,
+            random_state=42
+        )
+
+    def feature_weights(self, estimator) -> List[float]:
+        # الكلمات اللي تدفع نحو "احتيال" فقط
+        return estimator.coef_[0].clip(min=0)
+
+
+BACKENDS: Dict[str, ModelBackend] = {
+    backend.name: backend for backend in (
+        ForestBackend("forest", 100, 20, "Random Forest (100 شجرة)"),
+        ForestBackend("forest_small", 30, 12, "Random Forest صغير (30 شجرة)"),
+        LinearBackend(),
+    )
+}
+
+
+def get_backend(name: str) -> ModelBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"backend غير معروف: {name} (المتاح: {', '.join(BACKENDS)})")
+    return BACKENDS[name]
+
+
+def backend_for(estimator, default: ModelBackend) -> ModelBackend:
+    """نوع المصنف المحفوظ (الافتراضي أولاً إذا يطابق)"""
+    if default.matches(estimator):
+        return default
+    for backend in BACKENDS.values():
+        if backend.matches(estimator):
+            return backend
+    return default
@@ -0,0 +1,109 @@
+"""
+تجميع طلبات ML في دفعات
+ML Inference Micro-Batching
+
+بدل ما كل طلب /analyze يستدعي النموذج بصف واحد، نجمع الطلبات
+المتزامنة لمدة قصيرة (window) أو حتى نوصل max_batch، ثم نشغل
+transform + predict_proba مرة وحدة ونوزع النتائج على أصحابها.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from config import ML_BATCH_ENABLED, ML_BATCH_WINDOW_MS, ML_BATCH_MAX_SIZE
+
+
+class MicroBatcher:
+    """مجدول دفعات لنموذج FraudDetectionModel"""
+
+    def __init__(self, model, window_ms: float = ML_BATCH_WINDOW_MS, max_batch: int = ML_BATCH_MAX_SIZE,
+                 enabled: bool = ML_BATCH_ENABLED):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # الدفعات الجارية: الـ loop يحفظ المهام بمرجع ضعيف فقط، بدون هذا ممكن
+        # تنحذف مهمة الدفعة قبل ما تخلص وأصحابها ينتظرون للأبد
+        self._batches = set()
+        # thread واحد: الدفعات تتنفذ بالترتيب بدون ما توقف الـ event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-batch")
+        self.stats = {"requests": 0, "batches": 0, "max_batch_seen": 0, "total_inference_ms": 0.0}
+
+    async def predict(self, text: str) -> Dict:
+        """نتيجة النموذج لنص واحد (تنتظر حتى تُنفذ دفعتها)"""
+        self.stats["requests"] += 1
+        if not self.enabled:
+            return self.model.predict(text)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """إرسال الطلبات المعلقة كدفعة وحدة"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self._executor, self.model.predict_batch, texts)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats["batches"] += 1
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+        self.stats["total_inference_ms"] += (time.perf_counter() - start) * 1000
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """إرسال المعلق وانتظار الدفعات الجارية (عند إغلاق السيرفر)"""
+        self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict:
+        batches = max(self.stats["batches"], 1)
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "pending": len(self._pending),
+            "requests": self.stats["requests"],
+            "batches": self.stats["batches"],
+            "avg_batch_size": round(self.stats["requests"] / batches, 2),
+            "max_batch_seen": self.stats["max_batch_seen"],
+            "avg_inference_ms": round(self.stats["total_inference_ms"] / batches, 2)
+        }
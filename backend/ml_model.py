@@ -7,170 +7,94 @@ Machine Learning Model for Fraud Detection
 
 import os
 import pickle
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
+
+from config import ML_BACKEND
+from inference import InferenceModel, MODEL_PATH, VECTORIZER_PATH, read_model_info, write_model_info
+from ml_backends import BACKENDS, backend_for, get_backend
 
 # المسارات
 DATA_PATH = "data/training_data.csv"
-MODEL_PATH = "models/fraud_model.pkl"
-VECTORIZER_PATH = "models/vectorizer.pkl"
 
 
-class FraudDetectionModel:
+class FraudDetectionModel(InferenceModel):
     """
-    نموذج كشف الاحتيال باستخدام Random Forest + TF-IDF
+    نموذج كشف الاحتيال باستخدام TF-IDF + مصنف (حسب الـ backend)
     
     الخطوات:
     1. تحويل النص إلى أرقام (TF-IDF)
-    2. تدريب Random Forest على التصنيف
+    2. تدريب المصنف (Random Forest أو Logistic Regression، انظر ml_backends.py)
     3. حفظ النموذج للاستخدام لاحقاً
+    
+    التحليل (predict_batch) والتحميل موروثة من InferenceModel في inference.py
     """
     
-    def __init__(self):
-        # TF-IDF: يحول النص إلى vector من الأرقام
-        # - max_features: أقصى عدد كلمات
-        # - ngram_range: كلمات فردية وثنائية
-        self.vectorizer = TfidfVectorizer(
-            max_features=3000,
-            ngram_range=(1, 2),  # "بطاقة" + "بطاقة مجمدة"
-            min_df=1
-        )
-        
-        # Random Forest: خوارزمية التصنيف
-        # - n_estimators: عدد الأشجار
-        # - class_weight: لموازنة البيانات
-        self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=20,
-            class_weight='balanced',
-            random_state=42
-        )
-        
-        self.is_trained = False
+    def __init__(self, backend: str = ML_BACKEND):
+        super().__init__()
+        self.backend = get_backend(backend)
+        self.backend_name = self.backend.name
+        self.vectorizer = self.backend.make_vectorizer()
+        self.model = self.backend.make_estimator()
     
-    def train(self, data_path: str = DATA_PATH):
+    def train(self, data_path: str = DATA_PATH, folds: int = 0, search: bool = False):
         """
-        تدريب النموذج
+        تدريب النموذج (عبر TrainingPipeline في training.py)
         
         Args:
             data_path: مسار ملف CSV
+            folds: عدد folds للتقييم (0 = بدون)
+            search: بحث عن أفضل إعدادات
         
         Returns:
-            dict: نتائج التدريب (accuracy, report)
+            dict: نتائج التدريب (accuracy, report, cv, timings ...)
         """
-        print("📚 جاري تحميل البيانات...")
-        
-        # قراءة البيانات
-        df = pd.read_csv(data_path)
-        print(f"   عدد السجلات: {len(df)}")
-        print(f"   احتيال: {len(df[df['label']==1])}")
-        print(f"   آمن: {len(df[df['label']==0])}")
-        
-        # تقسيم البيانات (80% تدريب، 20% اختبار)
-        X = df['text']
-        y = df['label']
-        
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, 
-            test_size=0.2, 
-            random_state=42,
-            stratify=y  # للحفاظ على نسبة التصنيفات
-        )
-        
-        print("\n🔄 جاري تحويل النص إلى أرقام (TF-IDF)...")
-        X_train_vec = self.vectorizer.fit_transform(X_train)
-        X_test_vec = self.vectorizer.transform(X_test)
+        from training import TrainingPipeline  # استيراد متأخر: training يستورد هذا الملف
         
-        print(f"   شكل البيانات: {X_train_vec.shape}")
-        
-        print("\n🧠 جاري تدريب النموذج...")
-        self.model.fit(X_train_vec, y_train)
-        
-        # تقييم النموذج
-        print("\n📊 تقييم النموذج:")
-        y_pred = self.model.predict(X_test_vec)
-        
-        accuracy = accuracy_score(y_test, y_pred)
-        report = classification_report(y_test, y_pred, target_names=['آمن', 'احتيال'])
-        
-        print(f"\n   الدقة: {accuracy * 100:.1f}%")
-        print(f"\n{report}")
-        
-        self.is_trained = True
-        
-        return {
-            "accuracy": accuracy,
-            "report": report,
-            "train_size": len(X_train),
-            "test_size": len(X_test)
-        }
-    
-    def predict(self, text: str) -> dict:
+        trained, results = TrainingPipeline(backend=self.backend.name).run(data_path, folds=folds, search=search)
+        self.adopt(trained)
+        return results
+    
+    def adopt(self, other: InferenceModel):
+        super().adopt(other)
+        self.backend = getattr(other, "backend", self.backend)
+    
+    def save(self, model_path: str = MODEL_PATH, vectorizer_path: str = VECTORIZER_PATH):
         """
-        تحليل نص جديد
-        
-        Args:
-            text: النص المراد تحليله
+        حفظ النموذج
         
-        Returns:
-            dict: نتيجة التحليل
+        الملفين ينكتبون كاملين في ملفات مؤقتة ثم os.replace، وملف المعلومات
+        آخر شيء: الـ supervisor (prefork) يعيد التحميل على تغيّره، فما يقرأ
+        نموذج جديد مع vectorizer قديم أو نصف مكتوب
         """
-        if not self.is_trained:
-            return {
-                "is_fraud": False,
-                "confidence": 0,
-                "risk_score": 0,
-                "error": "النموذج غير مدرب"
-            }
-        
-        # تحويل النص إلى vector
-        text_vec = self.vectorizer.transform([text])
-        
-        # التنبؤ
-        prediction = self.model.predict(text_vec)[0]
-        probabilities = self.model.predict_proba(text_vec)[0]
-        
-        # احتمالية الاحتيال
-        fraud_prob = probabilities[1] if len(probabilities) > 1 else 0
-        
-        return {
-            "is_fraud": bool(prediction),
-            "confidence": float(max(probabilities)),
-            "fraud_probability": float(fraud_prob),
-            "risk_score": int(fraud_prob * 100)
-        }
-    
-    def save(self, model_path: str = MODEL_PATH, vectorizer_path: str = VECTORIZER_PATH):
-        """حفظ النموذج"""
         os.makedirs(os.path.dirname(model_path), exist_ok=True)
         
-        with open(model_path, 'wb') as f:
-            pickle.dump(self.model, f)
-        
-        with open(vectorizer_path, 'wb') as f:
-            pickle.dump(self.vectorizer, f)
-        
+        staged = []
+        for path, obj in ((vectorizer_path, self.vectorizer), (model_path, self.model)):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(obj, f)
+            staged.append((tmp_path, path))
+        for tmp_path, path in staged:
+            os.replace(tmp_path, path)
+        
+        write_model_info({"backend": self.backend.name}, model_path)
+        self.version = str(int(os.path.getmtime(model_path)))
         print(f"✅ تم حفظ النموذج في: {model_path}")
         print(f"✅ تم حفظ الـ Vectorizer في: {vectorizer_path}")
     
     def load(self, model_path: str = MODEL_PATH, vectorizer_path: str = VECTORIZER_PATH):
-        """تحميل النموذج"""
-        try:
-            with open(model_path, 'rb') as f:
-                self.model = pickle.load(f)
-            
-            with open(vectorizer_path, 'rb') as f:
-                self.vectorizer = pickle.load(f)
-            
-            self.is_trained = True
-            print("✅ تم تحميل النموذج بنجاح")
-            return True
-        except FileNotFoundError:
-            print("⚠️ النموذج غير موجود، يرجى التدريب أولاً")
+        """تحميل النموذج (مع التأكد من نوعه)"""
+        if not super().load(model_path, vectorizer_path):
             return False
+        
+        # النموذج المحفوظ قد يكون من backend غير المحدد في الإعدادات: الاسم
+        # المحفوظ معه أولاً (forest و forest_small نفس الكلاس)، وإلا من نوع المصنف
+        configured = self.backend
+        saved = read_model_info(model_path).get("backend")
+        self.backend = BACKENDS[saved] if saved in BACKENDS else backend_for(self.model, configured)
+        self.backend_name = self.backend.name
+        if self.backend is not configured:
+            print(f"⚠️ النموذج المحفوظ من نوع {self.backend.name} (الإعدادات: {configured.name})")
+        return True
     
     def get_important_words(self, top_n: int = 20):
         """أهم الكلمات في التصنيف"""
@@ -178,7 +102,7 @@ class FraudDetectionModel:
             return []
         
         feature_names = self.vectorizer.get_feature_names_out()
-        importances = self.model.feature_importances_
+        importances = self.backend.feature_weights(self.model)
         
         # ترتيب حسب الأهمية
         indices = importances.argsort()[::-1][:top_n]
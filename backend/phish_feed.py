@@ -0,0 +1,265 @@
+"""
+قائمة روابط التصيد المعروفة
+Known-Phishing URL Feed
+
+نقرأ ملفات القوائم المحلية (data/feeds/*.txt: رابط أو دومين في كل سطر)
+ونحولها لملف ثنائي مضغوط يُفتح بـ mmap:
+
+    [header][Bloom filter][مصفوفة hashes مرتبة (uint64)]
+
+البحث:
+1. Bloom filter: O(1)، إذا قال "غير موجود" نكمل مباشرة (أغلب الروابط)
+2. إذا قال "ربما": بحث ثنائي في المصفوفة المرتبة للتأكيد
+
+الذاكرة لكل مليون عنصر (10 bits/عنصر للـ Bloom):
+    Bloom ≈ 1.2 MB + المصفوفة 8 MB ≈ 9.2 MB
+الملف mmap فالصفحات مشتركة بين العمليات وتُحمل عند الحاجة.
+نسبة الإيجابي الكاذب للـ Bloom ≈ 0.8% (وكلها تُصحح بالبحث الثنائي).
+"""
+
+import asyncio
+import glob
+import hashlib
+import math
+import mmap
+import os
+import struct
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from config import PHISH_FEED_DIR, PHISH_FEED_INDEX, PHISH_FEED_BITS_PER_ENTRY, PHISH_FEED_RELOAD_SECONDS
+
+MAGIC = b"AMANPF1\x00"
+HEADER = struct.Struct("<8sQQQ")  # magic, عدد العناصر, عدد bits, عدد دوال hash
+
+
+def _hash64(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _bloom_positions(h: int, m_bits: int, k: int) -> Iterable[int]:
+    """k مواقع من hash واحد (double hashing)"""
+    h1 = h & 0xFFFFFFFF
+    h2 = (h >> 32) | 1
+    for i in range(k):
+        yield (h1 + i * h2) % m_bits
+
+
+def url_key(url: str) -> Optional[str]:
+    """توحيد الرابط: host بأحرف صغيرة، بدون # وبدون / في النهاية"""
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return None
+    host = (parsed.hostname or "").rstrip(".")
+    if not host:
+        return None
+    path = parsed.path.rstrip("/")
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"url:{host}{path}{query}"
+
+
+def domain_key(domain: str) -> str:
+    return "domain:" + domain.strip().lower().rstrip(".")
+
+
+def feed_line_key(line: str) -> Optional[str]:
+    """سطر من ملف القائمة: رابط (فيه ://) أو دومين"""
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        return None
+    if "://" in line:
+        return url_key(line)
+    return domain_key(line)
+
+
+def build_index(keys: Iterable[str], path: str, bits_per_entry: int = PHISH_FEED_BITS_PER_ENTRY) -> int:
+    """كتابة الملف الثنائي (يرجع عدد العناصر)"""
+    hashes = array("Q", sorted({_hash64(key) for key in keys}))
+    n = len(hashes)
+    m_bits = max(n * bits_per_entry, 64)
+    k = max(1, round(bits_per_entry * math.log(2)))
+    bloom = bytearray((m_bits + 7) // 8)
+    for h in hashes:
+        for pos in _bloom_positions(h, m_bits, k):
+            bloom[pos >> 3] |= 1 << (pos & 7)
+    padding = (-(HEADER.size + len(bloom))) % 8
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # ملف مؤقت لكل عملية: بناءان متزامنان ما يكتبان فوق بعض
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, n, m_bits, k))
+        f.write(bloom)
+        f.write(b"\x00" * padding)
+        hashes.tofile(f)
+    os.replace(tmp_path, path)  # استبدال ذري: القارئ الحالي يبقى على الملف القديم
+    return n
+
+
+class FeedReader:
+    """قراءة الملف الثنائي عبر mmap"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.m_bits, self.k = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"ملف قائمة غير صالح: {path}")
+        self._bloom_offset = HEADER.size
+        bloom_size = (self.m_bits + 7) // 8
+        self._array_offset = HEADER.size + bloom_size + (-(HEADER.size + bloom_size)) % 8
+        self.size_bytes = len(self._mm)
+
+    def might_contain(self, h: int) -> bool:
+        for pos in _bloom_positions(h, self.m_bits, self.k):
+            if not self._mm[self._bloom_offset + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def contains(self, h: int) -> bool:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = struct.unpack_from("<Q", self._mm, self._array_offset + mid * 8)[0]
+            if value < h:
+                lo = mid + 1
+            elif value > h:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def close(self):
+        self._mm.close()
+
+
+class PhishFeed:
+    """قائمة التصيد مع إعادة تحميل تلقائية في الخلفية"""
+
+    def __init__(self, feed_dir: str = PHISH_FEED_DIR, index_path: str = PHISH_FEED_INDEX,
+                 reload_seconds: float = PHISH_FEED_RELOAD_SECONDS):
+        self.feed_dir = feed_dir
+        self.index_path = index_path
+        self.reload_seconds = reload_seconds
+        self._reader: Optional[FeedReader] = None
+        self._sources_mtime = 0.0
+        self._index_mtime = 0.0
+        self.loaded_at = None
+        self.stats = {"lookups": 0, "bloom_maybe": 0, "hits": 0, "reloads": 0}
+
+    def _source_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.feed_dir, "*.txt")))
+
+    def _latest_mtime(self) -> float:
+        return max((os.path.getmtime(p) for p in self._source_files()), default=0.0)
+
+    def _build(self):
+        """قراءة ملفات القوائم وبناء الفهرس (آمن في thread منفصل)"""
+        mtime = self._latest_mtime()
+        keys = []
+        for path in self._source_files():
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    key = feed_line_key(line)
+                    if key:
+                        keys.append(key)
+        count = build_index(keys, self.index_path)
+        print(f"🗂️ تم تحميل قائمة التصيد: {count} عنصر")
+        return FeedReader(self.index_path), mtime
+
+    def rebuild(self) -> int:
+        """بناء الفهرس من جديد ثم تبديله"""
+        reader, mtime = self._build()
+        self._swap(reader, mtime)
+        return reader.count
+
+    def load(self):
+        """فتح الفهرس الموجود إذا كان أحدث من الملفات، وإلا بناؤه"""
+        mtime = self._latest_mtime()
+        if os.path.exists(self.index_path) and os.path.getmtime(self.index_path) >= mtime:
+            try:
+                self._swap(FeedReader(self.index_path), mtime)
+                return
+            except ValueError:
+                pass
+        self.rebuild()
+
+    def _swap(self, reader: FeedReader, sources_mtime: float):
+        # يتنفذ في الـ event loop فقط، فما فيه بحث جاري على القارئ القديم
+        old, self._reader = self._reader, reader
+        self._sources_mtime = sources_mtime
+        self._index_mtime = os.path.getmtime(reader.path)
+        self.loaded_at = time.time()
+        self.stats["reloads"] += 1
+        if old is not None:
+            old.close()
+
+    def _check(self, key: str) -> bool:
+        reader = self._reader
+        if reader is None or reader.count == 0:
+            return False
+        h = _hash64(key)
+        if not reader.might_contain(h):
+            return False
+        self.stats["bloom_maybe"] += 1
+        return reader.contains(h)
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """
+        هل الرابط (أو دومينه أو أحد آبائه) في القائمة؟
+
+        Returns:
+            {"match": "url" | "domain", "value": ...} أو None
+        """
+        self.stats["lookups"] += 1
+        key = url_key(url)
+        if key is None:
+            return None
+        if self._check(key):
+            self.stats["hits"] += 1
+            return {"match": "url", "value": url}
+
+        host = key[4:].split("/", 1)[0].split("?", 1)[0]
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            domain = ".".join(labels[i:])
+            if self._check(domain_key(domain)):
+                self.stats["hits"] += 1
+                return {"match": "domain", "value": domain}
+        return None
+
+    async def auto_reload(self, rebuild: bool = True):
+        """
+        مهمة خلفية: إعادة البناء إذا تغيرت ملفات القوائم
+
+        rebuild=False (عمال prefork غير الأول): ما نبني، نفتح الفهرس اللي
+        بناه العامل الأول إذا صار أحدث من المفتوح حالياً
+        """
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                if rebuild and self._latest_mtime() > self._sources_mtime:
+                    reader, mtime = await asyncio.to_thread(self._build)
+                    self._swap(reader, mtime)
+                elif not rebuild and os.path.exists(self.index_path) \
+                        and os.path.getmtime(self.index_path) > self._index_mtime:
+                    self._swap(FeedReader(self.index_path), self._latest_mtime())
+            except Exception as e:
+                print(f"❌ خطأ في تحديث قائمة التصيد: {e}")
+
+    def get_stats(self) -> Dict:
+        reader = self._reader
+        return {
+            "entries": reader.count if reader else 0,
+            "index_bytes": reader.size_bytes if reader else 0,
+            "loaded_at": self.loaded_at,
+            **self.stats
+        }
+
+
+# instance واحد (يُحمّل عند تشغيل السيرفر)
+phish_feed = PhishFeed()
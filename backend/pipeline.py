@@ -0,0 +1,176 @@
+"""
+خط التحليل بتكلفة محسوبة
+Cost-Aware Short-Circuit Pipeline
+
+كل رسالة كانت تمر بكل المراحل (فتح الروابط + AI) حتى لو القواعد
+أعطت 100 مع دومين .xyz، أو الرسالة تذكير اجتماع بدون روابط.
+
+1. المراحل مرتبة ولكل مرحلة تكلفة معلنة (PIPELINE_STAGE_COSTS):
+   القواعد → ML → شكل الروابط → الحملات → AI → فتح الروابط
+2. النتيجة النهائية = متوسط موزون للمراحل اللي رجعت نتيجة (FUSION_WEIGHTS)،
+   والصفحة اللي تطلب دفع / دخول ترفعها لـ DANGEROUS_PAGE_SCORE
+3. بعد المراحل الرخيصة: حدود النتيجة النهائية مهما رجعت المراحل الباقية
+   (AI: 0-100 أو ما يرد، فتح الروابط: من نتيجة شكلها إلى 100، ومن 0 إذا الروابط
+   أكثر من LINK_SCAN_MAX_URLS لأن الفتح ممكن يختار روابط غير اللي انفحص شكلها). إذا الحدود
+   كلها في نفس مستوى الخطر (low / medium / high) المراحل الغالية ما تفرق ← تُتخطى
+
+السياسة (PIPELINE_POLICY):
+- off: كل المراحل دائماً
+- band: بعد المراحل الرخيصة، إما تتخطى كل الغالية أو تشتغل كلها بالتوازي
+- sequential: المراحل الغالية وحدة وحدة (الأرخص أولاً) والقرار يتعاد بعد كل
+  وحدة: توفير أكثر مقابل زمن أطول للرسائل اللي تحتاج الاثنتين
+
+الرد فيه pipeline: المراحل اللي تخطاها، التكلفة، والتوفير.
+"""
+
+import asyncio
+import itertools
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import PIPELINE_POLICY, PIPELINE_STAGE_COSTS, FUSION_WEIGHTS, DANGEROUS_PAGE_SCORE, LINK_SCAN_MAX_URLS
+from response_profile import risk_level
+
+POLICIES = ("off", "band", "sequential")
+
+# المراحل الغالية (بعد القواعد و ML وشكل الروابط والحملات)
+EXPENSIVE = ("ai", "link_deep")
+
+
+def fuse(values: Dict[str, Optional[float]], dangerous_page: bool = False) -> int:
+    """
+    النتيجة النهائية: متوسط موزون للخانات اللي لها نتيجة (None = المرحلة ما اشتغلت أو ما ردت)
+
+    dangerous_page: رابط فتح صفحة دفع / دخول خطيرة ← الحد الأدنى DANGEROUS_PAGE_SCORE
+    """
+    present = {slot: value for slot, value in values.items() if value is not None}
+    weight = sum(FUSION_WEIGHTS[slot] for slot in present)
+    score = sum(FUSION_WEIGHTS[slot] * value for slot, value in present.items()) / weight if weight else 0
+    score = min(int(score + 1e-9), 100)
+    return max(score, DANGEROUS_PAGE_SCORE) if dangerous_page else score
+
+
+def dangerous_page(link_urls: List[Dict]) -> bool:
+    """رابط انفتح وطلع صفحة دفع / دخول خطيرة"""
+    return any(u.get("content_type") in ("payment", "login") and u["risk_score"] >= 50 for u in link_urls)
+
+
+def stage_cost(stage: str) -> int:
+    return PIPELINE_STAGE_COSTS.get(stage, 0)
+
+
+class ScoringPipeline:
+    """قرار تخطي المراحل الغالية + تشغيلها بالترتيب"""
+
+    def __init__(self, policy: str = PIPELINE_POLICY):
+        if policy not in POLICIES:
+            raise ValueError(f"PIPELINE_POLICY غير معروف: {policy} (المتاح: {', '.join(POLICIES)})")
+        self.policy = policy
+        self.stats = {"messages": 0, "short_circuited": 0, "cost_spent": 0, "cost_saved": 0}
+        self.ran: Dict[str, int] = {}
+        self.skipped: Dict[str, int] = {}
+
+    # ---------- القرار ----------
+    def bounds(self, known: Dict[str, Optional[float]], pending: List[str], url_count: int,
+               page: bool = False) -> List[int]:
+        """
+        أقل وأعلى نتيجة نهائية ممكنة مهما رجعت المراحل الباقية
+
+        الدمج يزيد مع كل خانة، فيكفي نجرب الأطراف: AI (0، 100، ما يرد)،
+        فتح الروابط (نتيجة الشكل، 100) مع / بدون صفحة خطيرة.
+        نتيجة الفتح >= نتيجة الشكل فقط إذا انفتحت نفس الروابط: إذا الروابط أكثر
+        من الحد (LINK_SCAN_MAX_URLS) الحد الأدنى 0
+        """
+        options = {slot: [value] for slot, value in known.items()}
+        page_options = [page]
+        if "ai" in pending:
+            options["ai"] = [0, 100, None]
+        if "link_deep" in pending and url_count:
+            floor = (known.get("link") or 0) if url_count <= LINK_SCAN_MAX_URLS else 0
+            options["link"] = [floor, 100]
+            page_options = [False, True]
+        slots = list(options)
+        scores = [fuse(dict(zip(slots, combo)), with_page)
+                  for combo in itertools.product(*(options[slot] for slot in slots)) for with_page in page_options]
+        return [min(scores), max(scores)]
+
+    def locked_band(self, known: Dict[str, Optional[float]], pending: List[str], url_count: int,
+                    page: bool = False) -> Optional[str]:
+        """مستوى الخطر إذا المراحل الباقية ما تقدر تغيره، وإلا None"""
+        if self.policy == "off":
+            return None
+        low, high = self.bounds(known, pending, url_count, page)
+        return risk_level(low) if risk_level(low) == risk_level(high) else None
+
+    # ---------- التشغيل ----------
+    async def run(self, known: Dict[str, Optional[float]], url_count: int,
+                  runners: Dict[str, Callable[[], Awaitable]]) -> Dict:
+        """
+        تشغيل المراحل الغالية المتاحة (runners) حسب السياسة
+
+        Args:
+            known: نتائج المراحل الرخيصة {"rule", "ml", "link"} (link من شكل الروابط)
+            url_count: عدد الروابط (بدونها فتح الروابط ما يغير شيء)
+            runners: مرحلة ← دالة تشغلها (المرحلة غير المتاحة، مثل AI بدون مفتاح، ما تنرسل)
+                     ai ترجع النتيجة أو None، و link_deep ترجع ملخص الروابط (overall_risk و urls)
+
+        Returns:
+            {"results": {مرحلة: نتيجتها}, "pipeline": {...} للرد}
+        """
+        pending = sorted(runners, key=stage_cost)
+        results: Dict[str, object] = {}
+        band = None
+
+        if self.policy == "sequential":
+            page = False
+            while pending:
+                band = self.locked_band(known, pending, url_count, page)
+                if band:
+                    break
+                stage = pending.pop(0)
+                results[stage] = await runners[stage]()
+                if stage == "ai":
+                    known = {**known, "ai": results[stage]}
+                else:
+                    known = {**known, "link": results[stage]["overall_risk"]}
+                    page = dangerous_page(results[stage]["urls"])
+        else:
+            band = self.locked_band(known, pending, url_count) if pending else None
+            if not band:
+                outputs = await asyncio.gather(*(runners[stage]() for stage in pending))
+                results = dict(zip(pending, outputs))
+                pending = []
+
+        return {"results": results, "pipeline": self._record(list(results), pending, band)}
+
+    def skip(self, stages: List[str], reason: str) -> Dict:
+        """تخطي المراحل الغالية لسبب خارجي (حكم حملة معروفة، الوضع المخفف)"""
+        return {**self._record([], stages, None), "reason": reason}
+
+    def _record(self, ran: List[str], skipped: List[str], band: Optional[str]) -> Dict:
+        spent = sum(stage_cost(stage) for stage in ran)
+        saved = sum(stage_cost(stage) for stage in skipped)
+        self.stats["messages"] += 1
+        self.stats["short_circuited"] += bool(skipped)
+        self.stats["cost_spent"] += spent
+        self.stats["cost_saved"] += saved
+        for stage in ran:
+            self.ran[stage] = self.ran.get(stage, 0) + 1
+        for stage in skipped:
+            self.skipped[stage] = self.skipped.get(stage, 0) + 1
+        return {"policy": self.policy, "ran": ran, "skipped": skipped, "locked_band": band,
+                "cost": spent, "cost_saved": saved}
+
+    # ---------- المقاييس ----------
+    def get_stats(self) -> Dict:
+        total = self.stats["cost_spent"] + self.stats["cost_saved"]
+        return {
+            "policy": self.policy,
+            **self.stats,
+            "saved_ratio": round(self.stats["cost_saved"] / total, 3) if total else 0.0,
+            "ran": dict(self.ran),
+            "skipped": dict(self.skipped)
+        }
+
+
+# instance واحد للسيرفر
+scoring_pipeline = ScoringPipeline()
@@ -0,0 +1,398 @@
+"""
+التشغيل بعدة عمليات (prefork)
+Multi-Process Serving
+
+uvicorn.run(app) عملية وحدة: التحليل (ML + القواعد) محدود بنواة وحدة.
+هنا عملية رئيسية (supervisor) تحمّل النموذج مرة وحدة ثم تعمل fork للعمال:
+
+1. صفحات النموذج في الذاكرة مشتركة بين العمال (copy-on-write)،
+   و gc.freeze() قبل الـ fork حتى الـ GC ما يلمسها وينسخها
+2. كل العمال يستقبلون من نفس الـ socket، ولكل عامل منفذ داخلي خاص
+   (127.0.0.1) تستخدمه العمال الأخرى:
+   - رقم المهمة فيه منفذ مهام خاص بالعملية نفسها (w2-41733-<توقيع>-...)،
+     فالـ polling اللي يوصل لعامل آخر يتحول للعملية صاحبة المهمة حتى لو
+     انعاد تشغيل نفس الـ slot (التوقيع من الـ supervisor: ما نحول لأي منفذ)
+   - GET /metrics يجمع مقاييس كل العمال (لكل عامل + المجموع)
+   - التدريب في العامل الأول فقط (w0)
+3. إعادة تشغيل متدرجة (kill -HUP <pid>، أو تلقائياً إذا انحفظ نموذج جديد):
+   عامل جديد يجهز أولاً، ثم القديم يوقف الاستقبال ويكمل طلباته
+   ومهامه الخلفية (فحص الروابط العميق) قبل ما يطلع، ومنفذ مهامه يبقى
+   شغال PREFORK_JOB_LINGER بعد آخر تحديث لمهمة (حتى يجلب العملاء النتائج)
+
+طريقة الاستخدام:
+    python main.py --workers 4
+"""
+
+import asyncio
+import contextlib
+import gc
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import select
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+from starlette.background import BackgroundTask
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from config import (
+    MODEL_PATH, MODEL_INFO_PATH, PREFORK_READY_TIMEOUT, PREFORK_GRACEFUL_TIMEOUT, PREFORK_MODEL_CHECK_INTERVAL,
+    PREFORK_JOB_LINGER, SHUTDOWN_DRAIN_TIMEOUT
+)
+
+# هوية العملية الحالية (None = عملية واحدة بدون prefork)
+# {"slot": رقم العامل, "ports": المنافذ الداخلية لكل العمال,
+#  "job_socket" / "job_port": منفذ المهام الخاص بهذه العملية}
+worker: Optional[Dict] = None
+_ready_fd: Optional[int] = None
+_client: Optional[httpx.AsyncClient] = None
+_job_server: Dict = {}
+# مفتاح توقيع منافذ المهام (من الـ supervisor، مشترك بين كل العمال)
+_job_key: bytes = b""
+
+JOB_OWNER = re.compile(r"^w\d+-(\d+)-([0-9a-f]{8})-")
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "content-encoding"}
+# يضيفها السيرفر هنا مرة ثانية (uvicorn + CORS / GZip)
+SERVER_HEADERS = {"date", "server", "vary"}
+
+
+# ==================== داخل العامل ====================
+def is_primary() -> bool:
+    """العامل الأول (أو العملية الوحيدة): التدريب والتقييم في الظل هنا فقط"""
+    return worker is None or worker["slot"] == 0
+
+
+def _sign_port(port: int) -> str:
+    return hmac.new(_job_key, str(port).encode(), hashlib.sha256).hexdigest()[:8]
+
+
+def job_prefix() -> str:
+    if worker is None:
+        return ""
+    port = worker["job_port"]
+    return f"w{worker['slot']}-{port}-{_sign_port(port)}-"
+
+
+def owner_port(job_id: str) -> Optional[int]:
+    """منفذ مهام العملية صاحبة المهمة إذا كانت عملية أخرى (حتى لو قيد الإيقاف)"""
+    match = JOB_OWNER.match(job_id)
+    if worker is None or match is None:
+        return None
+    port = int(match.group(1))
+    if port == worker["job_port"] or not hmac.compare_digest(match.group(2), _sign_port(port)):
+        return None
+    return port
+
+
+def peer_ports() -> Dict[int, int]:
+    """منافذ العمال الآخرين {slot: port}"""
+    if worker is None:
+        return {}
+    return {slot: port for slot, port in enumerate(worker["ports"]) if slot != worker["slot"]}
+
+
+def primary_port() -> Optional[int]:
+    return None if is_primary() else worker["ports"][0]
+
+
+def notify_ready():
+    """إبلاغ الـ supervisor إن العامل جاهز (بعد التحميل والتسخين)"""
+    global _ready_fd
+    if _ready_fd is not None:
+        os.write(_ready_fd, b"1")
+        os.close(_ready_fd)
+        _ready_fd = None
+
+
+def client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(10, read=None))
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def forward(request: Request, port: int, gone_status: int = 502,
+                  gone_detail: str = "العامل غير متاح") -> StreamingResponse:
+    """تحويل الطلب لعامل آخر كما هو (يدعم البث SSE)"""
+    url = httpx.URL(f"http://127.0.0.1:{port}{request.url.path}", query=request.url.query.encode())
+    # بدون ضغط بين العمال: المحتوى يُمرر كما هو والضغط للعميل من GZipMiddleware هنا
+    headers = {k: v for k, v in request.headers.items()
+               if k.lower() not in HOP_HEADERS | {"host", "accept-encoding"}}
+    headers["accept-encoding"] = "identity"
+    try:
+        upstream = await client().send(
+            client().build_request(request.method, url, headers=headers, content=await request.body()),
+            stream=True
+        )
+    except httpx.ConnectError:
+        # العملية صاحبة المهمة طلعت (بعد الإيقاف ومهلة الانتظار)
+        raise HTTPException(status_code=gone_status, detail=gone_detail)
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers={k: v for k, v in upstream.headers.items() if k.lower() not in HOP_HEADERS | SERVER_HEADERS},
+        background=BackgroundTask(upstream.aclose)
+    )
+
+
+async def start_job_server(app):
+    """منفذ المهام الخاص بالعملية: يبقى يستقبل بعد إيقاف المنافذ الأخرى حتى stop_job_server"""
+    if worker is None:
+        return
+    import uvicorn
+
+    class JobServer(uvicorn.Server):
+        @contextlib.contextmanager
+        def capture_signals(self):
+            # الإشارات للسيرفر الرئيسي فقط: هذا يوقف بعد انتهاء المهام الخلفية
+            yield
+
+    server = JobServer(uvicorn.Config(app, lifespan="off", log_level="warning"))
+    _job_server["server"] = server
+    _job_server["task"] = asyncio.create_task(server.serve(sockets=[worker["job_socket"]]))
+
+
+async def stop_job_server(last_update: Optional[float] = None):
+    """
+    إيقاف منفذ المهام (آخر خطوة في إيقاف العامل)
+
+    last_update: آخر تحديث لمهمة هنا (time.time()) ← ننتظر حتى يمر عليه
+                 PREFORK_JOB_LINGER حتى يجلب العملاء النتائج (عبر العامل
+                 الجديد اللي يحول لنا). العامل بدون مهام حديثة يطلع فوراً
+    """
+    server = _job_server.pop("server", None)
+    if server is None:
+        return
+    if last_update is not None:
+        await asyncio.sleep(max(0.0, last_update + PREFORK_JOB_LINGER - time.time()))
+    server.should_exit = True
+    await _job_server.pop("task")
+
+
+async def gather_peers(path: str) -> Dict[int, Dict]:
+    """نفس الطلب (GET) من كل العمال الآخرين {slot: json}"""
+    results = {}
+    for slot, port in peer_ports().items():
+        try:
+            response = await client().get(f"http://127.0.0.1:{port}{path}", timeout=2)
+            results[slot] = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            results[slot] = {"error": str(e) or type(e).__name__}
+    return results
+
+
+# ==================== الـ supervisor ====================
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _model_mtime() -> Optional[float]:
+    """وقت اكتمال حفظ النموذج: ملف المعلومات ينكتب آخر شيء (بعد النموذج والـ vectorizer)"""
+    for path in (MODEL_INFO_PATH, MODEL_PATH):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            continue
+    return None
+
+
+class Supervisor:
+    """العملية الرئيسية: تحميل مسبق، fork للعمال، إعادة تشغيل متدرجة"""
+
+    def __init__(self, app, workers: int, host: str, port: int, preload: Callable[[], None]):
+        """
+        Args:
+            app: تطبيق FastAPI
+            preload: تحميل النموذج والتسخين (يتنفذ هنا قبل الـ fork)
+        """
+        self.app = app
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.preload = preload
+        self.children: Dict[int, int] = {}       # pid -> slot
+        self.slots: Dict[int, int] = {}          # slot -> pid الحالي
+        self.retiring: set = set()               # عمال قيد الإيقاف (ما يتعوضون)
+        self.stopping = False
+        self.reload_requested = False
+        self.restarts = 0
+
+    # ---------- التشغيل ----------
+    def run(self):
+        global _job_key
+        self._preload()
+        _job_key = secrets.token_bytes(16)
+        self.shared = _bind(self.host, self.port)
+        self.private = [_bind("127.0.0.1", 0) for _ in range(self.workers)]
+        self.ports = [s.getsockname()[1] for s in self.private]
+
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "reload_requested", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "stopping", True))
+
+        print(f"🚀 {self.workers} عمال على http://{self.host}:{self.port} (supervisor pid {os.getpid()})")
+        for slot in range(self.workers):
+            self._start_worker(slot)
+
+        last_check = time.monotonic()
+        model_mtime = _model_mtime()
+        while not self.stopping:
+            self._reap()
+            time.sleep(0.2)
+            if time.monotonic() - last_check >= PREFORK_MODEL_CHECK_INTERVAL:
+                last_check = time.monotonic()
+                if _model_mtime() != model_mtime:
+                    model_mtime = _model_mtime()
+                    print("🔄 ملف النموذج تغيّر: تحميل ثم إعادة تشغيل متدرجة")
+                    self._preload()
+                    self.reload_requested = True
+            if self.reload_requested:
+                self.reload_requested = False
+                self._rolling_restart()
+
+        self._shutdown()
+
+    def _preload(self):
+        self.preload()
+        # الكائنات الموجودة تنتقل لجيل دائم: الـ GC ما يمر عليها فصفحاتها تبقى مشتركة
+        gc.collect()
+        gc.freeze()
+
+    # ---------- العمال ----------
+    def _start_worker(self, slot: int) -> Optional[int]:
+        """fork عامل جديد وانتظار جاهزيته"""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._run_worker(slot, write_fd)  # ما يرجع
+
+        os.close(write_fd)
+        self.children[pid] = slot
+        ready = self._wait_ready(read_fd)
+        os.close(read_fd)
+        if not ready:
+            print(f"❌ العامل w{slot} (pid {pid}) ما جهز خلال المهلة")
+            self._stop(pid)
+            return None
+        self.slots[slot] = pid
+        print(f"✅ العامل w{slot} جاهز (pid {pid})")
+        return pid
+
+    def _run_worker(self, slot: int, ready_fd: int):
+        global worker, _ready_fd
+        import uvicorn
+
+        job_socket = _bind("127.0.0.1", 0)
+        worker = {"slot": slot, "ports": self.ports, "job_socket": job_socket,
+                  "job_port": job_socket.getsockname()[1]}
+        _ready_fd = ready_fd
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        for i, sock in enumerate(self.private):
+            if i != slot:
+                sock.close()
+
+        config = uvicorn.Config(self.app, lifespan="on", log_level="warning",
+                                timeout_graceful_shutdown=PREFORK_GRACEFUL_TIMEOUT)
+        code = 0
+        try:
+            uvicorn.Server(config).run(sockets=[self.shared, self.private[slot]])
+        except BaseException as e:
+            print(f"❌ العامل w{slot}: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _wait_ready(self, read_fd: int) -> bool:
+        deadline = time.monotonic() + PREFORK_READY_TIMEOUT
+        while time.monotonic() < deadline:
+            readable, _, _ = select.select([read_fd], [], [], 0.2)
+            if readable:
+                return os.read(read_fd, 1) == b"1"
+            self._reap()
+        return False
+
+    def _reap(self):
+        """العمال اللي طلعوا: العامل اللي طاح بشكل غير متوقع يتعوض"""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.children.pop(pid, None)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+                continue
+            if slot is not None and self.slots.get(slot) == pid and not self.stopping:
+                print(f"⚠️ العامل w{slot} طلع (status {status})، تشغيل بديل")
+                del self.slots[slot]
+                self._start_worker(slot)
+
+    def _stop(self, pid: int,
+              timeout: float = PREFORK_GRACEFUL_TIMEOUT + SHUTDOWN_DRAIN_TIMEOUT + PREFORK_JOB_LINGER + 5):
+        """SIGTERM ثم انتظار الإنهاء (الطلبات + المهام الخلفية + جلب نتائجها)، وإلا SIGKILL"""
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done == pid:
+                self.retiring.discard(pid)
+                self.children.pop(pid, None)
+                return
+            time.sleep(0.1)
+        os.kill(pid, signal.SIGKILL)
+
+    def _rolling_restart(self):
+        """عامل عامل: الجديد يجهز (ويبدأ يستقبل) ثم القديم يكمل ما عنده ويطلع"""
+        print("🔁 إعادة تشغيل متدرجة...")
+        for slot in range(self.workers):
+            old = self.slots.get(slot)
+            if self._start_worker(slot) is None:
+                continue  # نبقي القديم
+            if old is not None:
+                self._stop(old)
+        self.restarts += 1
+        print("✅ انتهت إعادة التشغيل المتدرجة")
+
+    def _shutdown(self):
+        print("🛑 إيقاف العمال...")
+        for pid in list(self.slots.values()):
+            self.retiring.add(pid)
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.slots.values()):
+            self._stop(pid)
+        self.shared.close()
@@ -0,0 +1,124 @@
+"""
+تتبع سلسلة التوجيه
+Redirect Chain Resolver
+
+بدل ما httpx يتبع التوجيهات بصمت ونحتفظ بالرابط الأخير فقط،
+نتبع كل خطوة بطلب خفيف (HEAD) ونسجل: الحالة، الدومين، الوقت.
+
+كل خطوة تنحفظ في كاش، فالرابط المختصر نفسه (bit.ly/xyz) ما نعيد
+فكه مع كل إيميل.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+from config import REDIRECT_MAX_HOPS, REDIRECT_CACHE_SIZE, REDIRECT_CACHE_TTL
+
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+
+
+class RedirectResolver:
+    """فك الروابط خطوة بخطوة مع كاش لكل خطوة"""
+
+    def __init__(self, max_hops: int = REDIRECT_MAX_HOPS, cache_size: int = REDIRECT_CACHE_SIZE,
+                 cache_ttl: float = REDIRECT_CACHE_TTL):
+        self.max_hops = max_hops
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {"resolved": 0, "hops": 0, "cache_hits": 0, "head_fallbacks": 0}
+
+    async def _probe(self, client: httpx.AsyncClient, url: str) -> Dict:
+        """طلب خفيف لخطوة وحدة (HEAD، وإذا رفضه السيرفر GET بدون قراءة المحتوى)"""
+        response = await client.head(url, follow_redirects=False)
+        if response.status_code in (403, 405, 501):
+            self.stats["head_fallbacks"] += 1
+            async with client.stream("GET", url, follow_redirects=False) as response:
+                pass
+        location = response.headers.get("location")
+        return {
+            "status": response.status_code,
+            "location": urljoin(url, location) if location else None
+        }
+
+    async def resolve(self, url: str, client: httpx.AsyncClient,
+                      stop_if: Optional[Callable[[str], bool]] = None) -> Dict:
+        """
+        تتبع التوجيهات حتى صفحة الهبوط
+
+        Args:
+            url: الرابط الأصلي
+            client: httpx client (بدون follow_redirects)
+            stop_if: تُستدعى لكل خطوة، إذا رجعت True نوقف (مثلاً رابط احتيال معروف)
+
+        Returns:
+            {"final_url", "hops": [...], "stopped_at": url | None, "complete": bool}
+        """
+        self.stats["resolved"] += 1
+        hops = []
+        current = url
+        stopped_at = None
+        complete = False
+
+        for _ in range(self.max_hops + 1):
+            if stop_if and stop_if(current):
+                stopped_at = current
+                break
+
+            start = time.perf_counter()
+            cached = self._cache_get(current)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                probe = cached
+            else:
+                probe = await self._probe(client, current)
+                self._cache_put(current, probe)
+            self.stats["hops"] += 1
+
+            hops.append({
+                "url": current,
+                "host": urlparse(current).hostname or "",
+                "status": probe["status"],
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                "cached": cached is not None
+            })
+
+            if probe["status"] not in REDIRECT_CODES or not probe["location"]:
+                complete = True
+                break
+            current = probe["location"]
+
+        return {
+            "final_url": current,
+            "hops": hops,
+            "stopped_at": stopped_at,
+            "complete": complete
+        }
+
+    def _cache_get(self, url: str) -> Optional[Dict]:
+        entry = self._cache.get(url)
+        if entry is None:
+            return None
+        probe, stored_at = entry
+        if time.monotonic() - stored_at > self.cache_ttl:
+            del self._cache[url]
+            return None
+        self._cache.move_to_end(url)
+        return probe
+
+    def _cache_put(self, url: str, probe: Dict):
+        self._cache[url] = (probe, time.monotonic())
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        return {"cache_size": len(self._cache), **self.stats}
+
+
+# instance واحد للسيرفر
+redirect_resolver = RedirectResolver()
@@ -0,0 +1,134 @@
+"""
+شكل الرد وترميزه
+Response Profiles & Fast Serialization
+
+الرد الكامل لـ /analyze فيه نصوص عربية طويلة (الوصف، التحذيرات، الإجراءات)
+يحتاجها العرض فقط. العملاء الآليين غالباً يحتاجون النتيجة ونوع التهديد.
+
+1. profile=compact (أو هيدر X-Aman-Profile): رد مختصر برموز قصيرة
+   (threat: "otp_request"، flags: ["otp_request", "urgency"]) بدل النصوص
+2. fields=risk_score,links.total (أو هيدر X-Aman-Fields): الحقول المطلوبة فقط
+3. ترميز JSON بـ orjson إذا موجود (أسرع بكثير)، وإلا json العادي
+4. الضغط (gzip) حسب Accept-Encoding عبر GZipMiddleware في main.py
+"""
+
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from config import HIGH_RISK, MEDIUM_RISK
+from rules import THREAT_CODES
+
+try:
+    import orjson
+except ImportError:  # اختياري
+    orjson = None
+
+PROFILES = ("full", "compact")
+
+
+def dumps(obj: Any) -> bytes:
+    """ترميز JSON (orjson إذا متوفر)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # نوع غير مدعوم: نرجع للطريقة العادية
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """رد JSON بالترميز السريع"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def risk_level(score: int) -> str:
+    if score >= HIGH_RISK:
+        return "high"
+    if score >= MEDIUM_RISK:
+        return "medium"
+    return "low"
+
+
+def compact_verdict(verdict: Dict) -> Dict:
+    """الحكم بدون نصوص العرض: رموز قصيرة وأرقام فقط"""
+    links = verdict.get("links") or {}
+    details = verdict.get("analysis_details") or {}
+    compact = {
+        "risk_score": verdict["risk_score"],
+        "level": risk_level(verdict["risk_score"]),
+        "threat": THREAT_CODES.get(verdict.get("threat_type"), "other"),
+        "flags": [f.get("code", "other") for f in verdict.get("flags", [])],
+        "links": {
+            "total": links.get("total", 0),
+            "dangerous": links.get("dangerous", 0),
+            "urls": [{"domain": u["domain"], "risk_score": u["risk_score"]} for u in links.get("details", [])]
+        },
+        "scores": {
+            "rule": details.get("rule_score"),
+            "ml": details.get("ml_score"),
+            "ai": details.get("ai_score"),
+            "link": details.get("link_risk")
+        },
+        "model_version": verdict.get("model_version")
+    }
+    # حقول الحالة (الوضع السريع / المخفف) وملخص الإيميل الخام والسلسلة والحملة والمراحل تبقى كما هي
+    for key in ("analysis_id", "status", "update_url", "poll_url", "stream_url", "deep_scan",
+                "degraded", "degraded_reason", "email", "thread", "campaign", "pipeline"):
+        if key in verdict:
+            compact[key] = verdict[key]
+    return compact
+
+
+def project(data: Dict, fields: Iterable[str]) -> Dict:
+    """
+    الحقول المطلوبة فقط (تدعم المسارات: links.total)
+
+    حقل غير موجود يُتجاهل بدون خطأ.
+    """
+    result: Dict = {}
+    for field in fields:
+        parts = [p for p in field.strip().split(".") if p]
+        if not parts:
+            continue
+        src = data
+        for part in parts[:-1]:
+            src = src.get(part) if isinstance(src, dict) else None
+        if not isinstance(src, dict) or parts[-1] not in src:
+            continue
+        dst = result
+        for part in parts[:-1]:
+            dst = dst.setdefault(part, {})
+        dst[parts[-1]] = src[parts[-1]]
+    return result
+
+
+class ResponseShape:
+    """الشكل المطلوب للرد (من الـ query أو الهيدر)"""
+
+    def __init__(self, profile: str = "full", fields: Optional[list] = None):
+        self.profile = profile if profile in PROFILES else "full"
+        self.fields = fields or None
+
+    @classmethod
+    def from_request(cls, request: Request) -> "ResponseShape":
+        profile = request.query_params.get("profile") or request.headers.get("x-aman-profile") or "full"
+        fields = request.query_params.get("fields") or request.headers.get("x-aman-fields") or ""
+        return cls(profile.strip().lower(), [f for f in fields.split(",") if f.strip()])
+
+    def apply(self, verdict: Dict) -> Dict:
+        if self.profile == "compact":
+            verdict = compact_verdict(verdict)
+        if self.fields:
+            verdict = project(verdict, self.fields)
+        return verdict
+
+    def respond(self, verdict: Dict) -> FastJSONResponse:
+        """الرد مباشرة (بدون jsonable_encoder الخاص بـ FastAPI)"""
+        return FastJSONResponse(self.apply(verdict))
@@ -101,6 +101,21 @@ def calculate_rule_score(text: str) -> int:
     return min(score, 100)
 
 
+# رموز قصيرة لأنواع التهديد (للعملاء الآليين بدل النص العربي، ونوع التهديد في بيانات التعلم)
+# نفس رموز extract_flags، ونفس مسميات data/training_data.csv (safe، social_engineering، ...)
+THREAT_CODES = {
+    "انتحال مدير/تنفيذي": "exec_impersonation",
+    "طلب رمز تحقق (OTP)": "otp_request",
+    "انتحال صفة بنك": "bank_impersonation",
+    "طلب بيانات سرية": "credentials_request",
+    "احتيال اجتماعي": "social_engineering",
+    "جوائز وهمية": "fake_prize",
+    "تصيد احتيالي": "phishing",
+    "طلب تحويل مشبوه": "money_transfer",
+    "رسالة عادية": "safe"
+}
+
+
 def detect_threat_type(text: str) -> str:
     """تحديد نوع التهديد"""
     text_lower = text.lower()
@@ -149,6 +164,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in ["otp", "رمز التحقق", "كود", "رمز الامان", "verification code"]):
         flags.append({
             "icon": "🔑",
+            "code": "otp_request",
             "title": "طلب رمز OTP/تحقق",
             "description": "لا ترسل رمز التحقق لأي شخص أبداً!",
             "severity": "critical"
@@ -158,6 +174,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in ["مديرك", "انا مديرك", "أنا مديرك", "المدير", "manager", "boss", "ceo"]):
         flags.append({
             "icon": "👔",
+            "code": "exec_impersonation",
             "title": "انتحال صفة مدير",
             "description": "المدير الحقيقي لن يطلب منك بيانات سرية",
             "severity": "critical"
@@ -167,6 +184,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in ["من البنك", "من بنك", "بنك التنمية", "موظف البنك"]):
         flags.append({
             "icon": "🏦",
+            "code": "bank_impersonation",
             "title": "انتحال صفة بنك",
             "description": "البنوك لا تطلب بياناتك عبر الإيميل",
             "severity": "critical"
@@ -176,6 +194,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in ["الرقم السري", "رقمك السري", "كلمة المرور", "كلمة السر", "password", "cvv", "pin"]):
         flags.append({
             "icon": "🔐",
+            "code": "credentials_request",
             "title": "طلب بيانات سرية",
             "description": "لا تشارك كلمات المرور أو CVV مع أي أحد",
             "severity": "critical"
@@ -185,6 +204,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in ["فوراً", "فورا", "الآن", "عاجل", "immediately", "urgent", "asap"]):
         flags.append({
             "icon": "⏰",
+            "code": "urgency",
             "title": "استعجال وضغط",
             "description": "المحتالون يضغطون عليك للتصرف بسرعة",
             "severity": "high"
@@ -194,6 +214,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in ["إيقاف", "ايقاف", "تجميد", "suspended", "blocked", "locked"]):
         flags.append({
             "icon": "⚠️",
+            "code": "suspension_threat",
             "title": "تهديد بإيقاف الحساب",
             "description": "البنوك الحقيقية لا تهدد عبر الإيميل",
             "severity": "high"
@@ -203,6 +224,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in [".xyz", ".top", "bit.ly", ".click", ".loan"]):
         flags.append({
             "icon": "🔗",
+            "code": "suspicious_link",
             "title": "رابط مشبوه",
             "description": "نطاقات مشبوهة تستخدم للتصيد",
             "severity": "critical"
@@ -212,6 +234,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in ["ربحت", "جائزة", "مبروك", "winner", "lottery"]):
         flags.append({
             "icon": "🎁",
+            "code": "fake_prize",
             "title": "جائزة وهمية",
             "description": "لا توجد جوائز حقيقية عبر الإيميل",
             "severity": "high"
@@ -221,6 +244,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in ["خويك", "صاحبك", "أخوك", "صديقك"]):
         flags.append({
             "icon": "👤",
+            "code": "friend_impersonation",
             "title": "انتحال شخصية صديق",
             "description": "شخص يدّعي معرفتك",
             "severity": "high"
@@ -230,6 +254,7 @@ def extract_flags(text: str) -> list:
     if any(w in text_lower for w in ["حول", "حولي", "تحويل", "سلفني", "transfer", "ارسل"]):
         flags.append({
             "icon": "💸",
+            "code": "money_transfer",
             "title": "طلب تحويل مال",
             "description": "تأكد من هوية الطالب قبل التحويل",
             "severity": "high"
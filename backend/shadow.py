@@ -0,0 +1,258 @@
+"""
+تقييم النموذج الجديد قبل اعتماده
+Champion / Challenger Shadow Evaluation
+
+بعد إعادة التدريب، النموذج الجديد (challenger) ما يستبدل النموذج الحالي
+(champion) مباشرة. بدلاً من ذلك:
+
+1. مقارنة أولية على جزء الاختبار (holdout) من نفس التدريب: دقة الاثنين
+2. تشغيل الـ challenger في الظل على عينة من الطلبات الحقيقية
+   (في thread منفصل بعد الرد، ما يأثر على المستخدم): نسجل الاتفاق
+   مع الـ champion، فرق النتيجة، وزمن الاستدلال للاثنين
+3. بعد SHADOW_MIN_SAMPLES عينة: الاعتماد فقط إذا تحققت الشروط
+   (الدقة، الاتفاق، الزمن، الحجم)، وإلا يُرفض ويبقى الـ champion
+
+التقرير الكامل من GET /model/shadow
+"""
+
+import asyncio
+import pickle
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    SHADOW_ENABLED, SHADOW_SAMPLE_RATE, SHADOW_MIN_SAMPLES, SHADOW_MAX_PENDING,
+    SHADOW_MAX_ACCURACY_DROP, SHADOW_MIN_AGREEMENT, SHADOW_MAX_LATENCY_RATIO,
+    SHADOW_MAX_LATENCY_MS, SHADOW_MAX_SIZE_RATIO
+)
+
+
+def _percentile(values, p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(int(len(values) * p / 100), len(values) - 1)], 2)
+
+
+def _holdout_accuracy(model, texts: List[str], labels: List[int]) -> Optional[float]:
+    if not texts:
+        return None
+    predictions = model.predict_batch(texts)
+    correct = sum(int(p["is_fraud"]) == int(label) for p, label in zip(predictions, labels))
+    return round(correct / len(texts), 4)
+
+
+class ShadowEvaluator:
+    """تشغيل الـ challenger في الظل وقرار اعتماده"""
+
+    def __init__(self, champion, promote: Callable, enabled: bool = SHADOW_ENABLED,
+                 sample_rate: float = SHADOW_SAMPLE_RATE, min_samples: int = SHADOW_MIN_SAMPLES,
+                 max_pending: int = SHADOW_MAX_PENDING):
+        """
+        Args:
+            champion: النموذج الحالي (FraudDetectionModel)
+            promote: تُستدعى بالـ challenger عند اعتماده (async: حفظ + تبديل)
+        """
+        self.champion = champion
+        self.promote = promote
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.min_samples = min_samples
+        self.max_pending = max_pending
+        self.challenger = None
+        self.report: Optional[Dict] = None      # التقرير الحالي أو آخر قرار
+        self.history: deque = deque(maxlen=10)  # القرارات السابقة
+        self._pending = 0
+        self._deciding = False
+        self._decide_task: Optional[asyncio.Task] = None  # مرجع قوي: الـ loop يحفظ المهام بمرجع ضعيف فقط
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-shadow")
+
+    def offline_comparison(self, challenger, holdout: Dict) -> Dict:
+        """
+        مقارنة أولية على جزء الاختبار من نفس التدريب + حجم النموذجين
+        (ثقيلة نسبياً: تُستدعى في thread منفصل)
+
+        Args:
+            holdout: {"texts", "labels"}
+        """
+        return {
+            "holdout": {
+                "size": len(holdout["texts"]),
+                "champion_accuracy": _holdout_accuracy(self.champion, holdout["texts"], holdout["labels"]),
+                "challenger_accuracy": _holdout_accuracy(challenger, holdout["texts"], holdout["labels"])
+            },
+            "size_bytes": {
+                "champion": len(pickle.dumps((self.champion.vectorizer, self.champion.model))),
+                "challenger": len(pickle.dumps((challenger.vectorizer, challenger.model)))
+            }
+        }
+
+    def start(self, challenger, offline: Dict, training: Dict):
+        """
+        بدء تقييم challenger جديد في الظل (يستبدل أي challenger سابق)
+
+        Args:
+            offline: نتيجة offline_comparison
+            training: ملخص التدريب (الدقة، الإعدادات ...)
+        """
+        if self.report and self.report["status"] == "shadowing":
+            self._close("replaced", ["وصل نموذج أحدث"])
+
+        self.challenger = challenger
+        self.report = {
+            "status": "shadowing",
+            "started_at": time.time(),
+            "decided_at": None,
+            "reasons": [],
+            "training": training,
+            **offline,
+            "samples": 0,
+            "agreements": 0,
+            "score_diff_total": 0,
+            "latency_ms": {"champion": deque(maxlen=1000), "challenger": deque(maxlen=1000)},
+            "skipped_busy": 0
+        }
+
+    def observe(self, text: str):
+        """عينة من طلب حقيقي (بعد الرد، بدون انتظار)"""
+        if not self.enabled or self.challenger is None or self._deciding:
+            return
+        if random.random() >= self.sample_rate:
+            return
+        if self._pending >= self.max_pending:
+            self.report["skipped_busy"] += 1
+            return
+
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        challenger, report = self.challenger, self.report
+        future = loop.run_in_executor(self._executor, self._compare, challenger, text)
+        future.add_done_callback(lambda f: self._record(f, challenger, report))
+
+    def _compare(self, challenger, text: str) -> Dict:
+        """الاثنين على نفس النص بنفس الـ thread (مقارنة زمن عادلة)"""
+        start = time.perf_counter()
+        champion_result = self.champion.predict_batch([text])[0]
+        champion_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        challenger_result = challenger.predict_batch([text])[0]
+        challenger_ms = (time.perf_counter() - start) * 1000
+        return {
+            "agree": champion_result["is_fraud"] == challenger_result["is_fraud"],
+            "score_diff": abs(champion_result["risk_score"] - challenger_result["risk_score"]),
+            "champion_ms": champion_ms,
+            "challenger_ms": challenger_ms
+        }
+
+    def _record(self, future, challenger, report: Dict):
+        self._pending -= 1
+        if future.cancelled() or future.exception() is not None:
+            return
+        if challenger is not self.challenger:
+            return  # challenger تغير أثناء المقارنة
+        result = future.result()
+        report["samples"] += 1
+        report["agreements"] += int(result["agree"])
+        report["score_diff_total"] += result["score_diff"]
+        report["latency_ms"]["champion"].append(result["champion_ms"])
+        report["latency_ms"]["challenger"].append(result["challenger_ms"])
+        if report["samples"] >= self.min_samples and not self._deciding:
+            self._deciding = True
+            self._decide_task = asyncio.get_running_loop().create_task(self._decide())
+
+    def check_gates(self) -> List[str]:
+        """أسباب الرفض (قائمة فاضية = يُعتمد)"""
+        r = self.report
+        reasons = []
+        champion_acc = r["holdout"]["champion_accuracy"]
+        challenger_acc = r["holdout"]["challenger_accuracy"]
+        if champion_acc is not None and challenger_acc is not None \
+                and challenger_acc < champion_acc - SHADOW_MAX_ACCURACY_DROP:
+            reasons.append(f"الدقة نزلت: {challenger_acc:.3f} مقابل {champion_acc:.3f}")
+
+        agreement = r["agreements"] / r["samples"] if r["samples"] else 0
+        if agreement < SHADOW_MIN_AGREEMENT:
+            reasons.append(f"الاتفاق مع النموذج الحالي {agreement:.1%} أقل من {SHADOW_MIN_AGREEMENT:.0%}")
+
+        champion_p95 = _percentile(r["latency_ms"]["champion"], 95)
+        challenger_p95 = _percentile(r["latency_ms"]["challenger"], 95)
+        if challenger_p95 is not None:
+            if challenger_p95 > SHADOW_MAX_LATENCY_MS:
+                reasons.append(f"زمن p95 {challenger_p95}ms أعلى من الحد {SHADOW_MAX_LATENCY_MS}ms")
+            if champion_p95 and challenger_p95 > champion_p95 * SHADOW_MAX_LATENCY_RATIO:
+                reasons.append(f"زمن p95 {challenger_p95}ms مقابل {champion_p95}ms للنموذج الحالي")
+
+        sizes = r["size_bytes"]
+        if sizes["champion"] and sizes["challenger"] > sizes["champion"] * SHADOW_MAX_SIZE_RATIO:
+            reasons.append(f"الحجم {sizes['challenger']} بايت مقابل {sizes['champion']}")
+        return reasons
+
+    async def _decide(self):
+        try:
+            reasons = self.check_gates()
+            if reasons:
+                print(f"⛔ رفض النموذج الجديد: {'، '.join(reasons)}")
+                self._close("rejected", reasons)
+                return
+            await self.promote(self.challenger)
+            print("🏆 تم اعتماد النموذج الجديد بعد التقييم في الظل")
+            self._close("promoted", [])
+        except Exception as e:
+            print(f"❌ خطأ في اعتماد النموذج الجديد: {e}")
+            self._close("failed", [str(e)])
+        finally:
+            self._deciding = False
+
+    async def close(self):
+        """إلغاء قرار جاري (عند إغلاق السيرفر): الـ challenger يبقى بدون قرار"""
+        task, self._decide_task = self._decide_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    def _close(self, status: str, reasons: List[str]):
+        self.report["status"] = status
+        self.report["reasons"] = reasons
+        self.report["decided_at"] = time.time()
+        self.history.append(self.get_report())
+        self.challenger = None
+
+    def get_report(self) -> Optional[Dict]:
+        """التقرير بصيغة JSON (النسب والـ percentiles محسوبة)"""
+        r = self.report
+        if r is None:
+            return None
+        samples = r["samples"]
+        latency = {
+            name: {"p50": _percentile(values, 50), "p95": _percentile(values, 95)}
+            for name, values in r["latency_ms"].items()
+        }
+        return {
+            "status": r["status"],
+            "started_at": r["started_at"],
+            "decided_at": r["decided_at"],
+            "reasons": r["reasons"],
+            "training": r["training"],
+            "holdout": r["holdout"],
+            "size_bytes": r["size_bytes"],
+            "samples": samples,
+            "min_samples": self.min_samples,
+            "agreement": round(r["agreements"] / samples, 4) if samples else None,
+            "mean_score_diff": round(r["score_diff_total"] / samples, 2) if samples else None,
+            "latency_ms": latency,
+            "skipped_busy": r["skipped_busy"],
+            "pending_gates": self.check_gates() if r["status"] == "shadowing" and samples else []
+        }
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "status": self.report["status"] if self.report else None,
+            "samples": self.report["samples"] if self.report else 0,
+            "pending": self._pending,
+            "decisions": len(self.history)
+        }
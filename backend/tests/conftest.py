@@ -0,0 +1,15 @@
+"""
+إعداد الاختبارات
+
+المسارات في config.py نسبية لمجلد backend (data/، models/)، والموديولات
+تُستورد مباشرة (from config import ...) مثل main.py.
+
+    cd backend && python -m pytest -q
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
@@ -0,0 +1,72 @@
+"""قاطع الدائرة في ai_scorer: الطلب التجريبي ما يبقى محجوز بعد الإلغاء"""
+
+import asyncio
+
+import pytest
+
+from ai_scorer import AIScorer, CircuitBreaker
+
+
+def open_breaker(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_half_open_allows_single_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_cancelled_trial_releases_breaker():
+    scorer = AIScorer(api_key="test", latency_budget=5)
+    scorer.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    open_breaker(scorer.breaker)
+
+    async def hang(text):
+        await asyncio.sleep(60)
+
+    scorer._call = hang
+
+    async def cancel_trial():
+        task = asyncio.create_task(scorer.score("رسالة"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert scorer.breaker.state == "half_open"
+    assert scorer.breaker.allow()
+
+
+def test_queue_wait_does_not_open_breaker():
+    # الطابور المحلي ممتلئ والـ API سليم: تخطي بدون ما يفتح القاطع
+    scorer = AIScorer(api_key="test", max_concurrency=1, latency_budget=5, queue_timeout=0.05)
+    scorer.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+
+    async def slow(text):
+        await asyncio.sleep(0.2)
+        return 60
+
+    scorer._call = slow
+
+    async def burst():
+        return await asyncio.gather(*(scorer.score(f"رسالة {i}") for i in range(3)))
+
+    assert sorted(asyncio.run(burst()), key=str) == [60, None, None]
+    assert scorer.stats["queue_skips"] == 2
+    assert scorer.breaker.state == "closed"
@@ -0,0 +1,40 @@
+"""هوية العميل لحدود الطلبات (main.client_id): الهيدرات فقط من proxy موثوق"""
+
+import ipaddress
+
+import pytest
+from starlette.requests import Request
+
+import main
+
+
+def make_request(peer: str, headers: dict) -> Request:
+    return Request({
+        "type": "http", "method": "POST", "path": "/analyze", "query_string": b"",
+        "client": (peer, 51000),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+@pytest.fixture
+def trusted(monkeypatch):
+    monkeypatch.setattr(main, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+
+
+def test_headers_ignored_from_untrusted_peer(trusted):
+    request = make_request("203.0.113.7", {"X-Client-Id": "rotating-1", "X-Forwarded-For": "198.51.100.1"})
+    assert main.client_id(request) == "203.0.113.7"
+
+
+def test_client_id_header_from_trusted_proxy(trusted):
+    assert main.client_id(make_request("10.0.0.5", {"X-Client-Id": "tenant-a"})) == "tenant-a"
+
+
+def test_forwarded_for_skips_trusted_hops(trusted):
+    request = make_request("10.0.0.5", {"X-Forwarded-For": "198.51.100.9, 10.0.0.2"})
+    assert main.client_id(request) == "198.51.100.9"
+
+
+def test_no_proxies_configured_uses_peer(monkeypatch):
+    monkeypatch.setattr(main, "TRUSTED_PROXIES", [])
+    assert main.client_id(make_request("127.0.0.1", {"X-Client-Id": "x"})) == "127.0.0.1"
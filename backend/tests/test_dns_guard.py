@@ -0,0 +1,220 @@
+"""حماية العناوين الداخلية وكاش DNS (dns_guard.py) عند فتح الروابط"""
+
+import asyncio
+import ipaddress
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import httpcore
+import httpx
+import pytest
+
+import dns_guard
+from dns_guard import AddressBlocked, DnsResolver, ResolutionFailed, blocked_reason
+from link_scanner import fetch_and_analyze_content
+
+
+@pytest.fixture(autouse=True)
+def no_proxy_env(monkeypatch):
+    # الاختبارات تتصل مباشرة (proxy_mounts تقرأ متغيرات البيئة)
+    for name in ("HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "http_proxy", "https_proxy", "all_proxy"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def fake_resolver(answers: dict, calls: list) -> DnsResolver:
+    """resolver بإجابات ثابتة بدل DNS حقيقي (None = الدومين غير موجود)"""
+    resolver = DnsResolver()
+
+    async def query(host):
+        calls.append(host)
+        await asyncio.sleep(0.01)
+        if answers.get(host) is None:
+            raise LookupError(host)
+        return answers[host], 120
+
+    resolver._query = query
+    return resolver
+
+
+# ---------- تصنيف العناوين ----------
+@pytest.mark.parametrize("address,reason", [
+    ("127.0.0.1", "loopback"),
+    ("::1", "loopback"),
+    ("10.1.2.3", "private"),
+    ("192.168.0.10", "private"),
+    ("172.16.5.4", "private"),
+    ("100.64.0.1", "private"),
+    ("fd12::1", "private"),
+    ("169.254.169.254", "metadata"),
+    ("fd00:ec2::254", "metadata"),
+    ("169.254.10.1", "link_local"),
+    ("::ffff:127.0.0.1", "loopback"),
+    ("::ffff:10.0.0.1", "private"),
+    ("0.0.0.0", "private"),
+    ("224.0.0.1", "reserved"),
+])
+def test_internal_addresses_blocked(address, reason):
+    assert blocked_reason(address) == reason
+
+
+@pytest.mark.parametrize("address", ["8.8.8.8", "1.1.1.1", "2606:4700:4700::1111", "::ffff:8.8.8.8"])
+def test_public_addresses_allowed(address):
+    assert blocked_reason(address) is None
+
+
+def test_allowed_networks(monkeypatch):
+    monkeypatch.setattr(dns_guard, "DNS_ALLOWED_NETWORKS", [ipaddress.ip_network("10.20.0.0/16")])
+    assert blocked_reason("10.20.1.1") is None
+    assert blocked_reason("10.21.1.1") == "private"
+
+
+# ---------- الاستعلام ----------
+def test_resolve_blocks_ip_literals():
+    resolver = DnsResolver()
+    with pytest.raises(AddressBlocked) as error:
+        asyncio.run(resolver.resolve("[::1]"))
+    assert error.value.reason == "loopback"
+    assert resolver.stats["blocked"] == 1
+
+
+def test_resolve_blocks_mixed_public_and_internal():
+    calls = []
+    resolver = fake_resolver({"rebind.example": ["93.184.216.34", "10.0.0.7"]}, calls)
+    with pytest.raises(AddressBlocked) as error:
+        asyncio.run(resolver.resolve("rebind.example"))
+    assert error.value.address == "10.0.0.7"
+    # من الكاش: نفس الرفض بدون استعلام ثاني
+    with pytest.raises(AddressBlocked):
+        asyncio.run(resolver.resolve("REBIND.example."))
+    assert calls == ["rebind.example"]
+
+
+def test_resolve_caches_and_shares_lookups():
+    calls = []
+    resolver = fake_resolver({"example.com": ["93.184.216.34"]}, calls)
+
+    async def resolve_many():
+        return await asyncio.gather(*(resolver.resolve("example.com") for _ in range(5)))
+
+    assert asyncio.run(resolve_many()) == [["93.184.216.34"]] * 5
+    assert asyncio.run(resolver.resolve("example.com")) == ["93.184.216.34"]
+    assert calls == ["example.com"]
+    assert resolver.stats["shared"] == 4
+    assert resolver.stats["cache_hits"] == 1
+
+
+def test_negative_cache():
+    calls = []
+    resolver = fake_resolver({}, calls)
+    for _ in range(2):
+        with pytest.raises(ResolutionFailed):
+            asyncio.run(resolver.resolve("missing.example"))
+    assert calls == ["missing.example"]
+    assert resolver.stats["negative_hits"] == 1
+
+
+# ---------- فتح الروابط ----------
+class RedirectHandler(BaseHTTPRequestHandler):
+    """كل طلب ← توجيه لعنوان metadata السحابة"""
+
+    def do_GET(self):
+        self.send_response(302)
+        self.send_header("Location", "http://169.254.169.254/latest/meta-data/")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_HEAD = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def redirect_server():
+    server = HTTPServer(("127.0.0.1", 0), RedirectHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/login"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_refuses_loopback_link():
+    result = asyncio.run(fetch_and_analyze_content("http://127.0.0.1:9/admin", timeout=2))
+    assert result["content_summary"] == "🚫 عنوان داخلي - لم يُفتح"
+
+
+def test_fetch_refuses_redirect_to_internal_address(monkeypatch, redirect_server):
+    # السيرفر المحلي نفسه مسموح، التوجيه منه لعنوان داخلي ينرفض
+    monkeypatch.setattr(dns_guard, "DNS_ALLOWED_NETWORKS", [ipaddress.ip_network("127.0.0.1/32")])
+    result = asyncio.run(fetch_and_analyze_content(redirect_server, timeout=2))
+    assert result["content_summary"] == "🚫 عنوان داخلي - لم يُفتح"
+    assert any("169.254.169.254" in flag for flag in result["flags"])
+
+
+def test_connect_without_addresses_raises_connect_error():
+    resolver = DnsResolver()
+
+    async def resolve(host):
+        return []
+
+    resolver.resolve = resolve
+    backend = dns_guard.GuardedBackend(resolver)
+    with pytest.raises(httpcore.ConnectError):
+        asyncio.run(backend.connect_tcp("empty.example", 80))
+
+
+# ---------- الـ transport ----------
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = "<html><title>ok</title></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def page_server():
+    server = HTTPServer(("127.0.0.1", 0), PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_port
+    server.shutdown()
+    server.server_close()
+
+
+def get(url: str, resolver: DnsResolver):
+    async def main():
+        async with httpx.AsyncClient(transport=dns_guard.guarded_transport(resolver)) as client:
+            response = await client.get(url)
+            return response.status_code, response.text
+
+    return asyncio.run(main())
+
+
+def test_transport_connects_through_guard(monkeypatch, page_server):
+    # كل اتصال يمر على resolve(): اسم الدومين ينحل عبر الكاش ثم يُفحص
+    monkeypatch.setattr(dns_guard, "DNS_ALLOWED_NETWORKS", [ipaddress.ip_network("127.0.0.1/32")])
+    calls = []
+    resolver = fake_resolver({"page.example": ["127.0.0.1"]}, calls)
+    assert get(f"http://page.example:{page_server}/", resolver) == (200, "<html><title>ok</title></html>")
+    assert calls == ["page.example"]
+
+
+def test_transport_blocks_internal_host(page_server):
+    calls = []
+    resolver = fake_resolver({"internal.example": ["127.0.0.1"]}, calls)
+    with pytest.raises(AddressBlocked):
+        get(f"http://internal.example:{page_server}/", resolver)
+    assert resolver.stats["blocked"] == 1
+
+
+def test_transport_maps_errors_to_httpx():
+    resolver = fake_resolver({}, [])
+    with pytest.raises(httpx.ConnectError):
+        get("http://missing.example/", resolver)
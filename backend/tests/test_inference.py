@@ -0,0 +1,38 @@
+"""النموذج المحمّل أو المعتمد للسيرفر يحلل بخيط واحد (inference.py)"""
+
+import pickle
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from inference import InferenceModel
+
+TEXTS = ["حدث بياناتك فوراً عبر الرابط", "اجتماع الفريق غداً", "verify your account now", "lunch at noon"]
+LABELS = [1, 0, 1, 0]
+
+
+def trained(n_jobs: int) -> InferenceModel:
+    model = InferenceModel()
+    model.vectorizer = TfidfVectorizer().fit(TEXTS)
+    model.model = RandomForestClassifier(n_estimators=5, n_jobs=n_jobs, random_state=0)
+    model.model.fit(model.vectorizer.transform(TEXTS), LABELS)
+    model.is_trained = True
+    return model
+
+
+def test_load_resets_parallel_model(tmp_path):
+    source = trained(n_jobs=-1)
+    model_path, vectorizer_path = tmp_path / "model.pkl", tmp_path / "vectorizer.pkl"
+    model_path.write_bytes(pickle.dumps(source.model))
+    vectorizer_path.write_bytes(pickle.dumps(source.vectorizer))
+
+    model = InferenceModel()
+    assert model.load(str(model_path), str(vectorizer_path))
+    assert model.model.get_params()["n_jobs"] == 1
+    assert model.predict("حدث بياناتك")["risk_score"] >= 0
+
+
+def test_adopt_resets_parallel_model():
+    model = InferenceModel()
+    model.adopt(trained(n_jobs=-1))
+    assert model.model.get_params()["n_jobs"] == 1
@@ -0,0 +1,65 @@
+"""طابور فتح الروابط (link_fetcher.py): المنتظرين ما يعلقون عند الإيقاف"""
+
+import asyncio
+
+import pytest
+
+from link_fetcher import LinkFetcher, LinkFetchStopped, LinkQueueFull
+
+
+def test_duplicate_requests_share_one_fetch():
+    calls = []
+
+    async def fetch(url):
+        calls.append(url)
+        await asyncio.sleep(0.02)
+        return {"url": url}
+
+    fetcher = LinkFetcher(fetch, workers=2)
+
+    async def main():
+        results = await asyncio.gather(*(fetcher.fetch("https://a.example/x") for _ in range(3)))
+        await fetcher.close()
+        return results
+
+    assert asyncio.run(main()) == [{"url": "https://a.example/x"}] * 3
+    assert calls == ["https://a.example/x"]
+    assert fetcher.stats["deduplicated"] == 2
+
+
+def test_close_releases_waiters():
+    async def fetch(url):
+        await asyncio.sleep(60)
+
+    # عامل واحد: الرابط الأول قيد الفتح والثاني في الطابور
+    fetcher = LinkFetcher(fetch, workers=1)
+
+    async def main():
+        waiters = [asyncio.ensure_future(fetcher.fetch(url)) for url in
+                   ("https://a.example/1", "https://a.example/1", "https://b.example/2")]
+        await asyncio.sleep(0.02)
+        await fetcher.close()
+        return await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), 1)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, LinkFetchStopped) for r in results)
+    assert not fetcher._in_flight
+
+
+def test_queue_full():
+    async def fetch(url):
+        await asyncio.sleep(60)
+
+    fetcher = LinkFetcher(fetch, workers=1, max_queue=1, per_host=1)
+
+    async def main():
+        first = asyncio.ensure_future(fetcher.fetch("https://a.example/1"))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(fetcher.fetch("https://a.example/2"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LinkQueueFull):
+            await fetcher.fetch("https://a.example/3")
+        await fetcher.close()
+        await asyncio.gather(first, second, return_exceptions=True)
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""تجميع طلبات ML في دفعات (ml_batcher.py)"""
+
+import asyncio
+import gc
+import threading
+
+import pytest
+
+from ml_batcher import MicroBatcher
+
+
+class FakeModel:
+    def __init__(self, release: threading.Event = None):
+        self.release = release
+        self.calls = []
+
+    def predict_batch(self, texts):
+        if self.release is not None:
+            self.release.wait(5)
+        self.calls.append(list(texts))
+        if "boom" in texts:
+            raise ValueError("boom")
+        return [{"risk_score": len(text)} for text in texts]
+
+
+def test_concurrent_requests_share_one_batch():
+    model = FakeModel()
+    batcher = MicroBatcher(model, window_ms=20, max_batch=8, enabled=True)
+
+    async def main():
+        results = await asyncio.gather(*(batcher.predict("x" * n) for n in range(1, 4)))
+        await batcher.close()
+        return results
+
+    assert [r["risk_score"] for r in asyncio.run(main())] == [1, 2, 3]
+    assert model.calls == [["x", "xx", "xxx"]]
+
+
+def test_batch_task_is_held_until_done():
+    release = threading.Event()
+    batcher = MicroBatcher(FakeModel(release), window_ms=1, max_batch=1, enabled=True)
+
+    async def main():
+        request = asyncio.ensure_future(batcher.predict("hello"))
+        await asyncio.sleep(0.05)
+        gc.collect()
+        assert len(batcher._batches) == 1
+        release.set()
+        result = await asyncio.wait_for(request, 5)
+        await batcher.close()
+        return result
+
+    assert asyncio.run(main())["risk_score"] == 5
+    assert not batcher._batches
+
+
+def test_model_error_reaches_callers():
+    batcher = MicroBatcher(FakeModel(), window_ms=1, max_batch=2, enabled=True)
+
+    async def main():
+        await asyncio.gather(batcher.predict("boom"), batcher.predict("ok"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
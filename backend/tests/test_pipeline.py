@@ -0,0 +1,104 @@
+"""دمج النتائج وحدود تخطي المراحل الغالية (pipeline.py)"""
+
+import asyncio
+
+import pytest
+
+from config import DANGEROUS_PAGE_SCORE, LINK_SCAN_MAX_URLS
+from pipeline import ScoringPipeline, dangerous_page, fuse
+
+
+# ---------- الدمج ----------
+def test_fuse_ignores_missing_stages():
+    assert fuse({"rule": 80, "ml": None, "ai": None, "link": None}) == 80
+    assert fuse({"rule": 100, "ml": 100, "ai": 100, "link": 100}) == 100
+    assert fuse({}) == 0
+
+
+def test_fuse_dangerous_page_floor():
+    assert fuse({"rule": 0, "ml": 0}, dangerous_page=True) == DANGEROUS_PAGE_SCORE
+    assert fuse({"rule": 100, "ml": 100}, dangerous_page=True) == 100
+
+
+def test_dangerous_page_needs_risky_payment_or_login():
+    assert dangerous_page([{"content_type": "login", "risk_score": 60}])
+    assert not dangerous_page([{"content_type": "login", "risk_score": 10}])
+    assert not dangerous_page([{"content_type": "article", "risk_score": 90}])
+
+
+# ---------- الحدود ----------
+KNOWN = {"rule": 100, "ml": 100, "link": 90}
+
+
+def test_bounds_link_floor_is_syntax_score_within_cap():
+    low, high = ScoringPipeline("band").bounds(KNOWN, ["link_deep"], LINK_SCAN_MAX_URLS)
+    assert low == fuse(KNOWN)
+    assert high == 100
+
+
+def test_bounds_link_floor_is_zero_past_cap():
+    # الفتح ممكن يختار روابط غير اللي انفحص شكلها ← نتيجته ممكن تكون أقل
+    low, _ = ScoringPipeline("band").bounds(KNOWN, ["link_deep"], LINK_SCAN_MAX_URLS + 1)
+    assert low == fuse({**KNOWN, "link": 0})
+
+
+def test_bounds_cover_every_outcome():
+    known = {"rule": 50, "ml": 40, "link": 30}
+    low, high = ScoringPipeline("band").bounds(known, ["ai", "link_deep"], 2)
+    for ai in (0, 50, 100, None):
+        for link in (30, 65, 100):
+            for page in (False, True):
+                assert low <= fuse({**known, "ai": ai, "link": link}, page) <= high
+
+
+def test_bounds_without_urls_leave_link_alone():
+    low, high = ScoringPipeline("band").bounds({"rule": 20, "ml": 20, "link": None}, ["link_deep"], 0)
+    assert low == high == 20
+
+
+def test_locked_band():
+    pipeline = ScoringPipeline("band")
+    assert pipeline.locked_band(KNOWN, ["link_deep"], 1) == "high"
+    assert pipeline.locked_band(KNOWN, ["link_deep"], LINK_SCAN_MAX_URLS + 1) is None
+    assert ScoringPipeline("off").locked_band(KNOWN, ["link_deep"], 1) is None
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        ScoringPipeline("fastest")
+
+
+# ---------- التشغيل ----------
+def run_pipeline(policy: str, known, url_count: int):
+    calls = []
+
+    async def ai():
+        calls.append("ai")
+        return 100
+
+    async def link_deep():
+        calls.append("link_deep")
+        return {"overall_risk": 100, "urls": []}
+
+    run = asyncio.run(ScoringPipeline(policy).run(known, url_count, {"ai": ai, "link_deep": link_deep}))
+    return run, calls
+
+
+def test_run_skips_expensive_stages_when_band_locked():
+    run, calls = run_pipeline("band", KNOWN, 1)
+    assert calls == []
+    assert sorted(run["pipeline"]["skipped"]) == ["ai", "link_deep"]
+    assert run["pipeline"]["locked_band"] == "high"
+
+
+def test_run_sequential_stops_once_locked():
+    # AI أرخص فيشتغل أول، وبعده فتح الروابط ما يغير المستوى
+    run, calls = run_pipeline("sequential", {"rule": 100, "ml": 60, "link": 50}, 1)
+    assert calls == ["ai"]
+    assert run["pipeline"]["skipped"] == ["link_deep"]
+
+
+def test_run_off_runs_everything():
+    run, calls = run_pipeline("off", KNOWN, 1)
+    assert sorted(calls) == ["ai", "link_deep"]
+    assert run["pipeline"]["skipped"] == []
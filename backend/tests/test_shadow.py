@@ -0,0 +1,65 @@
+"""التقييم في الظل (shadow.py): مهمة القرار تكمل حتى النهاية"""
+
+import asyncio
+import gc
+
+from shadow import ShadowEvaluator
+
+
+class FakeModel:
+    def __init__(self, score: int):
+        self.score = score
+
+    def predict_batch(self, texts):
+        return [{"is_fraud": self.score >= 50, "risk_score": self.score} for _ in texts]
+
+
+OFFLINE = {
+    "holdout": {"size": 0, "champion_accuracy": None, "challenger_accuracy": None},
+    "size_bytes": {"champion": 0, "challenger": 0}
+}
+
+
+def test_challenger_promoted_after_samples():
+    promoted = []
+
+    async def promote(challenger):
+        await asyncio.sleep(0.05)
+        gc.collect()  # مهمة القرار محفوظة بمرجع قوي
+        promoted.append(challenger)
+
+    shadow = ShadowEvaluator(FakeModel(80), promote, enabled=True, sample_rate=1.0, min_samples=2)
+    challenger = FakeModel(85)
+
+    async def main():
+        shadow.start(challenger, OFFLINE, {})
+        for i in range(2):
+            shadow.observe(f"رسالة {i}")
+            await asyncio.sleep(0.02)
+        await asyncio.sleep(0.05)
+        gc.collect()
+        await asyncio.wait_for(shadow._decide_task, 5)
+        await shadow.close()
+
+    asyncio.run(main())
+    assert promoted == [challenger]
+    assert shadow.report["status"] == "promoted"
+    assert not shadow._deciding
+
+
+def test_close_cancels_pending_decision():
+    async def promote(challenger):
+        await asyncio.sleep(60)
+
+    shadow = ShadowEvaluator(FakeModel(80), promote, enabled=True, sample_rate=1.0, min_samples=1)
+
+    async def main():
+        shadow.start(FakeModel(85), OFFLINE, {})
+        shadow.observe("رسالة")
+        while shadow._decide_task is None:
+            await asyncio.sleep(0.01)
+        await shadow.close()
+
+    asyncio.run(main())
+    assert not shadow._deciding
+    assert shadow.report["status"] == "shadowing"
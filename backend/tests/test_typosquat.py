@@ -0,0 +1,55 @@
+"""كشف انتحال البراندات (typosquat.py): الانتحال الحقيقي والدومينات العادية"""
+
+import pytest
+
+from typosquat import TyposquatIndex, allowed_distance, skeleton
+
+
+@pytest.fixture(scope="module")
+def index():
+    return TyposquatIndex.from_file()
+
+
+@pytest.mark.parametrize("host, brand, kind", [
+    ("rnicrosoft.com", "microsoft", "homoglyph"),
+    ("rnicrosoft-login.com", "microsoft", "homoglyph"),
+    ("paypaI.com", "paypal", "homoglyph"),
+    ("xn--pple-43d.com", "apple", "homoglyph"),
+    ("linkedln.com", "linkedin", "homoglyph"),
+    ("micros0ft.co.uk", "microsoft", "homoglyph"),
+    ("paypa1-secure.xyz", "paypal", "homoglyph"),
+    ("amazon-prime.xyz", "amazon", "brand_in_domain"),
+    ("netfllx-billing.com", "netflix", "homoglyph"),
+    ("instagran.com", "instagram", "typo"),
+])
+def test_impersonation_detected(index, host, brand, kind):
+    match = index.check(host)
+    assert match is not None
+    assert (match["brand"], match["kind"]) == (brand, kind)
+
+
+@pytest.mark.parametrize("host", [
+    "mail.yahoo.com",          # mail ≠ gmail
+    "apply.workday.com",       # apply ≠ apple
+    "outlook.office365.com",   # البراند في نطاق فرعي فقط
+    "amazon.co.uk",            # نطاق دولة للبراند نفسه
+    "google.de",
+    "www.amazon.sa",
+    "mail.google.com",
+    "login.microsoftonline.com",
+    "github.com",
+    "zoom.us",
+])
+def test_legitimate_hosts_not_flagged(index, host):
+    assert index.check(host) is None
+
+
+def test_short_labels_need_exact_skeleton():
+    assert allowed_distance(5, 2) == 0
+    assert allowed_distance(6, 2) == 1
+    assert allowed_distance(9, 2) == 2
+
+
+def test_skeleton_folds_confusables():
+    assert skeleton("pаypa1") == "paypal"   # a كيريلية + 1
+    assert skeleton("G00GLE") == "google"
@@ -0,0 +1,190 @@
+"""
+تحليل سلاسل الردود
+Thread-Aware Segment Analysis
+
+الرد والتحويل في Gmail يحمل كل الرسائل السابقة مقتبسة، فكل رسالة جديدة
+في السلسلة كانت تعيد القواعد و TF-IDF وفتح الروابط على نص انحلل قبل.
+
+الحل:
+1. تقسيم الرسالة لمقاطع: المحتوى الجديد + كل رسالة مقتبسة لوحدها
+   (أسطر > بأي عمق، "On ... wrote:"، "في ... كتب:"، رسالة محولة، Outlook)
+2. hash لكل مقطع بعد التطبيع (بدون > وبدون فراغات زائدة): نفس الرسالة
+   مقتبسة على أي عمق لها نفس الـ hash
+3. كاش لنتائج كل مقطع (القواعد، ML، الروابط): المقطع اللي انحلل قبل
+   ما يتحلل مرة ثانية، فتكلفة الرسالة تعتمد على الجديد فيها فقط
+4. حكم السلسلة من نتائج كل المقاطع (أعلى خطر)
+
+الرسالة الأكبر من ميزانية التحليل ما تتقسم: تتحلل بنوافذ (windowing.py)
+وكل نافذة مقطع بنفس الكاش
+"""
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+from config import THREAD_CACHE_SIZE, THREAD_CACHE_TTL, THREAD_MAX_SEGMENTS, ANALYSIS_BUDGET_CHARS
+from windowing import window_segments
+
+QUOTE_PREFIX = re.compile(r"^(\s*>)+ ?")
+
+# بداية رسالة مقتبسة (بعد حذف علامات >)
+ATTRIBUTION_MARKERS = [
+    re.compile(r"^\s*On\s.+\bwrote:\s*$", re.IGNORECASE),
+    re.compile(r"^\s*في\s.+\sكتب.*:\s*$"),
+    re.compile(r"^\s*-{3,}\s*(Forwarded message|Original Message)\s*-{3,}\s*$", re.IGNORECASE),
+    re.compile(r"^\s*-{3,}\s*(رسالة محولة|رسالة مُعاد توجيهها|الرسالة الأصلية)\s*-{3,}\s*$"),
+]
+# ردود Outlook: "From: ..." وبعده مباشرة "Sent: ..." (بدون علامات >)
+OUTLOOK_FROM = re.compile(r"^\s*(From|من):\s.+", re.IGNORECASE)
+OUTLOOK_SENT = re.compile(r"^\s*(Sent|Date|التاريخ|تاريخ الإرسال|أُرسلت):\s", re.IGNORECASE)
+
+# الروابط المخفية اللي يضيفها message_text والإكستنشن في آخر النص
+LINKS_TRAILER = re.compile(r"\n\nLinks:\n((?:https?://\S+\n?)+)$")
+
+
+def _unquote(line: str):
+    """(عمق الاقتباس، السطر بدون علامات >)"""
+    match = QUOTE_PREFIX.match(line)
+    if not match:
+        return 0, line
+    return match.group(0).count(">"), line[match.end():]
+
+
+def _is_marker(lines: List[str], i: int) -> bool:
+    line = lines[i]
+    if any(marker.match(line) for marker in ATTRIBUTION_MARKERS):
+        return True
+    return bool(OUTLOOK_FROM.match(line) and i + 1 < len(lines) and OUTLOOK_SENT.match(lines[i + 1]))
+
+
+def segment_hash(text: str) -> str:
+    """hash المقطع بعد التطبيع (الفراغات والأسطر ما تفرق)"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()[:32]
+
+
+def split_thread(text: str, max_segments: int = THREAD_MAX_SEGMENTS) -> List[Dict]:
+    """
+    تقسيم الرسالة لمقاطع
+
+    Returns:
+        [{"text", "hash", "quoted", "chars"}] بالترتيب، المحتوى الجديد أولاً.
+        رسالة بدون اقتباس = مقطع واحد بنفس النص
+    """
+    trailer = ""
+    match = LINKS_TRAILER.search(text)
+    if match:
+        text, trailer = text[:match.start()], match.group(0)
+
+    parsed = [_unquote(line) for line in text.split("\n")]
+    lines = [line for _, line in parsed]
+    segments = []
+    current: List[str] = []
+    depth = 0
+    quoted = False          # المقطع الحالي مقتبس؟
+    forwarded_at = None     # عمق آخر رسالة محولة (المحتوى بعدها مقتبس بدون >)
+
+    def flush():
+        body = "\n".join(current).strip("\n")
+        if body.strip():
+            segments.append({"text": body, "quoted": quoted})
+        current.clear()
+
+    for i, (line_depth, line) in enumerate(parsed):
+        if _is_marker(lines, i):
+            flush()
+            depth = line_depth
+            forwarded_at = line_depth
+            quoted = True
+            continue
+        if line_depth != depth and line.strip():
+            flush()
+            depth = line_depth
+            quoted = depth > 0 or (forwarded_at is not None and depth >= forwarded_at)
+        current.append(line)
+    flush()
+
+    if not segments:
+        segments.append({"text": text, "quoted": False})
+
+    # سلسلة طويلة جداً: المقاطع الأقدم تندمج في مقطع واحد (تكلفة التقسيم محدودة)
+    if len(segments) > max_segments:
+        tail = segments[max_segments - 1:]
+        segments = segments[:max_segments - 1] + [{"text": "\n\n".join(s["text"] for s in tail), "quoted": True}]
+
+    if trailer:
+        # الروابط المخفية تتبع المحتوى الجديد
+        target = next((s for s in segments if not s["quoted"]), segments[0])
+        target["text"] += trailer
+
+    return _finish(segments)
+
+
+def segment_message(text: str) -> List[Dict]:
+    """المقاطع اللي تتحلل: سلسلة الردود، أو نوافذ إذا الرسالة أكبر من ميزانية التحليل"""
+    if len(text) <= ANALYSIS_BUDGET_CHARS:
+        return split_thread(text)
+    return _finish(window_segments(text))
+
+
+def _finish(segments: List[Dict]) -> List[Dict]:
+    for segment in segments:
+        segment["hash"] = segment_hash(segment["text"])
+        segment["chars"] = len(segment["text"])
+    return segments
+
+
+class SegmentCache:
+    """نتائج كل مقطع (LRU + مدة صلاحية)، والمراحل تعبي الحقول الناقصة"""
+
+    def __init__(self, max_size: int = THREAD_CACHE_SIZE, ttl: float = THREAD_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {"messages": 0, "threads": 0, "segments": 0, "segments_reused": 0,
+                      "chars_analyzed": 0, "chars_skipped": 0, "evicted": 0}
+        self.stage_hits: Dict[str, int] = {}
+        self.stage_misses: Dict[str, int] = {}
+
+    def entry(self, key: str) -> Dict:
+        """نتائج المقطع (dict يتعدل مباشرة)، أو entry فاضي جديد"""
+        item = self._entries.get(key)
+        if item is not None and time.monotonic() - item[1] <= self.ttl:
+            self._entries.move_to_end(key)
+            return item[0]
+        entry: Dict = {}
+        self._entries[key] = (entry, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+        return entry
+
+    def record_stage(self, stage: str, hit: bool):
+        counts = self.stage_hits if hit else self.stage_misses
+        counts[stage] = counts.get(stage, 0) + 1
+
+    def record_message(self, segments: List[Dict], reused: int, skipped_chars: int):
+        self.stats["messages"] += 1
+        self.stats["threads"] += len(segments) > 1
+        self.stats["segments"] += len(segments)
+        self.stats["segments_reused"] += reused
+        self.stats["chars_skipped"] += skipped_chars
+        self.stats["chars_analyzed"] += sum(s["chars"] for s in segments) - skipped_chars
+
+    def get_stats(self) -> Dict:
+        stages = {}
+        for stage in sorted(set(self.stage_hits) | set(self.stage_misses)):
+            hits = self.stage_hits.get(stage, 0)
+            total = hits + self.stage_misses.get(stage, 0)
+            stages[stage] = {"hits": hits, "misses": total - hits,
+                             "hit_rate": round(hits / total, 3) if total else 0.0}
+        return {"cache_size": len(self._entries), **self.stats, "stages": stages}
+
+    def clear(self):
+        self._entries.clear()
+
+
+# instance واحد للسيرفر
+thread_cache = SegmentCache()
@@ -0,0 +1,69 @@
+"""
+📈 اختبار ضغط لمرحلة الـ AI
+============================
+
+يرسل طلبات متزامنة لـ AIScorer ضد السيرفر البديل ويعرض زمن الاستجابة
+وحالة القاطع والكاش.
+
+طريقة الاستخدام:
+    python tools/fake_llm_server.py --latency 0.5 --error-rate 0.3 &
+    python tools/bench_ai_stage.py --requests 500 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_scorer import AIScorer  # noqa: E402
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+async def run(args):
+    scorer = AIScorer(api_key="test", base_url=args.base_url, max_concurrency=args.max_concurrency,
+                      latency_budget=args.budget)
+    # نصف النصوص مكررة لقياس الكاش
+    texts = [f"رسالة رقم {i % max(args.requests // 2, 1)} ارسل رمز otp" for i in range(args.requests)]
+    gate = asyncio.Semaphore(args.concurrency)
+    latencies, skipped = [], 0
+
+    async def one(text):
+        nonlocal skipped
+        async with gate:
+            start = time.perf_counter()
+            score = await scorer.score(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if score is None:
+                skipped += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(t) for t in texts))
+    total = time.perf_counter() - start
+    await scorer.close()
+
+    print(f"الطلبات: {args.requests}  التزامن: {args.concurrency}  المدة: {total:.2f}s")
+    print(f"p50={percentile(latencies, 50):.0f}ms  p95={percentile(latencies, 95):.0f}ms  "
+          f"p99={percentile(latencies, 99):.0f}ms  mean={statistics.mean(latencies):.0f}ms")
+    print(f"بدون AI (تخطي): {skipped}")
+    for key, value in scorer.get_stats().items():
+        print(f"   {key}: {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8100/openai/v1")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--budget", type=float, default=4.0)
+    asyncio.run(run(parser.parse_args()))
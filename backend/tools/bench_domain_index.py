@@ -0,0 +1,77 @@
+"""
+📈 قياس فهرس سمعة الدومينات
+============================
+
+يبني قوائم عشوائية بأحجام متزايدة ويقيس زمن البحث، ويقارنه مع
+المرور الخطي القديم (in / endswith) لنفس القوائم.
+
+طريقة الاستخدام:
+    python tools/bench_domain_index.py --sizes 100 10000 100000
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain_index import DomainIndex  # noqa: E402
+
+HOSTS = ["login.microsoft.com", "paypa1-secure.xyz", "www.bit.ly", "mail.google.com",
+         "alrajhi-update.top", "a.b.c.d.example.co.uk", "t.co", "news.bbc.co.uk"]
+
+
+def random_label(n):
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=n))
+
+
+def linear_lookup(host, shorteners, fakes):
+    hit = False
+    for s in shorteners:
+        if s in host:
+            hit = True
+            break
+    for fake in fakes:
+        if fake in host:
+            hit = True
+    return hit
+
+
+def main(args):
+    random.seed(1)
+    print(f"{'الحجم':>10} {'فهرس µs':>10} {'خطي µs':>10} {'بناء s':>8}")
+    for size in args.sizes:
+        shorteners = [f"{random_label(6)}.{random.choice(['com', 'io', 'ly'])}" for _ in range(size)]
+        fakes = [random_label(7) for _ in range(size)]
+        brands = {"brand": fakes}
+
+        start = time.perf_counter()
+        index = DomainIndex.build(shorteners=shorteners, brands=brands, blocked=shorteners, data_dir=None)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for host in HOSTS:
+                index.is_shortener(host)
+                index.blocked_domain(host)
+                index.impersonated_brands(host)
+        indexed_us = (time.perf_counter() - start) / (args.rounds * len(HOSTS)) * 1e6
+
+        linear_rounds = max(1, args.rounds // max(size // 100, 1))
+        start = time.perf_counter()
+        for _ in range(linear_rounds):
+            for host in HOSTS:
+                linear_lookup(host, shorteners, fakes)
+        linear_us = (time.perf_counter() - start) / (linear_rounds * len(HOSTS)) * 1e6
+
+        print(f"{size:>10} {indexed_us:10.1f} {linear_us:10.1f} {build_s:8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000])
+    parser.add_argument("--rounds", type=int, default=2000)
+    main(parser.parse_args())
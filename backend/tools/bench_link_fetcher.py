@@ -0,0 +1,100 @@
+"""
+📈 قياس طابور فتح الروابط
+==========================
+
+يحاكي حملة تصيد: آلاف الطلبات على نفس الرابط + روابط عادية من دومينات
+مختلفة، ويقارن الفتح المباشر (كل طلب يفتح بنفسه) مع LinkFetcher.
+فتح الرابط نفسه محاكى بـ sleep (بدون شبكة).
+
+يعرض: عدد مرات الفتح الفعلية، أقصى تزامن على دومين واحد، وزمن
+الاستجابة للروابط العادية وقت الحملة.
+
+طريقة الاستخدام:
+    python tools/bench_link_fetcher.py --campaign 5000 --others 200 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from link_fetcher import LinkFetcher  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+class FakeSite:
+    """فتح رابط وهمي مع عدّ الطلبات والتزامن لكل دومين"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.fetches = 0
+        self.active = Counter()
+        self.peak = Counter()
+
+    async def fetch(self, url):
+        host = urlparse(url).hostname
+        self.fetches += 1
+        self.active[host] += 1
+        self.peak[host] = max(self.peak[host], self.active[host])
+        await asyncio.sleep(self.latency)
+        self.active[host] -= 1
+        return {"url": url, "risk_score": 0, "flags": []}
+
+
+async def run_case(name, campaign, others, latency, workers=None, per_host=None):
+    site = FakeSite(latency)
+    if workers:
+        fetcher = LinkFetcher(site.fetch, workers=workers, max_queue=campaign + others, per_host=per_host)
+        fetch = fetcher.fetch
+    else:
+        fetcher = None
+        fetch = site.fetch
+
+    other_latencies = []
+
+    async def one(url, record):
+        start = time.perf_counter()
+        await fetch(url)
+        if record:
+            other_latencies.append((time.perf_counter() - start) * 1000)
+
+    jobs = [one("https://evil-campaign.xyz/login", False) for _ in range(campaign)]
+    jobs += [one(f"https://site{i % 20}.example/page{i}", True) for i in range(others)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*jobs)
+    wall = time.perf_counter() - start
+
+    print(f"{name:<28} fetches={site.fetches:>5}  peak/host={max(site.peak.values()):>5}  "
+          f"others p50={percentile(other_latencies, 50):7.1f}ms p95={percentile(other_latencies, 95):7.1f}ms  "
+          f"wall={wall:5.2f}s")
+    if fetcher:
+        stats = fetcher.get_stats()
+        print(f"{'':<28} deduplicated={stats['deduplicated']}  avg_queue_wait={stats['avg_queue_wait_ms']}ms")
+        await fetcher.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", type=int, default=5000, help="طلبات على رابط الحملة")
+    parser.add_argument("--others", type=int, default=200, help="روابط عادية (20 دومين)")
+    parser.add_argument("--latency", type=float, default=0.2, help="زمن فتح الرابط (ثواني)")
+    args = parser.parse_args()
+
+    await run_case("direct", args.campaign, args.others, args.latency)
+    for workers, per_host in [(16, 2), (32, 4)]:
+        await run_case(f"pool workers={workers} host={per_host}", args.campaign, args.others,
+                       args.latency, workers, per_host)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
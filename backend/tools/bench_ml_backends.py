@@ -0,0 +1,139 @@
+"""
+📈 مقارنة أنواع نموذج ML (backends)
+===================================
+
+لكل backend في ml_backends.py:
+1. تدريب على نفس تقسيم 80/20 (TrainingPipeline) وحساب الدقة على جزء الاختبار
+2. حفظ النموذج في مجلد مؤقت وقياس حجمه على القرص
+3. تحميله في عملية جديدة (قياس RSS نظيف) وقياس زمن الاستدلال:
+   إيميل واحد (p50/p95) ودفعة من 32 (لكل إيميل)
+
+طريقة الاستخدام:
+    python tools/bench_ml_backends.py
+    python tools/bench_ml_backends.py --backends forest linear --repeat 500
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_backends import BACKENDS  # noqa: E402
+
+SAMPLES = [
+    "تم إيقاف بطاقتك، حدث بياناتك فوراً عبر الرابط: bank.xyz",
+    "مبروك! ربحت مليون ريال، أرسل بياناتك",
+    "تذكير: اجتماع الفريق غداً الساعة 10",
+    "Your account suspended. Click here: verify.top",
+    "انا من بنك التنمية ارسلي رقم ال otp",
+]
+
+
+def rss_mb() -> float:
+    """ذاكرة العملية الحالية (VmRSS)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def measure(model_dir: str, backend: str, repeat: int) -> dict:
+    """يتنفذ في عملية جديدة: تحميل النموذج وقياس الذاكرة والزمن"""
+    from ml_model import FraudDetectionModel
+
+    before = rss_mb()
+    model = FraudDetectionModel(backend)
+    start = time.perf_counter()
+    model.load(os.path.join(model_dir, "fraud_model.pkl"), os.path.join(model_dir, "vectorizer.pkl"))
+    load_ms = (time.perf_counter() - start) * 1000
+    model.predict_batch(SAMPLES)  # تسخين
+
+    single = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        model.predict(SAMPLES[i % len(SAMPLES)])
+        single.append((time.perf_counter() - start) * 1000)
+
+    batch = [SAMPLES[i % len(SAMPLES)] for i in range(32)]
+    rounds = max(repeat // 32, 1)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        model.predict_batch(batch)
+    batch_us = (time.perf_counter() - start) / (rounds * len(batch)) * 1e6
+
+    return {
+        "load_ms": load_ms,
+        "p50_ms": percentile(single, 50),
+        "p95_ms": percentile(single, 95),
+        "batch_us": batch_us,
+        "rss_mb": rss_mb(),
+        "model_rss_mb": rss_mb() - before
+    }
+
+
+def train_and_save(backend: str, data: str, model_dir: str) -> dict:
+    from training import TrainingPipeline
+
+    model, results = TrainingPipeline(backend=backend).run(data)
+    os.makedirs(model_dir, exist_ok=True)
+    model_path = os.path.join(model_dir, "fraud_model.pkl")
+    vectorizer_path = os.path.join(model_dir, "vectorizer.pkl")
+    model.save(model_path, vectorizer_path)
+    return {
+        "accuracy": results["accuracy"],
+        "fit_s": results["timings"].get("fit", 0.0),
+        "size_kb": (os.path.getsize(model_path) + os.path.getsize(vectorizer_path)) / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--data", default="data/training_data.csv")
+    parser.add_argument("--repeat", type=int, default=300)
+    parser.add_argument("--measure", help=argparse.SUPPRESS)  # داخلي: مجلد النموذج
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.backends[0], args.repeat)))
+        return
+
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.backends:
+            print(f"\n🧠 تدريب {name}...")
+            model_dir = os.path.join(tmp, name)
+            rows[name] = train_and_save(name, args.data, model_dir)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--measure", model_dir,
+                 "--backends", name, "--repeat", str(args.repeat)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            rows[name].update(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"\n{'backend':<14}{'accuracy':>9}{'fit s':>8}{'size KB':>9}{'load ms':>9}"
+          f"{'p50 ms':>8}{'p95 ms':>8}{'batch µs':>10}{'RSS MB':>8}{'model MB':>10}")
+    for name, r in rows.items():
+        print(f"{name:<14}{r['accuracy']:>9.3f}{r['fit_s']:>8.2f}{r['size_kb']:>9.0f}{r['load_ms']:>9.1f}"
+              f"{r['p50_ms']:>8.2f}{r['p95_ms']:>8.2f}{r['batch_us']:>10.0f}{r['rss_mb']:>8.0f}"
+              f"{r['model_rss_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+📈 قياس تجميع طلبات ML في دفعات
+================================
+
+يقارن الاستدعاء المباشر (صف واحد لكل طلب) مع MicroBatcher بإعدادات
+مختلفة للـ window والـ max_batch، ويعرض الإنتاجية وزمن الاستجابة.
+
+طريقة الاستخدام (بعد python train.py):
+    python tools/bench_ml_batching.py --requests 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_model import FraudDetectionModel  # noqa: E402
+from ml_batcher import MicroBatcher  # noqa: E402
+
+SAMPLES = [
+    "تم إيقاف بطاقتك، حدث بياناتك فوراً عبر الرابط: bank.xyz",
+    "مبروك! ربحت مليون ريال، أرسل بياناتك",
+    "تذكير: اجتماع الفريق غداً الساعة 10",
+    "Your account suspended. Click here: verify.top",
+    "انا من بنك التنمية ارسلي رقم ال otp",
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+async def run_case(model, requests, concurrency, window_ms, max_batch, enabled=True):
+    batcher = MicroBatcher(model, window_ms=window_ms, max_batch=max_batch, enabled=enabled)
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with gate:
+            start = time.perf_counter()
+            await batcher.predict(SAMPLES[i % len(SAMPLES)] + f" #{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    total = time.perf_counter() - start
+    stats = batcher.get_stats()
+    return {
+        "throughput": requests / total,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "avg_batch": stats["avg_batch_size"] if enabled else 1.0
+    }
+
+
+async def main(args):
+    model = FraudDetectionModel()
+    if not model.load():
+        sys.exit("درّب النموذج أولاً: python train.py")
+
+    cases = [("بدون دفعات", 0, 1, False)]
+    for window in args.windows:
+        for size in args.sizes:
+            cases.append((f"window={window}ms max={size}", window, size, True))
+
+    print(f"\nالطلبات: {args.requests}  التزامن: {args.concurrency}\n")
+    print(f"{'الإعداد':28} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'avg batch':>10}")
+    for name, window, size, enabled in cases:
+        r = await run_case(model, args.requests, args.concurrency, window, size, enabled)
+        print(f"{name:28} {r['throughput']:9.0f} {r['p50']:9.1f} {r['p95']:9.1f} {r['avg_batch']:10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--windows", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 128])
+    asyncio.run(main(parser.parse_args()))
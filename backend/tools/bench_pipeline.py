@@ -0,0 +1,129 @@
+"""
+📈 قياس توفير خط التحليل (scoring_pipeline)
+==========================================
+
+لكل رسالة في خليط واقعي: القواعد + ML + شكل الروابط (حقيقية، من main.py)،
+ثم قرار المراحل الغالية بكل سياسة (off / band / sequential):
+- متوسط التكلفة المعلنة لكل رسالة (PIPELINE_STAGE_COSTS) والتوفير مقارنة بـ off
+- نسبة الرسائل اللي تخطت AI / فتح الروابط
+- تطابق مستوى الخطر مع off (لازم 100%: التخطي فقط إذا المستوى ما يتغير)
+- زمن القرار نفسه لكل رسالة
+
+بدون إنترنت: نتيجة AI من tools/fake_llm_server.py (نفس النص = نفس النتيجة)،
+وفتح الروابط = نتيجة شكلها (الصفحات ما تنفتح).
+
+الخليط الافتراضي: data/training_data.csv، ونسبة منها (--url-share) يُضاف لها
+رابط (مشبوه للتصيد، معروف للعادية) مثل الإيميل الحقيقي. أو طلبات مسجلة
+(AMAN_CAPTURE_TEXT=redact أو full) بـ --capture.
+
+طريقة الاستخدام:
+    python tools/bench_pipeline.py
+    python tools/bench_pipeline.py --url-share 0.5
+    python tools/bench_pipeline.py --capture "data/capture/traffic*.jsonl*"
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_startup import BACKEND_DIR  # noqa: E402
+from fake_llm_server import fake_score  # noqa: E402
+
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+import main  # noqa: E402
+from pipeline import POLICIES, ScoringPipeline, fuse  # noqa: E402
+from response_profile import risk_level  # noqa: E402
+from thread_segments import segment_message  # noqa: E402
+
+PHISHING_URLS = ["http://alrajhi-verify.xyz/login", "https://bit.ly/3xYz9", "http://secure-update.top/account",
+                 "https://paypa1-support.com/verify", "http://192.168.4.20/bank"]
+LEGIT_URLS = ["https://docs.google.com/document/d/1abc", "https://www.microsoft.com/teams",
+              "https://github.com/org/repo/pull/12", "https://zoom.us/j/123456"]
+
+
+def training_mix(url_share: float, seed: int = 7):
+    rng = random.Random(seed)
+    with open(os.path.join(BACKEND_DIR, "data", "training_data.csv"), encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    texts = []
+    for row in rows:
+        text = row["text"]
+        if rng.random() < url_share:
+            text += " " + rng.choice(PHISHING_URLS if row["label"] == "1" else LEGIT_URLS)
+        texts.append(text)
+    return texts
+
+
+def capture_mix(pattern: str):
+    from replay_traffic import load_capture, rebuild_text
+    return [rebuild_text(record) for record in load_capture(pattern, None) if "text" in record]
+
+
+async def evaluate(texts, policies):
+    totals = {p: {"cost": 0, "skip_ai": 0, "skip_deep": 0, "same_band": 0, "decide_us": 0.0} for p in policies}
+    pipelines = {p: ScoringPipeline(p) for p in policies}
+
+    for text in texts:
+        segments = segment_message(text)
+        scores = await main.score_segments(segments)
+        link_scan = main.scan_segments(segments)
+        has_urls = link_scan["total_urls"] > 0
+        known = main.fusion_values(scores, None, link_scan["overall_risk"])
+
+        async def ai_stage():
+            return fake_score(text)
+
+        async def deep_stage():
+            return link_scan  # بدون إنترنت: نتيجة فتح الرابط = نتيجة شكله
+
+        runners = {"ai": ai_stage}
+        if has_urls:
+            runners["link_deep"] = deep_stage
+
+        bands = {}
+        for policy, pipeline in pipelines.items():
+            start = time.perf_counter()
+            run = await pipeline.run(known, link_scan["total_urls"], runners)
+            totals[policy]["decide_us"] += (time.perf_counter() - start) * 1e6
+            info = run["pipeline"]
+            values = {**known, "ai": run["results"].get("ai")}
+            bands[policy] = risk_level(fuse(values))
+            totals[policy]["cost"] += info["cost"]
+            totals[policy]["skip_ai"] += "ai" in info["skipped"]
+            totals[policy]["skip_deep"] += "link_deep" in info["skipped"]
+        for policy in policies:
+            totals[policy]["same_band"] += bands[policy] == bands["off"]
+    return totals
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url-share", type=float, default=0.35, help="نسبة الرسائل اللي يُضاف لها رابط")
+    parser.add_argument("--capture", default=None, help="طلبات مسجلة (glob) بدل بيانات التدريب")
+    args = parser.parse_args()
+
+    main.prepare_serving()
+    texts = capture_mix(args.capture) if args.capture else training_mix(args.url_share)
+    with_urls = sum(1 for t in texts if "http" in t)
+    print(f"\n📬 {len(texts)} رسالة ({with_urls} فيها روابط)")
+
+    totals = asyncio.run(evaluate(texts, POLICIES))
+    base = totals["off"]["cost"] / len(texts)
+    print(f"\n{'policy':<12}{'cost/msg':>10}{'saved':>8}{'skip AI':>9}{'skip links':>12}{'same band':>11}"
+          f"{'decide µs':>11}")
+    for policy in POLICIES:
+        t = totals[policy]
+        cost = t["cost"] / len(texts)
+        print(f"{policy:<12}{cost:>10.1f}{1 - cost / base if base else 0:>8.1%}{t['skip_ai'] / len(texts):>9.1%}"
+              f"{t['skip_deep'] / max(with_urls, 1):>12.1%}{t['same_band'] / len(texts):>11.1%}"
+              f"{t['decide_us'] / len(texts):>11.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
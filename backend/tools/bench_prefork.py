@@ -0,0 +1,157 @@
+"""
+📈 قياس التوسع مع عدد العمليات (prefork)
+========================================
+
+يشغّل السيرفر (python main.py --workers N) لكل قيمة N، ويرسل حمل
+/analyze متزامن (نص بدون روابط: قواعد + ML فقط، يعني CPU) لمدة ثابتة:
+- الإنتاجية (طلب/ثانية) والتسارع مقارنة بعامل واحد
+- زمن الاستجابة p50 / p95
+- الذاكرة لكل عامل: RSS و PSS (الـ PSS يقسم الصفحات المشتركة على
+  العمليات، فالفرق بينهم = صفحات النموذج المشتركة copy-on-write)
+
+السيرفر يشتغل في مجلد مؤقت (نسخة من data و models).
+ملاحظة: مولّد الحمل على نفس الجهاز ويستهلك جزء من المعالج.
+
+طريقة الاستخدام:
+    python tools/bench_prefork.py --workers 1 2 4 --duration 10 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_startup import BACKEND_DIR, child_pids, env_for, free_port, make_sandbox, rss_mb  # noqa: E402
+
+SAMPLES = [
+    "تم إيقاف بطاقتك، حدث بياناتك فوراً وارسل رمز التحقق",
+    "مبروك! ربحت مليون ريال، أرسل بياناتك لاستلام الجائزة",
+    "تذكير: اجتماع الفريق غداً الساعة 10 في القاعة الرئيسية",
+    "Your account has been suspended, reply with your password",
+]
+
+
+def pss_mb(pid: int) -> float:
+    """الذاكرة بعد قسمة الصفحات المشتركة على العمليات"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)] if values else 0.0
+
+
+async def load(url: str, duration: float, concurrency: int) -> dict:
+    latencies = []
+    errors = rejected = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def user(i):
+            nonlocal errors, rejected
+            n = i
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    # هوية عميل مختلفة لكل طلب: نقيس المعالج مو حد الطلبات لكل عميل
+                    response = await client.post(url + "/analyze?mode=full&profile=compact",
+                                                 json={"text": SAMPLES[n % len(SAMPLES)] + f" #{n}"},
+                                                 headers={"x-client-id": f"bench-{n}"})
+                    if response.status_code == 200:
+                        latencies.append((time.perf_counter() - start) * 1000)
+                    elif response.status_code == 429:
+                        rejected += 1
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                n += concurrency
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "rejected": rejected,
+        "errors": errors
+    }
+
+
+def run_case(sandbox: str, workers: int, duration: float, concurrency: int) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "main.py"), "--workers", str(workers), "--port", str(port)],
+        cwd=sandbox, env={**env_for(sandbox), "AMAN_TRUSTED_PROXIES": "127.0.0.1/32"},  # X-Client-Id لكل عميل
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.perf_counter() + 120
+        while time.perf_counter() < deadline:
+            try:
+                if httpx.get(url + "/ready").status_code == 200 and \
+                        (workers == 1 or len(child_pids(server.pid)) >= workers):
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        time.sleep(1)
+
+        asyncio.run(load(url, 1.0, concurrency))  # تسخين
+        result = asyncio.run(load(url, duration, concurrency))
+
+        pids = child_pids(server.pid) if workers > 1 else [server.pid]
+        result["rss"] = [rss_mb(pid) for pid in pids]
+        result["pss"] = [pss_mb(pid) for pid in pids]
+        return result
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=90)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"🖥️ عدد الأنوية: {os.cpu_count()}")
+    sandbox = make_sandbox()
+    try:
+        base = None
+        print(f"\n{'workers':<9}{'req/s':>8}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}{'429':>6}{'errors':>8}"
+              f"  RSS / PSS MB per worker")
+        for workers in args.workers:
+            r = run_case(sandbox, workers, args.duration, args.concurrency)
+            base = base or r["rps"]
+            memory = ", ".join(f"{rss:.0f}/{pss:.0f}" for rss, pss in zip(r["rss"], r["pss"]))
+            print(f"{workers:<9}{r['rps']:>8.0f}{r['rps'] / base:>9.2f}{r['p50']:>9.1f}{r['p95']:>9.1f}"
+                  f"{r['rejected']:>6}{r['errors']:>8}  {memory}")
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+📈 قياس حجم ووقت ترميز ردود /analyze
+=====================================
+
+يبني أحكام حقيقية (قواعد + شكل الروابط، بدون شبكة) ويقارن لكل شكل رد:
+- الحجم: بدون ضغط / gzip
+- وقت الترميز: طريقة FastAPI الافتراضية (jsonable_encoder + JSONResponse)
+  مقابل FastJSONResponse (orjson إذا موجود)
+
+طريقة الاستخدام:
+    python tools/bench_responses.py --repeat 2000
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from rules import calculate_rule_score, detect_threat_type, extract_flags, get_actions, get_advice  # noqa: E402
+from link_scanner import scan_all_urls  # noqa: E402
+from response_profile import FastJSONResponse, ResponseShape, orjson  # noqa: E402
+from config import GZIP_LEVEL  # noqa: E402
+
+SAMPLES = [
+    "انا من بنك التنمية ارسلي رقم ال otp فوراً قبل إيقاف حسابك: http://bit.ly/abc http://alrajhi-verify.xyz/login",
+    "مبروك! ربحت جائزة مليون ريال، حول رسوم الاستلام الآن https://winner-prize.top/claim",
+    "تذكير: اجتماع الفريق غداً الساعة 10 في القاعة الرئيسية",
+]
+
+SHAPES = {
+    "full": ResponseShape(),
+    "compact": ResponseShape("compact"),
+    "fields=risk_score,threat": ResponseShape("compact", ["risk_score", "threat"]),
+}
+
+
+def make_verdict(text):
+    """حكم بنفس بنية build_verdict في main.py (بدون ML و AI)"""
+    link_scan = scan_all_urls(text)
+    score = max(calculate_rule_score(text), link_scan["overall_risk"])
+    flags = extract_flags(text)
+    return {
+        "risk_score": score,
+        "threat_type": detect_threat_type(text),
+        "flags": flags,
+        "actions": get_actions(score, flags),
+        "advice": get_advice(score, text),
+        "links": {
+            "total": link_scan["total_urls"],
+            "dangerous": link_scan["dangerous_urls"],
+            "summary": link_scan.get("summary", ""),
+            "details": [{
+                "url": u["url"],
+                "domain": u["domain"],
+                "risk_score": u["risk_score"],
+                "verdict": u.get("verdict", ""),
+                "content_summary": u.get("content_summary", ""),
+                "arabic_description": u.get("arabic_description", ""),
+                "fields_detected": u.get("fields_detected", []),
+                "page_title": u.get("page_title")
+            } for u in link_scan["urls"]]
+        },
+        "analysis_details": {"rule_score": score, "ml_score": 0, "ai_score": None, "ai_used": False,
+                             "link_risk": link_scan["overall_risk"]},
+        "model_version": None
+    }
+
+
+def time_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    verdicts = [make_verdict(t) for t in SAMPLES]
+    print(f"orjson: {'✅' if orjson else '❌ (json العادي)'}")
+    print(f"{'shape':<28}{'bytes':>8}{'gzip':>8}{'default µs':>12}{'fast µs':>10}")
+
+    for name, shape in SHAPES.items():
+        shaped = [shape.apply(v) for v in verdicts]
+        raw = sum(len(FastJSONResponse(s).body) for s in shaped) / len(shaped)
+        packed = sum(len(gzip.compress(FastJSONResponse(s).body, GZIP_LEVEL)) for s in shaped) / len(shaped)
+        default_us = time_us(lambda: [JSONResponse(jsonable_encoder(shape.apply(v))) for v in verdicts],
+                             args.repeat) / len(verdicts)
+        fast_us = time_us(lambda: [shape.respond(v) for v in verdicts], args.repeat) / len(verdicts)
+        print(f"{name:<28}{raw:>8.0f}{packed:>8.0f}{default_us:>12.1f}{fast_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+📈 قياس بدء تشغيل السيرفر
+=========================
+
+1. وقت استيراد main.py في عملية جديدة (ومقارنته باستيراد training.py)
+   + هل انحملت أدوات التدريب في السيرفر
+2. تشغيل السيرفر (uvicorn) وقياس الوقت حتى أول /analyze ناجح،
+   وزمن أول طلب مقابل الطلبات بعده (أثر التسخين)
+3. الذاكرة (RSS) لكل عملية worker
+
+السيرفر يشتغل في مجلد مؤقت (نسخة من data و models) حتى الطلبات
+ما تضيف إيميلات لبيانات التعلم الحقيقية.
+
+طريقة الاستخدام:
+    python tools/bench_startup.py
+    python tools/bench_startup.py --workers 2 --runs 3
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_s": elapsed, "training_loaded": "training" in sys.modules}}))
+"""
+
+SAMPLE = {"text": "انا من بنك التنمية ارسلي رقم ال otp فوراً قبل إيقاف حسابك"}
+
+
+def make_sandbox() -> str:
+    """مجلد تشغيل مؤقت: نسخة من data و models (بدون كاش التدريب)"""
+    sandbox = tempfile.mkdtemp(prefix="aman-startup-")
+    shutil.copytree(os.path.join(BACKEND_DIR, "data"), os.path.join(sandbox, "data"))
+    shutil.copytree(os.path.join(BACKEND_DIR, "models"), os.path.join(sandbox, "models"),
+                    ignore=shutil.ignore_patterns("feature_cache"))
+    return sandbox
+
+
+def env_for(sandbox: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def import_time(module: str, sandbox: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+                            cwd=sandbox, env=env_for(sandbox), capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def child_pids(pid: int) -> list:
+    """العمليات الفرعية المباشرة (workers الخاصة بـ uvicorn)"""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            if int(fields[1]) == pid:
+                children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+def run_server(sandbox: str, workers: int, timeout: float) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=sandbox, env=env_for(sandbox), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(timeout=10) as client:
+            # أول /analyze ناجح (السيرفر يبدأ الاستماع بعد التحميل والتسخين)
+            first_ok = None
+            while time.perf_counter() - start < timeout:
+                try:
+                    t = time.perf_counter()
+                    response = client.post(url + "/analyze?mode=fast", json=SAMPLE)
+                    if response.status_code == 200:
+                        first_ok = time.perf_counter() - start
+                        first_ms = (time.perf_counter() - t) * 1000
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+            if first_ok is None:
+                raise RuntimeError("السيرفر ما استجاب خلال المهلة")
+
+            later = []
+            for _ in range(20):
+                t = time.perf_counter()
+                client.post(url + "/analyze?mode=fast", json=SAMPLE)
+                later.append((time.perf_counter() - t) * 1000)
+            ready = client.get(url + "/ready").json()
+
+        pids = child_pids(server.pid) if workers > 1 else [server.pid]
+        return {
+            "first_analyze_s": first_ok,
+            "first_ms": first_ms,
+            "next_ms": sorted(later)[len(later) // 2],
+            "warm_up_ms": ready.get("warm_up_ms"),
+            "startup_ms": ready.get("startup_ms"),
+            "rss_mb": [rss_mb(pid) for pid in pids]
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    sandbox = make_sandbox()
+    try:
+        serving = import_time("main", sandbox)
+        training = import_time("training", sandbox)
+        print(f"📦 استيراد main.py: {serving['import_s']:.3f}s "
+              f"(أدوات التدريب محملة: {'نعم ⚠️' if serving['training_loaded'] else 'لا ✅'})")
+        print(f"📦 استيراد training.py (للمقارنة): {training['import_s']:.3f}s")
+
+        print(f"\n{'run':<5}{'first /analyze s':>18}{'first ms':>10}{'next ms':>10}"
+              f"{'warm-up ms':>12}{'startup ms':>12}  RSS MB / worker")
+        for run in range(1, args.runs + 1):
+            r = run_server(sandbox, args.workers, args.timeout)
+            rss = ", ".join(f"{v:.0f}" for v in r["rss_mb"])
+            print(f"{run:<5}{r['first_analyze_s']:>18.2f}{r['first_ms']:>10.1f}{r['next_ms']:>10.1f}"
+                  f"{r['warm_up_ms'] or 0:>12.1f}{r['startup_ms'] or 0:>12.1f}  {rss}")
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
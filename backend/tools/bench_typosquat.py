@@ -0,0 +1,50 @@
+"""
+📈 قياس فهرس كشف الانتحال بالتشابه
+===================================
+
+يضيف آلاف البراندات العشوائية فوق data/brands.csv ويقيس زمن البحث.
+
+طريقة الاستخدام:
+    python tools/bench_typosquat.py --sizes 100 1000 5000
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typosquat import TyposquatIndex  # noqa: E402
+
+HOSTS = ["rnicrosoft-login.com", "xn--pple-43d.com", "paypa1-secure.xyz", "mail.google.com",
+         "alrajhl-bank.com", "weather-news-today.example.co.uk", "abshar.sa", "random-shop.net"]
+
+
+def main(args):
+    random.seed(7)
+    print(f"{'البراندات':>10} {'µs/بحث':>10} {'بناء s':>8} {'مفاتيح':>10}")
+    for size in args.sizes:
+        start = time.perf_counter()
+        index = TyposquatIndex.from_file()
+        for i in range(size):
+            label = "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 12)))
+            index.add(f"brand{i}", label, [f"{label}.com"])
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for host in HOSTS:
+                index.check(host)
+        per_lookup = (time.perf_counter() - start) / (args.rounds * len(HOSTS)) * 1e6
+        print(f"{size:>10} {per_lookup:10.1f} {build_s:8.2f} {index.get_stats()['delete_keys']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--rounds", type=int, default=200)
+    main(parser.parse_args())
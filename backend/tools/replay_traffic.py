@@ -0,0 +1,299 @@
+"""
+🔁 إعادة الطلبات المسجلة
+=========================
+
+يقرأ ملفات التسجيل (AMAN_CAPTURE=1، traffic_capture.py) ويعيد إرسالها
+بنفس ترتيب ونمط الوصول (الفروق بين الطلبات ÷ السرعة)، بسرعة 1× و 5× و 20×:
+- زمن الاستجابة p50 / p95 / p99، ونسبة الأخطاء و 429 والردود المخففة
+- تأخر الإرسال عن الموعد (إذا كبر: المولّد نفسه صار عنق الزجاجة)
+- نسب إصابة الكاش من فرق /metrics قبل وبعد: المقاطع المقتبسة، الـ AI،
+  التوجيهات، وفتح الروابط (المكرر)
+
+النص حسب وضع التسجيل:
+- redact / full: النص المسجل (والجزء المقطوع من الرسائل الضخمة يكمل بنص بديل)
+- hash: نص بديل ثابت لكل مقطع (نفس الطول وعدد الروابط والدومينات،
+  والمقتبس بـ "On ... wrote:" و >)، فنفس المقطع المقتبس يرجع بنفس النص
+  ويصيب الكاش مثل الأصل. المحتوى نفسه ما يتكرر فنتائج القواعد تختلف
+
+الروابط تُفتح على مواقع بديلة محلية (tools/fake_link_server.py) بدل
+الإنترنت: السيرفر يشتغل مع HTTP_PROXY عليها، وروابط https تتحول لـ http.
+
+افتراضياً لكل سرعة سيرفر جديد في مجلد مؤقت (كاش فاضي، فالسرعات تتقارن)،
+أو --target لسيرفر شغال (لازم يكون شغال مع HTTP_PROXY على المواقع البديلة).
+
+طريقة الاستخدام:
+    python tools/replay_traffic.py --speed 1 5 20
+    python tools/replay_traffic.py --capture "data/capture/traffic*.jsonl*" --limit 2000 --workers 2
+    python tools/replay_traffic.py --target http://127.0.0.1:8000 --speed 5
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_startup import BACKEND_DIR, env_for, free_port, make_sandbox  # noqa: E402
+from bench_prefork import percentile  # noqa: E402
+import fake_link_server  # noqa: E402
+
+sys.path.insert(0, BACKEND_DIR)
+from config import ANALYSIS_BUDGET_CHARS  # noqa: E402
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+
+# كلمات النص البديل (وضع hash)
+FILLER_WORDS = ("الاجتماع التقرير المشروع الفريق الموعد الملف المراجعة التحديث الأسبوع الخطة الميزانية "
+                "العميل الطلب الشحنة الفاتورة المرفق شكراً تحياتي بخصوص نرجو التأكيد "
+                "meeting report update team schedule invoice review attached regards please thanks").split()
+
+
+# ==================== قراءة التسجيل ====================
+def load_capture(pattern: str, limit: Optional[int]) -> List[Dict]:
+    """كل الطلبات من الملفات (مع المدورة .1 .2 ...) مرتبة بوقت الوصول"""
+    records = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    records.sort(key=lambda r: r["ts"])
+    return records[:limit] if limit else records
+
+
+# ==================== إعادة بناء النص ====================
+def synthetic_host(host: str) -> str:
+    """الدومين كما هو (redact) أو دومين بديل ثابت لكل hash (وضع hash)"""
+    return host if "." in host else f"h{host[:10]}.example.com"
+
+
+def filler(seed: str, chars: int) -> str:
+    rng = random.Random(seed)
+    words, size = [], 0
+    while size < chars:
+        word = rng.choice(FILLER_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    # سطر جديد كل ~12 كلمة (مثل الإيميل)
+    return "\n".join(" ".join(words[i:i + 12]) for i in range(0, len(words), 12))[:max(chars, 1)]
+
+
+def synthetic_segment(segment: Dict, hosts: List[str]) -> str:
+    """نص بديل ثابت للمقطع: نفس الطول تقريباً وعدد الروابط"""
+    rng = random.Random(segment["hash"])
+    urls = [f"http://{synthetic_host(rng.choice(hosts)) if hosts else 'example.com'}/p/{segment['hash'][:6]}{i}"
+            for i in range(segment["urls"])]
+    body = filler(segment["hash"], max(segment["chars"] - sum(len(u) + 1 for u in urls), 20))
+    lines = body.split("\n")
+    for i, url in enumerate(urls):
+        lines.insert(rng.randint(0, len(lines)), url if i % 2 else f"الرابط: {url}")
+    return "\n".join(lines)
+
+
+def rebuild_text(record: Dict) -> str:
+    """نص الطلب للإعادة"""
+    if "text" in record:
+        text = URL_PATTERN.sub(lambda m: "http://" + m.group(0).split("://", 1)[1], record["text"])
+        if record.get("text_truncated"):
+            text += "\n" + filler(record["fingerprint"], record["chars"] - len(text))
+        return text
+
+    hosts = record.get("hosts", [])
+    segments = record["segments"]
+    if record["chars"] > ANALYSIS_BUDGET_CHARS:
+        # رسالة ضخمة (تحللت بنوافذ): نص بالطول الكامل والروابط موزعة فيه
+        urls = sum(s["urls"] for s in segments)
+        return synthetic_segment({"hash": record["fingerprint"], "chars": record["chars"], "urls": urls}, hosts)
+
+    parts = []
+    for i, segment in enumerate(segments):
+        body = synthetic_segment(segment, hosts)
+        if segment["quoted"]:
+            marker = f"On Mon, {i} Jan 2024 at 10:{i % 60:02d}, sender{segment['hash'][:4]}@example.com wrote:"
+            body = marker + "\n" + "\n".join("> " + line for line in body.split("\n"))
+        parts.append(body)
+    return "\n\n".join(parts)
+
+
+# ==================== الإرسال ====================
+async def replay(url: str, records: List[Dict], texts: List[str], speed: float, timeout: float) -> Dict:
+    latencies, lateness = [], []
+    counts = {"ok": 0, "rejected": 0, "errors": 0, "degraded": 0}
+    base = records[0]["ts"]
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        async def send(record: Dict, text: str, due: float):
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+            lateness.append((time.perf_counter() - due) * 1000)
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/analyze?mode={record['mode']}&profile=compact",
+                                             json={"text": text},
+                                             headers={"x-client-id": f"replay-{record['client']}"})
+            except httpx.HTTPError:
+                counts["errors"] += 1
+                return
+            if response.status_code == 200:
+                counts["ok"] += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+                counts["degraded"] += bool(response.json().get("degraded"))
+            elif response.status_code == 429:
+                counts["rejected"] += 1
+            else:
+                counts["errors"] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(record, text, start + (record["ts"] - base) / speed)
+                               for record, text in zip(records, texts)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "sent": len(records),
+        "rps": len(records) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "late_p95": percentile(lateness, 95),
+        **counts
+    }
+
+
+# ==================== نسب الكاش ====================
+def fetch_metrics(url: str) -> Dict:
+    snapshot = httpx.get(f"{url}/metrics", timeout=30).json()
+    return snapshot.get("total", snapshot)
+
+
+def _delta(before: Dict, after: Dict, *path) -> int:
+    def get(snapshot):
+        for key in path:
+            snapshot = snapshot.get(key, {}) if isinstance(snapshot, dict) else {}
+        return snapshot if isinstance(snapshot, (int, float)) else 0
+    return get(after) - get(before)
+
+
+def _rate(hits: int, total: int) -> str:
+    return f"{hits / total:.0%}" if total > 0 else "-"
+
+
+def hit_rates(before: Dict, after: Dict) -> Dict[str, str]:
+    rates = {"segments": _rate(_delta(before, after, "threads", "segments_reused"),
+                               _delta(before, after, "threads", "segments"))}
+    for stage in ("links_fast", "links_deep"):
+        hits = _delta(before, after, "threads", "stages", stage, "hits")
+        rates[stage] = _rate(hits, hits + _delta(before, after, "threads", "stages", stage, "misses"))
+    ai_hits = _delta(before, after, "ai", "cache_hits")
+    rates["ai"] = _rate(ai_hits, ai_hits + _delta(before, after, "ai", "calls"))
+    redirect_hits = _delta(before, after, "redirects", "cache_hits")
+    rates["redirects"] = _rate(redirect_hits, redirect_hits + _delta(before, after, "redirects", "hops"))
+    rates["fetch_dedup"] = _rate(_delta(before, after, "link_fetch", "deduplicated"),
+                                 _delta(before, after, "link_fetch", "requests"))
+    return rates
+
+
+# ==================== تشغيل ====================
+def start_link_server(port: int, latency: float):
+    """المواقع البديلة في thread داخل نفس العملية"""
+    fake_link_server.settings.update(latency=latency, jitter=latency / 2)
+    threading.Thread(target=lambda: asyncio.run(fake_link_server.serve("127.0.0.1", port)), daemon=True).start()
+
+
+def start_server(sandbox: str, workers: int, links_port: int):
+    port = free_port()
+    env = env_for(sandbox)
+    env.pop("AMAN_CAPTURE", None)  # الإعادة نفسها ما تتسجل
+    env.update(HTTP_PROXY=f"http://127.0.0.1:{links_port}", NO_PROXY="127.0.0.1,localhost",
+               AMAN_TRUSTED_PROXIES="127.0.0.1/32")  # X-Client-Id لكل عميل مسجل
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "main.py"), "--workers", str(workers), "--port", str(port)],
+        cwd=sandbox, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + 120
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url + "/ready").status_code == 200:
+                break
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    time.sleep(1)
+    return server, url
+
+
+def stop_server(server: subprocess.Popen):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=90)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capture", default=os.path.join(BACKEND_DIR, "data", "capture", "traffic*.jsonl*"),
+                        help="ملفات التسجيل (glob)")
+    parser.add_argument("--speed", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--limit", type=int, default=None, help="أول N طلب فقط")
+    parser.add_argument("--target", default=None, help="سيرفر شغال بدل تشغيل سيرفر جديد لكل سرعة")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--links-port", type=int, default=0, help="منفذ المواقع البديلة (0 = أي منفذ فاضي)")
+    parser.add_argument("--link-latency", type=float, default=0.08)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--drain", type=float, default=2.0, help="انتظار المهام الخلفية قبل قراءة /metrics")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture, args.limit)
+    if not records:
+        print(f"❌ ما فيه طلبات مسجلة في {args.capture}")
+        return
+    texts = [rebuild_text(record) for record in records]
+    span = records[-1]["ts"] - records[0]["ts"]
+    original = [r["latency_ms"] for r in records if r["status"] == 200]
+    print(f"📼 {len(records)} طلب خلال {span:.0f}s (النص: {'مسجل' if 'text' in records[0] else 'بديل'})، "
+          f"الأصل: p50 {percentile(original, 50):.0f}ms / p95 {percentile(original, 95):.0f}ms، "
+          f"أخطاء {sum(r['status'] >= 400 for r in records)}")
+
+    links_port = args.links_port or free_port()
+    start_link_server(links_port, args.link_latency)
+    sandbox = None if args.target else make_sandbox()
+
+    print(f"\n{'speed':<7}{'req/s':>7}{'p50':>8}{'p95':>8}{'p99':>8}{'err':>6}{'429':>6}{'degr':>6}{'late95':>8}"
+          f"  cache: segments / links_fast / links_deep / ai / redirects / fetch_dedup")
+    try:
+        for speed in args.speed:
+            server, url = (None, args.target) if args.target else start_server(sandbox, args.workers, links_port)
+            try:
+                before = fetch_metrics(url)
+                r = asyncio.run(replay(url, records, texts, speed, args.timeout))
+                time.sleep(args.drain)
+                rates = hit_rates(before, fetch_metrics(url))
+            finally:
+                if server is not None:
+                    stop_server(server)
+            sent = r["sent"]
+            print(f"{speed:<7g}{r['rps']:>7.1f}{r['p50']:>8.0f}{r['p95']:>8.0f}{r['p99']:>8.0f}"
+                  f"{r['errors'] / sent:>6.1%}{r['rejected'] / sent:>6.1%}{r['degraded'] / sent:>6.1%}"
+                  f"{r['late_p95']:>8.0f}  " + " / ".join(rates.values()))
+    finally:
+        if sandbox:
+            shutil.rmtree(sandbox, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+تسجيل الطلبات الحقيقية (اختياري)
+Traffic Capture
+
+الاختبارات المصطنعة ما تشبه خليط الطلبات الحقيقي (أطوال الرسائل، عدد
+الروابط، موجات الحملات). عند التفعيل (AMAN_CAPTURE=1) كل طلب تحليل
+يُسجل سطر JSON في ملف يتدور بالحجم:
+- وقت الوصول والمدة والحالة والوضع (full/fast/async)
+- شكل الرسالة: الطول، المقاطع (hash + طول + مقتبس؟ + عدد الروابط)، الدومينات
+- بصمة النص (sha256)، والعميل (hash)
+- النص نفسه حسب AMAN_CAPTURE_TEXT:
+  hash: بدون نص (البصمة والشكل فقط، والدومينات hash)
+  redact: النص مع إخفاء الإيميلات والأرقام ومسارات الروابط
+  full: النص كما هو (للبيئات الداخلية فقط)
+
+الكتابة في thread منفصل (QueueHandler/QueueListener) فما تحجز الـ event loop.
+الإعادة: python tools/replay_traffic.py
+"""
+
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from config import (
+    CAPTURE_ENABLED, CAPTURE_PATH, CAPTURE_TEXT, CAPTURE_MAX_BYTES, CAPTURE_BACKUPS, CAPTURE_SAMPLE_RATE,
+    CAPTURE_MAX_TEXT_CHARS
+)
+
+TEXT_MODES = ("hash", "redact", "full")
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+")
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+DIGITS_PATTERN = re.compile(r"\d")
+
+
+def fingerprint(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def _host(url: str) -> str:
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+def redact(text: str) -> str:
+    """إخفاء البيانات الشخصية مع الحفاظ على شكل النص (الكلمات والدومينات والأطوال)"""
+    def plain(part: str) -> str:
+        return DIGITS_PATTERN.sub("0", EMAIL_PATTERN.sub("user@redacted.invalid", part))
+
+    # الروابط: الدومين يبقى (للتحليل) والمسار يصير بصمة، والباقي بدون إيميلات وأرقام
+    parts, last = [], 0
+    for match in URL_PATTERN.finditer(text):
+        value = match.group(0)
+        parts.append(plain(text[last:match.start()]))
+        parts.append(f"{value.split('://')[0]}://{_host(value)}/{fingerprint(value)[:8]}")
+        last = match.end()
+    parts.append(plain(text[last:]))
+    return "".join(parts)
+
+
+class TrafficCapture:
+    """تسجيل كل طلب تحليل في ملف JSONL يتدور بالحجم"""
+
+    def __init__(self, enabled: bool = CAPTURE_ENABLED, path: str = CAPTURE_PATH, text_mode: str = CAPTURE_TEXT,
+                 max_bytes: int = CAPTURE_MAX_BYTES, backups: int = CAPTURE_BACKUPS,
+                 sample_rate: float = CAPTURE_SAMPLE_RATE):
+        if text_mode not in TEXT_MODES:
+            raise ValueError(f"AMAN_CAPTURE_TEXT غير معروف: {text_mode} (المتاح: {', '.join(TEXT_MODES)})")
+        self.enabled = enabled
+        self.path = path
+        self.text_mode = text_mode
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_rate = sample_rate
+        self._logger: Optional[logging.Logger] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self.stats = {"recorded": 0, "sampled_out": 0}
+
+    def start(self, suffix: str = ""):
+        """
+        فتح الملف وتشغيل thread الكتابة
+
+        Args:
+            suffix: يُضاف لاسم الملف (لكل عامل ملفه عند التشغيل بعدة عمليات)
+        """
+        if not self.enabled or self._listener is not None:
+            return
+        root, ext = os.path.splitext(self.path)
+        path = f"{root}{suffix}{ext}"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=self.max_bytes, backupCount=self.backups,
+                                                       encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records: "queue.Queue" = queue.Queue(-1)
+        self._listener = logging.handlers.QueueListener(records, handler)
+        self._listener.start()
+
+        self._logger = logging.getLogger(f"aman.capture{suffix}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.handlers = [logging.handlers.QueueHandler(records)]
+        print(f"🎥 تسجيل الطلبات مفعل: {path} (النص: {self.text_mode})")
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()  # يكتب الباقي في الطابور
+            self._listener = None
+            self._logger = None
+
+    def record(self, *, arrived: float, path: str, mode: str, client: str, text: str, segments: List[Dict],
+               status: int, latency_ms: float, degraded: bool):
+        """تسجيل طلب (بعد الرد)"""
+        if self._logger is None:
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            self.stats["sampled_out"] += 1
+            return
+
+        hosts = sorted({_host(url) for url in URL_PATTERN.findall(text)} - {""})
+        entry = {
+            "ts": round(arrived, 3),
+            "path": path,
+            "mode": mode,
+            "client": fingerprint(client),
+            "status": status,
+            "latency_ms": round(latency_ms, 1),
+            "degraded": degraded,
+            "fingerprint": fingerprint(text),
+            "chars": len(text),
+            "segments": [{
+                "hash": segment["hash"][:16],
+                "chars": segment["chars"],
+                "quoted": segment["quoted"],
+                "urls": len(URL_PATTERN.findall(segment["text"]))
+            } for segment in segments],
+            "hosts": [fingerprint(h) for h in hosts] if self.text_mode == "hash" else hosts
+        }
+        if self.text_mode != "hash":
+            # الرسائل الضخمة: أول CAPTURE_MAX_TEXT_CHARS فقط (الإعادة تكمل الطول بنص بديل)
+            kept = text[:CAPTURE_MAX_TEXT_CHARS]
+            entry["text"] = redact(kept) if self.text_mode == "redact" else kept
+            entry["text_truncated"] = len(kept) < len(text)
+
+        self._logger.info(json.dumps(entry, ensure_ascii=False))
+        self.stats["recorded"] += 1
+
+    def get_stats(self) -> Dict:
+        return {"enabled": self._logger is not None, "text_mode": self.text_mode, **self.stats}
+
+
+# instance واحد للسيرفر
+traffic_capture = TrafficCapture()
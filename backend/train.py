@@ -5,28 +5,54 @@
 هذا الملف لتدريب نموذج ML لكشف الاحتيال
 
 طريقة الاستخدام:
-    python train.py
+    python train.py                  # تقييم 5-fold + تدريب
+    python train.py --folds 0        # بدون k-fold (أسرع)
+    python train.py --search         # بحث عن أفضل إعدادات (محدود)
+    python train.py --n-jobs 4       # عدد الأنوية لتدريب الأشجار
+    python train.py --backend linear # نوع النموذج (الافتراضي ML_BACKEND في config.py)
 
 الخطوات:
 1. يقرأ بيانات التدريب من data/training_data.csv
-2. يدرب النموذج (Random Forest + TF-IDF)
-3. يحفظ النموذج في models/
-4. يعرض نتائج الدقة
+2. يقيّم النموذج بـ k-fold (كل fold في عملية منفصلة)
+3. يدرب النموذج (TF-IDF + Random Forest أو Logistic Regression) بالتوازي
+4. يحفظ النموذج في models/
+5. يعرض نتائج الدقة ووقت كل مرحلة
 """
 
-from ml_model import FraudDetectionModel
+import argparse
+
+from config import ML_BACKEND, TRAIN_CV_FOLDS, TRAIN_N_JOBS, TRAIN_SEARCH_MAX_CANDIDATES
+from ml_backends import BACKENDS
+from training import TrainingPipeline
+
 
 def main():
+    parser = argparse.ArgumentParser(description="تدريب نموذج أمان")
+    parser.add_argument("--data", default="data/training_data.csv")
+    parser.add_argument("--backend", default=ML_BACKEND, choices=list(BACKENDS), help="نوع النموذج")
+    parser.add_argument("--folds", type=int, default=TRAIN_CV_FOLDS, help="عدد folds للتقييم (0 = بدون)")
+    parser.add_argument("--search", action="store_true", help="بحث عن أفضل إعدادات")
+    parser.add_argument("--max-candidates", type=int, default=TRAIN_SEARCH_MAX_CANDIDATES)
+    parser.add_argument("--n-jobs", type=int, default=TRAIN_N_JOBS, help="أنوية تدريب الأشجار (-1 = الكل)")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("🛡️  تدريب نموذج أمان لكشف الاحتيال")
     print("=" * 60)
     
-    # إنشاء النموذج
-    model = FraudDetectionModel()
-    
     # التدريب
     print("\n📚 بدء التدريب...")
-    results = model.train("data/training_data.csv")
+    # عملية مستقلة بدون خيوط: fork آمن وأسرع
+    pipeline = TrainingPipeline(n_jobs=args.n_jobs, backend=args.backend, start_method="fork")
+    model, results = pipeline.run(args.data, folds=args.folds, search=args.search,
+                                  max_candidates=args.max_candidates)
+    
+    if results["cv"]:
+        print(f"\n🔁 نتائج {results['cv_folds']}-fold:")
+        for r in sorted(results["cv"], key=lambda r: -r["f1"]):
+            print(f"   F1 {r['f1']:.3f}  دقة {r['accuracy']:.3f}  {r['params'] or 'الإعدادات الافتراضية'}")
+        if results["best_params"]:
+            print(f"   ✅ أفضل إعدادات: {results['best_params']}")
     
     # حفظ النموذج
     print("\n💾 حفظ النموذج...")
@@ -57,10 +83,16 @@ def main():
     print("=" * 60)
     
     words = model.get_important_words(15)
+    top = max((w['importance'] for w in words), default=0) or 1
     for i, w in enumerate(words, 1):
-        bar = "█" * int(w['importance'] * 200)
+        bar = "█" * int(w['importance'] / top * 40)  # نسبة للأعلى (الأوزان تختلف حسب الـ backend)
         print(f"{i:2}. {w['word']:15} {bar}")
     
+    print("\n" + "=" * 60)
+    print("⏱️ وقت كل مرحلة:")
+    for phase, seconds in results["timings"].items():
+        print(f"   {phase:18} {seconds:.3f}s")
+    
     print("\n" + "=" * 60)
     print("✅ تم التدريب بنجاح!")
     print("   الدقة: {:.1f}%".format(results['accuracy'] * 100))
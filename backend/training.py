@@ -0,0 +1,272 @@
+"""
+خط التدريب والتقييم
+Training & Evaluation Pipeline
+
+1. أشجار Random Forest تتدرب بالتوازي على كل الأنوية (n_jobs)، ونوع
+   النموذج (backend) من ML_BACKEND أو TrainingPipeline(backend=...)
+2. تقييم k-fold: كل fold في عملية منفصلة (ProcessPoolExecutor، forkserver
+   داخل السيرفر و fork من python train.py)
+3. كاش للـ TF-IDF: المصفوفة محفوظة بمفتاح hash البيانات + التقسيم +
+   إعدادات الـ vectorizer، فالتجارب المتكررة على نفس البيانات ما تعيد التحويل
+4. بحث اختياري عن أفضل إعدادات (محدود بعدد مرشحين)، بالـ k-fold على
+   جزء التدريب فقط، وجزء الاختبار (20%) يبقى للتقييم النهائي
+5. وقت كل مرحلة (تحميل، تحويل، تقييم، بحث، تدريب) في النتائج
+
+كل fold يحسب TF-IDF من جزء التدريب فقط (بدون تسريب من جزء الاختبار).
+
+طريقة الاستخدام: python train.py --folds 5 --search
+"""
+
+import glob
+import hashlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, classification_report, f1_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from config import (
+    ML_BACKEND, TRAIN_N_JOBS, TRAIN_CV_WORKERS, TRAIN_START_METHOD, TRAIN_SEARCH_MAX_CANDIDATES,
+    FEATURE_CACHE_DIR, FEATURE_CACHE_MAX
+)
+from ml_model import FraudDetectionModel, DATA_PATH
+
+CACHE_FORMAT = 1
+
+
+# ==================== توقيت المراحل ====================
+class PhaseTimer:
+    """وقت كل مرحلة بالثواني"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(self.timings.get(name, 0.0) + time.perf_counter() - start, 3)
+
+
+# ==================== كاش التحويل ====================
+def dataset_hash(texts: List[str], labels: List[int]) -> str:
+    """hash محتوى البيانات (النصوص + التصنيفات بالترتيب)"""
+    h = hashlib.sha256()
+    for text, label in zip(texts, labels):
+        h.update(str(label).encode())
+        h.update(b"\x1f")
+        h.update(str(text).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+class FeatureCache:
+    """مصفوفات TF-IDF محفوظة على القرص (محدودة العدد، الأقدم ينحذف)"""
+
+    def __init__(self, cache_dir: str = FEATURE_CACHE_DIR, max_entries: int = FEATURE_CACHE_MAX):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0}
+
+    def key(self, data_hash: str, split: str, vectorizer) -> str:
+        params = sorted((k, repr(v)) for k, v in vectorizer.get_params().items())
+        raw = f"{CACHE_FORMAT}|{data_hash}|{split}|{params}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def featurize(self, vectorizer, key: str, X_train, X_test=None) -> Tuple:
+        """(vectorizer مدرب, X_train_vec, X_test_vec) من الكاش أو بالحساب"""
+        path = self._path(key)
+        if self.max_entries and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    cached = pickle.load(f)
+                self.stats["hits"] += 1
+                os.utime(path)  # آخر استخدام
+                return cached
+            except Exception:
+                pass  # ملف تالف: نعيد الحساب
+
+        self.stats["misses"] += 1
+        vectorizer = clone(vectorizer)
+        X_train_vec = vectorizer.fit_transform(X_train)
+        X_test_vec = vectorizer.transform(X_test) if X_test is not None else None
+        result = (vectorizer, X_train_vec, X_test_vec)
+
+        if self.max_entries:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._evict()
+        return result
+
+    def _evict(self):
+        files = sorted(glob.glob(os.path.join(self.cache_dir, "*.pkl")), key=os.path.getmtime)
+        for path in files[:max(len(files) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# ==================== التقييم في عمليات منفصلة ====================
+def _fit_and_score(args) -> Dict:
+    """تدريب وتقييم fold واحد (يتنفذ في عملية منفصلة)"""
+    estimator, params, X_train, y_train, X_test, y_test = args
+    model = clone(estimator).set_params(**params)  # n_jobs=1: التوازي على مستوى الـ folds
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    return {"accuracy": accuracy_score(y_test, y_pred), "f1": f1_score(y_test, y_pred, zero_division=0)}
+
+
+def _process_pool(workers: Optional[int], start_method: str = TRAIN_START_METHOD) -> ProcessPoolExecutor:
+    """
+    عمليات التقييم
+
+    fork أسرع (العمليات ترث المكتبات المحملة) لكنه آمن فقط في عملية بدون خيوط
+    (python train.py). داخل السيرفر (/train) فيه خيوط (executor الـ asyncio،
+    ml-batcher، shadow، httpx): الابن قد يرث قفل محجوز لحظة الـ fork ويعلق،
+    فهناك forkserver (أو spawn إذا غير متاح)
+    """
+    methods = multiprocessing.get_all_start_methods()
+    method = start_method if start_method in methods else "spawn"
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context(method))
+
+
+def search_candidates(grid: Dict[str, list], max_candidates: int, seed: int = 42) -> List[Dict]:
+    """كل التركيبات إذا كانت ضمن الحد، وإلا عينة عشوائية ثابتة منها"""
+    keys = sorted(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    if len(combos) > max_candidates:
+        combos = random.Random(seed).sample(combos, max_candidates)
+    return combos
+
+
+class TrainingPipeline:
+    """تدريب FraudDetectionModel مع تقييم k-fold وبحث الإعدادات وكاش التحويل"""
+
+    def __init__(self, n_jobs: int = TRAIN_N_JOBS, cv_workers: Optional[int] = TRAIN_CV_WORKERS,
+                 cache: Optional[FeatureCache] = None, backend: str = ML_BACKEND,
+                 start_method: str = TRAIN_START_METHOD):
+        self.backend = backend
+        self.start_method = start_method
+        self.n_jobs = n_jobs
+        self.cv_workers = cv_workers
+        self.cache = cache if cache is not None else FeatureCache()
+
+    def _cross_validate(self, model: FraudDetectionModel, X, y, data_hash: str, folds: int,
+                        candidates: List[Dict], timer: PhaseTimer) -> List[Dict]:
+        """متوسط الدقة و F1 لكل مرشح عبر k folds"""
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+        fold_data = []
+        with timer.phase("featurize"):
+            for i, (train_idx, test_idx) in enumerate(splitter.split(X, y)):
+                key = self.cache.key(data_hash, f"cv{folds}:{i}", model.vectorizer)
+                _, X_tr, X_te = self.cache.featurize(model.vectorizer, key, X.iloc[train_idx], X.iloc[test_idx])
+                fold_data.append((X_tr, y.iloc[train_idx].to_numpy(), X_te, y.iloc[test_idx].to_numpy()))
+
+        jobs = {"n_jobs": 1} if model.backend.parallel else {}
+        tasks = [(model.model, {**params, **jobs}, *fold) for params in candidates for fold in fold_data]
+        with timer.phase("cross_validation"):
+            with _process_pool(self.cv_workers, self.start_method) as pool:
+                scores = list(pool.map(_fit_and_score, tasks))
+
+        results = []
+        for c, params in enumerate(candidates):
+            chunk = scores[c * folds:(c + 1) * folds]
+            results.append({
+                "params": params,
+                "accuracy": round(sum(s["accuracy"] for s in chunk) / folds, 4),
+                "f1": round(sum(s["f1"] for s in chunk) / folds, 4)
+            })
+        return results
+
+    def run(self, data_path: str = DATA_PATH, folds: int = 0, search: bool = False,
+            max_candidates: int = TRAIN_SEARCH_MAX_CANDIDATES) -> Tuple[FraudDetectionModel, Dict]:
+        """
+        تدريب نموذج جديد (بدون لمس النموذج المستخدم في السيرفر)
+
+        Args:
+            data_path: مسار ملف CSV
+            folds: عدد folds للتقييم (0 = بدون)
+            search: بحث عن أفضل إعدادات (يحتاج folds >= 2، الافتراضي 3)
+            max_candidates: أقصى عدد تركيبات إعدادات تُجرّب
+
+        Returns:
+            (النموذج المدرب, النتائج: accuracy, report, cv, best_params, timings ...)
+        """
+        timer = PhaseTimer()
+        model = FraudDetectionModel(self.backend)
+
+        with timer.phase("load"):
+            df = pd.read_csv(data_path)
+            X, y = df["text"].astype(str), df["label"].astype(int)
+            data_hash = dataset_hash(X.tolist(), y.tolist())
+        print(f"🧩 النموذج: {model.backend.description}")
+        print(f"📚 عدد السجلات: {len(df)} (احتيال: {int((y == 1).sum())}، آمن: {int((y == 0).sum())})")
+
+        # نفس تقسيم 80/20 السابق: جزء الاختبار ما يدخل في التقييم ولا البحث
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+        cv_results = None
+        best_params = {}
+        if search and folds < 2:
+            folds = 3
+        if folds >= 2:
+            candidates = search_candidates(model.backend.search_grid, max_candidates) if search else [{}]
+            print(f"🔁 تقييم {folds}-fold لـ {len(candidates)} مرشح...")
+            cv_results = self._cross_validate(model, X_train, y_train, data_hash, folds, candidates, timer)
+            best = max(cv_results, key=lambda r: (r["f1"], r["accuracy"]))
+            best_params = best["params"]
+
+        with timer.phase("featurize"):
+            key = self.cache.key(data_hash, "holdout", model.vectorizer)
+            model.vectorizer, X_train_vec, X_test_vec = self.cache.featurize(model.vectorizer, key, X_train, X_test)
+        print(f"   شكل البيانات: {X_train_vec.shape}")
+
+        with timer.phase("fit"):
+            jobs = {"n_jobs": self.n_jobs} if model.backend.parallel else {}
+            model.model.set_params(**best_params, **jobs)
+            model.model.fit(X_train_vec, y_train)
+            model.is_trained = True
+
+        with timer.phase("evaluate"):
+            y_pred = model.model.predict(X_test_vec)
+            accuracy = accuracy_score(y_test, y_pred)
+            report = classification_report(y_test, y_pred, target_names=["آمن", "احتيال"])
+        # التوازي للتدريب فقط: النموذج المحفوظ / المعتمد يحلل رسالة وحدة بخيط واحد
+        # (joblib لكل predict_proba أبطأ من الحساب نفسه)
+        if jobs:
+            model.model.set_params(n_jobs=1)
+        print(f"\n   الدقة: {accuracy * 100:.1f}%")
+        print(f"\n{report}")
+
+        return model, {
+            "accuracy": accuracy,
+            "report": report,
+            "train_size": len(X_train),
+            "test_size": len(X_test),
+            "dataset_hash": data_hash[:16],
+            "backend": model.backend.name,
+            "cv_folds": folds if folds >= 2 else 0,
+            "cv": cv_results,
+            "best_params": best_params,
+            "feature_cache": dict(self.cache.stats),
+            "timings": timer.timings,
+            "holdout": {"texts": X_test.tolist(), "labels": y_test.tolist()}
+        }
@@ -0,0 +1,227 @@
+"""
+كشف انتحال البراندات بالتشابه
+Typosquat & Homoglyph Detection
+
+قائمة TARGETED_BRANDS تحتوي أشكال مزيفة مكتوبة يدوياً (paypa1، app1e)
+وأي شكل جديد مثل rnicrosoft أو apple بحروف كيريلية يعدي.
+
+الطريقة:
+1. skeleton: نحول الدومين لشكل "مرئي" موحد
+   (حروف كيريلية/يونانية → لاتينية، 0→o، 1/i→l، rn→m، vv→w، punycode)
+2. فهرس symmetric-delete (مثل SymSpell) لأسماء البراندات:
+   نخزن كل الحذوفات حتى مسافة max_distance، والبحث يولد حذوفات
+   الكلمة فقط ← بحث سريع مهما كبرت القائمة
+3. تأكيد بمسافة Damerau-Levenshtein واستثناء الدومينات الرسمية
+4. نفحص الاسم المسجل فقط (paypa1 في paypa1-secure.com.sa)، مو النطاقات الفرعية:
+   mail.yahoo.com أو apply.workday.com مو انتحال لـ gmail / apple
+5. نفس اسم الدومين الرسمي بنطاق دولة (amazon.co.uk، google.de) = البراند نفسه
+
+ملف البراندات: data/brands.csv بالأعمدة brand,label,official
+(official: الدومينات الرسمية مفصولة بـ ;)
+"""
+
+import csv
+import os
+import unicodedata
+from typing import Dict, List, Optional, Set
+
+from config import BRANDS_PATH, TYPO_MAX_DISTANCE
+
+# حروف تشبه اللاتينية بصرياً
+CONFUSABLES = {
+    # كيريلي
+    "а": "a", "е": "e", "о": "o", "р": "p", "с": "c", "у": "y", "х": "x", "і": "l",
+    "ј": "j", "ԁ": "d", "ɡ": "g", "ӏ": "l", "ѕ": "s", "һ": "h", "ԛ": "q", "ԝ": "w", "ь": "b",
+    "к": "k", "м": "m", "т": "t", "в": "b", "н": "h",
+    # يوناني
+    "α": "a", "ο": "o", "ν": "v", "ρ": "p", "τ": "t", "ι": "l", "κ": "k", "ε": "e",
+    "υ": "u", "χ": "x", "β": "b",
+    # أرقام ورموز
+    "0": "o", "1": "l", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "@": "a", "|": "l", "!": "l",
+    # i و l متشابهة في أغلب الخطوط
+    "i": "l",
+}
+
+# تسلسلات تشبه حرف واحد
+MULTI_CONFUSABLES = [("rn", "m"), ("vv", "w"), ("cl", "d")]
+
+# لاحقات ثانية شائعة (com.sa، co.uk ...)
+SECOND_LEVEL = {"com", "net", "org", "gov", "edu", "co", "ac", "sch", "med"}
+
+
+def decode_label(label: str) -> str:
+    """فك punycode (xn--...) إن وجد"""
+    if label.startswith("xn--"):
+        try:
+            return label[4:].encode("ascii").decode("punycode")
+        except Exception:
+            return label
+    return label
+
+
+def skeleton(text: str) -> str:
+    """الشكل المرئي الموحد للنص"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(CONFUSABLES.get(ch, ch) for ch in text)
+
+
+def skeleton_variants(text: str) -> Set[str]:
+    """الـ skeleton مع وبدون التسلسلات المتشابهة (rn→m ...)"""
+    base = skeleton(text)
+    variants = {base}
+    for seq, replacement in MULTI_CONFUSABLES:
+        for v in list(variants):
+            if seq in v:
+                variants.add(v.replace(seq, replacement))
+    return variants
+
+
+def damerau_distance(a: str, b: str, max_distance: int) -> int:
+    """مسافة Damerau-Levenshtein (OSA) مع توقف مبكر"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            row_min = min(row_min, cur[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """كل الكلمات الناتجة عن حذف حتى distance حروف"""
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        nxt = set()
+        for w in frontier:
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        result |= nxt
+        frontier = nxt
+    return result
+
+
+def allowed_distance(length: int, max_distance: int) -> int:
+    """الأسماء القصيرة (stc، gmail، apple) تطابق تماماً (skeleton) فقط لتجنب الإنذارات الكاذبة"""
+    if length <= 5:
+        return 0
+    if length < 9:
+        return min(1, max_distance)
+    return max_distance
+
+
+class TyposquatIndex:
+    """فهرس symmetric-delete لأسماء البراندات"""
+
+    def __init__(self, max_distance: int = TYPO_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._deletes: Dict[str, Set[str]] = {}   # حذف ← skeletons البراندات
+        self._brands: Dict[str, Dict] = {}         # skeleton ← {brand, label}
+        self._official: Dict[str, Set[str]] = {}   # brand ← الدومينات الرسمية
+
+    def add(self, brand: str, label: str, official: List[str] = ()):
+        key = skeleton(label)
+        self._brands[key] = {"brand": brand, "label": label}
+        self._official.setdefault(brand, set()).update(d.strip().lower() for d in official if d.strip())
+        for d in _deletes(key, allowed_distance(len(key), self.max_distance)):
+            self._deletes.setdefault(d, set()).add(key)
+
+    @classmethod
+    def from_file(cls, path: str = BRANDS_PATH, max_distance: int = TYPO_MAX_DISTANCE) -> "TyposquatIndex":
+        index = cls(max_distance)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for row in csv.DictReader(line for line in f if not line.lstrip().startswith("#")):
+                    if row.get("brand") and row.get("label"):
+                        index.add(row["brand"].strip(), row["label"].strip(),
+                                  (row.get("official") or "").split(";"))
+        return index
+
+    def _is_official(self, brand: str, host: str, registrable: str, country_suffix: bool) -> bool:
+        for domain in self._official.get(brand, ()):
+            if host == domain or host.endswith("." + domain):
+                return True
+            # نطاق الدولة لنفس الاسم الرسمي (amazon.com ← amazon.co.uk)
+            if country_suffix and registrable == domain.split(".", 1)[0]:
+                return True
+        return False
+
+    def _match_token(self, token: str) -> Optional[Dict]:
+        """أقرب براند لكلمة وحدة"""
+        best = None
+        for variant in skeleton_variants(token):
+            # أطول براند ممكن يطابق = len + max_distance، فما نحتاج حذوفات أكثر من مسافته
+            token_distance = allowed_distance(len(variant) + self.max_distance, self.max_distance)
+            for d in _deletes(variant, token_distance):
+                for key in self._deletes.get(d, ()):
+                    limit = allowed_distance(len(key), self.max_distance)
+                    dist = damerau_distance(variant, key, limit)
+                    if dist <= limit and (best is None or dist < best["distance"]):
+                        best = {**self._brands[key], "distance": dist}
+                        if dist == 0:
+                            return best
+        return best
+
+    def check(self, host: str) -> Optional[Dict]:
+        """
+        هل الدومين ينتحل براند؟
+
+        Returns:
+            {"brand", "label", "token", "distance", "kind"} أو None
+            kind: homoglyph (نفس الشكل بحروف مختلفة) / typo (خطأ إملائي) /
+                  brand_in_domain (اسم البراند في دومين غير رسمي)
+        """
+        host = (host or "").lower().rstrip(".")
+        labels = host.split(".")
+        if len(labels) < 2 or not all(labels):
+            return None
+
+        # نحذف اللاحقة (com / com.sa / co.uk ...) ونأخذ الاسم المسجل فقط
+        suffix = labels[-1]
+        labels = labels[:-1]
+        if len(labels) > 1 and labels[-1] in SECOND_LEVEL:
+            labels = labels[:-1]
+        registrable = labels[-1]
+        label = decode_label(registrable)
+
+        tokens = [label]
+        if "-" in label:
+            tokens.append(label.replace("-", ""))
+            tokens.extend(part for part in label.split("-") if part)
+
+        best = None
+        for token in tokens:
+            if len(token) > 40:
+                continue
+            match = self._match_token(token)
+            if match and (best is None or match["distance"] < best["distance"]):
+                best = {**match, "token": token}
+
+        country_suffix = len(suffix) == 2 and suffix.isalpha()
+        if best is None or self._is_official(best["brand"], host, registrable, country_suffix):
+            return None
+
+        if best["distance"] > 0:
+            best["kind"] = "typo"
+        elif best["token"] != best["label"].lower():
+            best["kind"] = "homoglyph"
+        else:
+            best["kind"] = "brand_in_domain"
+        return best
+
+    def get_stats(self) -> Dict:
+        return {
+            "brands": len(self._brands),
+            "delete_keys": len(self._deletes),
+            "max_distance": self.max_distance
+        }
@@ -0,0 +1,119 @@
+"""
+تحليل الرسائل الكبيرة بنوافذ
+Bounded-Cost Windowed Analysis
+
+نص الرسالة بدون حد: القواعد تمر على النص كله أكثر من مرة، و TF-IDF
+يحوّل النص كله، فنشرة 2MB تكلف أضعاف الإيميل العادي (وممكن تُستغل).
+
+الرسالة الأطول من ANALYSIS_BUDGET_CHARS تتحلل بنوافذ مجموعها ضمن الحد:
+1. الأولوية: بداية الرسالة، نهايتها، والمنطقة حول الروابط (دومين لكل
+   نافذة، الأقل تكراراً أولاً، حتى ANALYSIS_URL_WINDOWS)
+2. باقي الميزانية: نوافذ متداخلة (بمقدار ANALYSIS_WINDOW_OVERLAP) موزعة
+   بالتساوي على الوسط
+3. حدود النافذة ما تقطع كلمة أو رابط (تتمدد لأقرب فراغ)
+4. كل نافذة تتحلل لوحدها (قواعد + ML + روابط) والنتيجة أعلى خطر بينها
+
+أسوأ تكلفة للرسالة: مرور خطي واحد على النص (البحث عن الروابط) + تحليل
+ANALYSIS_BUDGET_CHARS حرف على الأكثر (+ تمدد الحدود: ANALYSIS_SNAP_CHARS لكل طرف)
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+from config import (
+    ANALYSIS_BUDGET_CHARS, ANALYSIS_WINDOW_CHARS, ANALYSIS_WINDOW_OVERLAP, ANALYSIS_URL_WINDOWS,
+    ANALYSIS_SNAP_CHARS
+)
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+HOST_PATTERN = re.compile(r"https?://([^/:?#]+)")
+
+
+def _snap(text: str, start: int, end: int) -> Tuple[int, int]:
+    """تمديد الحدود لأقرب فراغ (حتى ANALYSIS_SNAP_CHARS) بدل قطع كلمة أو رابط"""
+    limit = max(start - ANALYSIS_SNAP_CHARS, 0)
+    while start > limit and not text[start - 1].isspace():
+        start -= 1
+    limit = min(end + ANALYSIS_SNAP_CHARS, len(text))
+    while end < limit and not text[end].isspace():
+        end += 1
+    return start, end
+
+
+def _merge(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _covered(spans: List[Tuple[int, int]]) -> int:
+    return sum(end - start for start, end in _merge(spans))
+
+
+def _url_regions(text: str, limit: int) -> List[Tuple[int, int]]:
+    """
+    موقع أول ظهور لكل دومين، والأولوية للدومينات الأقل تكراراً: رابط تصيد
+    واحد بين مئات روابط التتبع في نشرة هو اللي يستاهل نافذة
+    """
+    hosts: Dict[str, list] = {}  # دومين ← [عدد الظهور، أول موقع]
+    for match in URL_PATTERN.finditer(text):
+        host = HOST_PATTERN.match(match.group(0))
+        entry = hosts.setdefault(host.group(1).lower() if host else "", [0, (match.start(), match.end())])
+        entry[0] += 1
+    ranked = sorted(hosts.values(), key=lambda e: (e[0], e[1][0]))
+    return [region for _, region in ranked[:limit]]
+
+
+def plan_windows(text: str, budget: int = ANALYSIS_BUDGET_CHARS, window: int = ANALYSIS_WINDOW_CHARS,
+                 overlap: int = ANALYSIS_WINDOW_OVERLAP, url_windows: int = ANALYSIS_URL_WINDOWS
+                 ) -> List[Tuple[int, int]]:
+    """
+    النوافذ المختارة [(start, end)] مرتبة وبدون تداخل (المتداخلة تندمج)
+
+    نفس النص ونفس الإعدادات = نفس النوافذ (فالنوافذ تستفيد من كاش المقاطع)
+    """
+    n = len(text)
+    if n <= budget:
+        return [(0, n)]
+    window = min(window, budget)
+
+    # 1. الأولوية: البداية، النهاية، وحول الروابط
+    priority = [(0, window), (n - window, n)]
+    for start, end in _url_regions(text, url_windows):
+        pad = max(window - (end - start), 0) // 2
+        priority.append((max(start - pad, 0), min(end + pad, n)))
+
+    spans: List[Tuple[int, int]] = []
+    for span in priority:
+        if _covered(spans + [span]) <= budget:
+            spans.append(span)
+
+    # 2. باقي الميزانية: نوافذ متداخلة على كامل النص، نختار منها بالتساوي
+    step = max(window - overlap, 1)
+    tiles = [(start, min(start + window, n)) for start in range(0, n, step)]
+    free = max(budget - _covered(spans), 0)
+    count = min(free // window, len(tiles))
+    if count:
+        stride = len(tiles) / count
+        for i in range(count):
+            tile = tiles[int((i + 0.5) * stride)]
+            if _covered(spans + [tile]) <= budget:
+                spans.append(tile)
+
+    return _merge([_snap(text, start, end) for start, end in spans])
+
+
+def window_segments(text: str) -> List[Dict]:
+    """
+    نوافذ الرسالة بنفس شكل مقاطع split_thread (كل نافذة مقطع يتحلل لوحده)
+
+    Returns:
+        [{"text", "quoted": False, "window": [start, end], "input_chars"}]
+        (الـ hash و chars يضيفها المستدعي مثل باقي المقاطع)
+    """
+    return [{"text": text[start:end], "quoted": False, "window": [start, end], "input_chars": len(text)}
+            for start, end in plan_windows(text)]
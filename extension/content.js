@@ -3,9 +3,13 @@
  * يعمل داخل Gmail ويحلل الإيميلات تلقائياً
  */
 
-const API_URL = "http://127.0.0.1:8000/analyze";
-let lastAnalyzedEmail = "";
-let isAnalyzing = false;
+// API_BASE والكاش في verdict_cache.js (يتحمل قبل هذا الملف)
+const POLL_INTERVAL = 1000;
+const POLL_MAX_TRIES = 30;
+const DEBOUNCE_MS = 500;
+let currentMessageId = null;
+let analyzedMessageId = null;
+let debounceTimer = null;
 
 // ========== استخراج محتوى الإيميل ==========
 function extractEmailContent() {
@@ -27,9 +31,19 @@ function extractEmailContent() {
     const sender = senderEl?.getAttribute('email') || senderEl?.innerText || "";
     const subject = subjectEl?.innerText?.trim() || "";
     
-    const fullText = `From: ${sender}\nSubject: ${subject}\n\n${body}`;
+    // الروابط المخفية خلف نص الرابط (href) ما تظهر في innerText
+    const hiddenLinks = [...new Set(
+      Array.from(emailBody?.querySelectorAll('a[href]') || [])
+        .map(a => a.href)
+        .filter(href => /^https?:\/\//i.test(href) && !body.includes(href))
+    )];
+
+    let fullText = `From: ${sender}\nSubject: ${subject}\n\n${body}`;
+    if (hiddenLinks.length) fullText += `\n\nLinks:\n${hiddenLinks.join('\n')}`;
+    const messageId = emailBody?.closest('[data-message-id]')?.getAttribute('data-message-id') ||
+                      getMessageId();
     
-    return { body, sender, subject, fullText };
+    return { body, sender, subject, fullText, messageId };
   } catch (e) {
     console.error("Aman: Error extracting email", e);
     return null;
@@ -107,6 +121,7 @@ function createBanner(result) {
     </div>
     ${score >= 40 ? `<div style="font-size: 12px; color: ${color.text}; font-weight: 500;">💡 ${result.advice || 'كن حذراً!'}</div>` : ''}
     ${flagsHtml}
+    ${result.status === 'pending' ? `<div style="font-size: 11px; color: #666; margin-top: 8px;">⏳ جاري فحص الروابط بالعمق...</div>` : ''}
     <div style="display: flex; justify-content: space-between; margin-top: 10px; align-items: center;">
       <span style="font-size: 10px; color: #999;">🛡️ أمان</span>
       <button onclick="this.parentElement.parentElement.remove()" style="background: none; border: none; cursor: pointer; font-size: 12px; color: #666;">✕ إغلاق</button>
@@ -120,70 +135,91 @@ function createBanner(result) {
   setTimeout(() => banner.remove(), hideDelay);
 }
 
+// ========== معرف الرسالة المفتوحة ==========
+function getMessageId() {
+  // معرف Gmail للرسالة، وإذا ما ظهر بعد: آخر جزء من الرابط (#inbox/FMfcg...)
+  const el = document.querySelector('[data-message-id]');
+  if (el) return el.getAttribute('data-message-id');
+  const parts = location.hash.split('/');
+  return parts.length > 1 ? parts[parts.length - 1] : null;
+}
+
 // ========== تحليل الإيميل ==========
 async function analyzeEmail() {
-  if (isAnalyzing) return;
-  
   const emailData = extractEmailContent();
-  if (!emailData || !emailData.body || emailData.body.length < 5) return;
-  
-  // تجنب إعادة تحليل نفس الإيميل
-  const emailHash = emailData.fullText.substring(0, 200);
-  if (emailHash === lastAnalyzedEmail) return;
+  if (!emailData || !emailData.body || emailData.body.length < 5) {
+    // المحتوى ما تحمّل بعد: نعيد المحاولة مع تغيير الـ DOM القادم
+    currentMessageId = null;
+    return;
+  }
   
-  lastAnalyzedEmail = emailHash;
-  isAnalyzing = true;
+  // نفس الرسالة محللة في هذه الصفحة
+  if (emailData.messageId === analyzedMessageId) return;
+  analyzedMessageId = emailData.messageId;
   
   try {
-    const response = await fetch(API_URL, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ text: emailData.fullText })
-    });
-    
-    if (response.ok) {
-      const result = await response.json();
-      createBanner(result);
+    // من الكاش إذا محللة قبل (ولو قبل إعادة تحميل الصفحة)، وإلا طلب واحد للسيرفر
+    const verdict = await getVerdict(emailData.messageId, emailData.fullText);
+    if (!verdict) return;
+    createBanner(verdict.result);
+    if (verdict.result.status === 'pending' && verdict.result.update_url) {
+      pollDeepVerdict(verdict.result.update_url, verdict.key, emailData.messageId);
     }
   } catch (error) {
     // السيرفر مو شغال - صامت
     console.log("Aman: Server not available");
   }
-  
-  isAnalyzing = false;
+}
+
+// ========== انتظار الحكم المحدّث ==========
+async function pollDeepVerdict(updateUrl, cacheKey, messageId) {
+  for (let i = 0; i < POLL_MAX_TRIES; i++) {
+    await new Promise(r => setTimeout(r, POLL_INTERVAL));
+    
+    // المستخدم فتح إيميل آخر
+    if (messageId !== analyzedMessageId) return;
+    
+    try {
+      const response = await fetch(AMAN_API_BASE + updateUrl);
+      if (!response.ok) return;
+      const job = await response.json();
+      if (job.status === 'done') {
+        await saveVerdict(cacheKey, job.result);
+        createBanner(job.result);
+        return;
+      }
+      if (job.status === 'failed') return;
+    } catch (error) {
+      return;
+    }
+  }
 }
 
 // ========== مراقبة فتح إيميل جديد ==========
+function scheduleIfMessageChanged() {
+  // Gmail يغير الـ DOM باستمرار: نحلل فقط إذا تغير معرف الرسالة،
+  // وننتظر DEBOUNCE_MS بعد آخر تغيير حتى يكتمل تحميل المحتوى
+  const messageId = getMessageId();
+  if (!messageId) {
+    // رجع للقائمة: فتح نفس الرسالة مرة ثانية يعرض البانر (من الكاش)
+    currentMessageId = analyzedMessageId = null;
+    return;
+  }
+  if (messageId === currentMessageId) return;
+  currentMessageId = messageId;
+  clearTimeout(debounceTimer);
+  debounceTimer = setTimeout(analyzeEmail, DEBOUNCE_MS);
+}
+
 function setupAutoAnalysis() {
   // تحليل عند تحميل الصفحة (إذا كان هناك إيميل مفتوح)
-  setTimeout(analyzeEmail, 2000);
-  
-  // مراقبة تغييرات URL (فتح إيميل جديد)
-  let lastUrl = location.href;
-  const urlObserver = new MutationObserver(() => {
-    if (location.href !== lastUrl) {
-      lastUrl = location.href;
-      // انتظر تحميل محتوى الإيميل
-      setTimeout(analyzeEmail, 1500);
-    }
-  });
-  
-  urlObserver.observe(document.body, { subtree: true, childList: true });
-  
-  // مراقبة ظهور محتوى الإيميل
-  const contentObserver = new MutationObserver((mutations) => {
-    for (const mutation of mutations) {
-      if (mutation.addedNodes.length) {
-        const hasEmailContent = document.querySelector('.a3s.aiL');
-        if (hasEmailContent) {
-          setTimeout(analyzeEmail, 1000);
-          break;
-        }
-      }
-    }
-  });
+  scheduleIfMessageChanged();
   
-  contentObserver.observe(document.body, { subtree: true, childList: true });
+  window.addEventListener('hashchange', scheduleIfMessageChanged);
+  
+  // محتوى الرسالة يظهر بعد تغيير الرابط بقليل
+  const observer = new MutationObserver(scheduleIfMessageChanged);
+  observer.observe(document.body, { subtree: true, childList: true });
 }
 
 // ========== استقبال رسائل من popup ==========
@@ -197,6 +233,25 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
     }
   }
   
+  if (request.type === "GET_VERDICT") {
+    // الـ popup يستخدم نفس الكاش ونفس الطلب الجاري للبانر
+    const emailData = extractEmailContent();
+    if (!emailData || !emailData.body) {
+      sendResponse({ ok: false, error: "لم يتم العثور على إيميل مفتوح" });
+      return true;
+    }
+    getVerdict(emailData.messageId, emailData.fullText)
+      .then(verdict => {
+        if (!verdict) {
+          sendResponse({ ok: false, error: "تأكد أن السيرفر شغال على localhost:8000" });
+          return;
+        }
+        createBanner(verdict.result);
+        sendResponse({ ok: true, result: verdict.result, cached: verdict.cached });
+      })
+      .catch(e => sendResponse({ ok: false, error: "تأكد أن السيرفر شغال على localhost:8000" }));
+  }
+  
   if (request.type === "SHOW_RESULT") {
     createBanner(request.result);
     sendResponse({ ok: true });
@@ -1,4 +1,3 @@
-const API = "http://127.0.0.1:8000/analyze";
 const statusEl = document.getElementById("status");
 const btn = document.getElementById("btn");
 const mainDiv = document.getElementById("main");
@@ -21,23 +20,14 @@ btn.addEventListener("click", async () => {
       setStatus("افتح Gmail أولاً", true);
       return;
     }
-    const email = await chrome.tabs.sendMessage(tab.id, { type: "GET_EMAIL" });
-    if (!email?.ok) {
-      setStatus("افتح رسالة (مو القائمة) ثم حاول", true);
-      return;
-    }
     setStatus("🔍 جاري التحليل...");
-    const resp = await fetch(API, {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ text: email.data.fullText })
-    });
-    if (!resp.ok) {
-      setStatus("تأكد أن السيرفر شغال على localhost:8000", true);
+    // نفس كاش البانر: الرسالة المحللة قبل ما ترسل للسيرفر مرة ثانية
+    const verdict = await chrome.tabs.sendMessage(tab.id, { type: "GET_VERDICT" });
+    if (!verdict?.ok) {
+      setStatus(verdict?.error || "افتح رسالة (مو القائمة) ثم حاول", true);
       return;
     }
-    const data = await resp.json();
-    chrome.tabs.sendMessage(tab.id, { type: "SHOW_RESULT", result: data });
+    const data = verdict.result;
     display(data);
   } catch (e) {
     setStatus("خطأ: " + (e?.message || e), true);
@@ -0,0 +1,120 @@
+/**
+ * Aman Verdict Cache
+ * كاش الأحكام المشترك بين البانر (content.js) والـ popup
+ *
+ * - المفتاح: معرف الرسالة في Gmail + hash المحتوى
+ * - محفوظ في chrome.storage.local (يبقى بعد إعادة تحميل الصفحة)
+ * - محدود العدد: الأقدم حفظاً ينحذف أولاً
+ * - طلب واحد فقط لكل رسالة لكل نسخة نموذج: إذا تغيرت نسخة النموذج
+ *   في السيرفر، الحكم المحفوظ يعتبر قديم ويُعاد التحليل مرة وحدة
+ */
+
+const AMAN_API_BASE = "http://127.0.0.1:8000";
+const VERDICT_CACHE_KEY = "aman_verdicts";
+const VERDICT_CACHE_MAX = 500;
+const MODEL_VERSION_TTL = 10 * 60 * 1000;
+const PENDING_MAX_AGE = 10 * 60 * 1000;  // نفس مدة حفظ المهام في السيرفر
+
+let modelVersion = null;
+let modelVersionCheckedAt = 0;
+const inFlightVerdicts = new Map();
+
+// ========== hash المحتوى ==========
+async function hashContent(text) {
+  const data = new TextEncoder().encode(text);
+  const digest = await crypto.subtle.digest('SHA-256', data);
+  return Array.from(new Uint8Array(digest).slice(0, 8))
+    .map(b => b.toString(16).padStart(2, '0'))
+    .join('');
+}
+
+async function verdictKey(messageId, text) {
+  return `${messageId || 'no-id'}:${await hashContent(text)}`;
+}
+
+// ========== نسخة النموذج في السيرفر ==========
+async function getModelVersion() {
+  if (Date.now() - modelVersionCheckedAt < MODEL_VERSION_TTL) return modelVersion;
+  try {
+    const response = await fetch(AMAN_API_BASE + "/model/status");
+    if (response.ok) {
+      modelVersion = (await response.json()).version || null;
+      modelVersionCheckedAt = Date.now();
+    }
+  } catch (error) {
+    // السيرفر مو شغال: نستخدم الأحكام المحفوظة كما هي
+  }
+  return modelVersion;
+}
+
+// ========== التخزين ==========
+async function readCache() {
+  const stored = await chrome.storage.local.get(VERDICT_CACHE_KEY);
+  return stored[VERDICT_CACHE_KEY] || {};
+}
+
+async function getCachedVerdict(key) {
+  const cache = await readCache();
+  const entry = cache[key];
+  if (!entry) return null;
+
+  // حكم مبدئي انتهت مهلة تحديثه في السيرفر
+  if (!entry.final && Date.now() - entry.savedAt > PENDING_MAX_AGE) return null;
+
+  const version = await getModelVersion();
+  if (version && entry.modelVersion && entry.modelVersion !== version) return null;
+  return entry;
+}
+
+async function saveVerdict(key, result) {
+  const cache = await readCache();
+  cache[key] = {
+    result,
+    modelVersion: result.model_version || null,
+    final: result.status !== 'pending',
+    savedAt: Date.now()
+  };
+
+  // الأقدم أولاً حتى يبقى العدد ضمن الحد
+  const keys = Object.keys(cache);
+  if (keys.length > VERDICT_CACHE_MAX) {
+    keys.sort((a, b) => cache[a].savedAt - cache[b].savedAt)
+      .slice(0, keys.length - VERDICT_CACHE_MAX)
+      .forEach(k => delete cache[k]);
+  }
+  await chrome.storage.local.set({ [VERDICT_CACHE_KEY]: cache });
+}
+
+// ========== الحكم: من الكاش أو طلب واحد للسيرفر ==========
+/**
+ * @param {string} messageId معرف الرسالة في Gmail
+ * @param {string} text نص الرسالة الكامل
+ * @returns {Promise<{key: string, result: object, cached: boolean} | null>}
+ */
+async function getVerdict(messageId, text) {
+  const key = await verdictKey(messageId, text);
+
+  const cached = await getCachedVerdict(key);
+  if (cached) return { key, result: cached.result, cached: true };
+
+  // نفس الرسالة قيد التحليل (البانر والـ popup بنفس الوقت)
+  if (inFlightVerdicts.has(key)) return inFlightVerdicts.get(key);
+
+  const request = (async () => {
+    try {
+      const response = await fetch(AMAN_API_BASE + "/analyze?mode=fast", {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ text })
+      });
+      if (!response.ok) return null;
+      const result = await response.json();
+      await saveVerdict(key, result);
+      return { key, result, cached: false };
+    } finally {
+      inFlightVerdicts.delete(key);
+    }
+  })();
+  inFlightVerdicts.set(key, request);
+  return request;
+}